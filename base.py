@@ -1,16 +1,41 @@
+import asyncio
 import json
+import os
 import sqlite3
 import sys
 import time
 from abc import ABC, abstractmethod
-from io import StringIO
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing, nullcontext
+from functools import partial
 from itertools import count
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from urllib.parse import urlsplit
 
-import requests
 from colorama import Style
 
+from cache import PageCache
+from changes import digest, load_html_digests
+from discovery import UriSet
+from document import LxmlPageDocument, PageDocument, SubtreeStream
+from fetcher import (
+    AdaptiveRateController, AsyncFetcher, HTTPStatusError, RetryExhausted, RetryPolicy, check_status, plan_retry
+)
+from metrics import Metrics, ProgressLine
+from pipeline import ParsePool
+from replay_server import mirror_uri
+from toc import parse_toc
+from transport import make_session, set_session_metrics
+from writer import ScrapWriter
+
 
 class SiteBase(ABC):
+    # registry.register_site()로 등록된 이름
+    NAME = None
+    # extractor들이 사용하는 tag의 selector 목록, partial_parse에서 이 subtree들만 남김
+    PARSE_TARGETS = None
+
     headers = {
         'User-Agent': (
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
@@ -18,30 +43,140 @@ class SiteBase(ABC):
         ),
     }
 
-    TABLE_CREATION_SQL = (
-        'CREATE TABLE scrap '
-        '(id integer PRIMARY KEY, uri TEXT, title TEXT, abstract TEXT, contents TEXT, body TEXT, bibliography TEXT)'
-    )
+    def __init__(
+        self,
+        mirror: str = None,
+        cache_dir: str = None,
+        backend: str = 'bs4',
+        partial_parse: bool = False,
+        pool_size: int = 10,
+        stream: bool = False,
+    ):
+        """
+        Args:
+            mirror (str, optional): 실제 사이트 대신 요청할 replay server 주소. Defaults to None.
+            cache_dir (str, optional): 가져온 page를 저장할 cache directory, site별 하위 directory를 사용. Defaults to None.
+            backend (str, optional): page 파싱 방식, bs4 또는 lxml (BeautifulSoup tree 없이 XPath 사용). Defaults to 'bs4'.
+            partial_parse (bool, optional): lxml backend에서 PARSE_TARGETS subtree만 남기고 파싱. Defaults to False.
+            pool_size (int, optional): host별로 유지할 keep-alive 연결 수, crawl 동시 요청 수에 맞춤. Defaults to 10.
+            stream (bool, optional): response를 chunk 단위로 파싱하면서 PARSE_TARGETS subtree만 남겨서 page 하나의 메모리를 제한.
+                전체 page를 저장하는 cache_dir과 함께 사용할 수 없음. Defaults to False.
+        """
+        if backend not in ('bs4', 'lxml'):
+            raise ValueError(f'지원하지 않는 backend: {backend}')
+        if partial_parse and (backend != 'lxml' or self.PARSE_TARGETS is None):
+            raise ValueError('partial_parse는 PARSE_TARGETS가 있는 site의 lxml backend에서만 사용할 수 있음')
+        if stream and (self.PARSE_TARGETS is None or cache_dir is not None):
+            raise ValueError('stream은 PARSE_TARGETS가 있는 site에서 cache_dir 없이 사용할 수 있음')
+        self.mirror = mirror
+        self.backend = backend
+        self.partial_parse = partial_parse
+        self.stream = stream
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = PageCache(os.path.join(cache_dir, self.__class__.__name__.lower()))
+        # index 탐색과 page 요청이 같은 session을 사용해서 keep-alive 연결을 재사용함
+        self.session = make_session(self.headers, pool_size)
+
+    def request_uri(self, uri: str) -> str:
+        """uri를 실제로 요청할 주소로 변환, mirror가 지정되어 있으면 replay server 주소를 사용
+
+        Args:
+            uri (str): page uri
+
+        Returns:
+            str: 요청할 주소
+        """
+        if self.mirror is None:
+            return uri
+        return mirror_uri(self.mirror, uri)
+
+    @abstractmethod
+    def get_index_uris(self) -> list[str]:
+        """page uri 목록이 있는 index page들의 uri를 반환하도록 함
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        Returns:
+            list[str]: index page uri list
+        """
+        pass
 
     @abstractmethod
-    def get_page_uris(self) -> list[str]:
-        """모든 페이지 uri를 list type으로 반환하도록 함
+    def get_page_uris_in_index(self, html_body: str) -> list[str]:
+        """index page에서 page uri들을 절대 주소로 추출하도록 함, 중복 제거와 정규화는 호출하는 쪽에서 수행
+
+        Args:
+            html_body (str): index page html body
 
         Returns:
             list[str]: page uri list
         """
         pass
 
+    def get_page_uris(self, workers: int = 8) -> list[str]:
+        """모든 페이지 uri를 중복 없이 list type으로 반환
+
+        Args:
+            workers (int, optional): index page를 동시에 가져올 thread 수. Defaults to 8.
+
+        Returns:
+            list[str]: 정규화된 page uri list
+        """
+        return list(self.iter_page_uris(workers=workers))
+
+    def iter_page_uris(
+        self,
+        seen: UriSet = None,
+        workers: int = 8,
+        controllers: dict = None,
+        metrics=None,
+        worker_slots=None,
+    ) -> Iterator[str]:
+        """index page들을 workers개의 thread로 동시에 가져오면서 처음 발견한 page uri를 바로 반환
+
+        index page는 get_index_uris() 순서대로 처리하므로 반환하는 순서는 항상 같음
+
+        Args:
+            seen (UriSet, optional): 이미 발견했거나 건너뛸 uri, 새로 발견한 uri가 추가됨. Defaults to None.
+            workers (int, optional): index page를 동시에 가져올 thread 수. Defaults to 8.
+            controllers (dict, optional): host별 AdaptiveRateController, page 요청과 rate를 공유할 때 전달. Defaults to None.
+            metrics (Metrics, optional): 요청 시간, 재시도 등을 기록할 metrics. Defaults to None.
+            worker_slots (SiteSlots, optional): 여러 site가 공유하는 WorkerPool의 slot. Defaults to None.
+
+        Yields:
+            str: 정규화된 page uri
+        """
+        seen = seen if seen is not None else UriSet()
+        controllers = controllers if controllers is not None else defaultdict(lambda: AdaptiveRateController(4.0))
+        metrics = metrics if metrics is not None else Metrics()
+        fetch_index = partial(
+            self._fetch_sync,
+            controllers=controllers,
+            retry_policy=RetryPolicy(),
+            metrics=metrics,
+            index_page=True,
+            worker_slots=worker_slots,
+        )
+        with ThreadPoolExecutor(workers, thread_name_prefix=f'{self.__class__.__name__.lower()}-index') as executor:
+            for html_body in executor.map(fetch_index, self.get_index_uris()):
+                for uri in self.get_page_uris_in_index(html_body):
+                    uri = seen.add(uri)
+                    if uri is not None:
+                        yield uri
+
+    async def _discover_async(self, fetcher: AsyncFetcher, seen: UriSet) -> AsyncIterator[str]:
+        """fetcher의 session으로 index page들을 동시에 가져오면서 처음 발견한 page uri를 바로 반환, 완료된 index page 순서"""
+        async for _, html_body in fetcher.fetch_all(self.get_index_uris(), index_page=True):
+            for uri in self.get_page_uris_in_index(html_body):
+                uri = seen.add(uri)
+                if uri is not None:
+                    yield uri
+
     @abstractmethod
-    def get_title_in_page(self, html_body: str) -> str:
+    def get_title_in_page(self, page: PageDocument) -> str:
         """page에서 title을 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 title
@@ -49,11 +184,11 @@ class SiteBase(ABC):
         pass
 
     @abstractmethod
-    def get_abstract_in_page(self, html_body: str) -> str:
+    def get_abstract_in_page(self, page: PageDocument) -> str:
         """page에서 abstract를 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 abstract
@@ -61,11 +196,11 @@ class SiteBase(ABC):
         pass
 
     @abstractmethod
-    def get_contents_in_page(self, html_body: str) -> str:
+    def get_contents_in_page(self, page: PageDocument) -> str:
         """page에서 목차(table of contents)를 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 목차
@@ -73,11 +208,11 @@ class SiteBase(ABC):
         pass
 
     @abstractmethod
-    def get_body_in_page(self, html_body: str) -> str:
+    def get_body_in_page(self, page: PageDocument) -> str:
         """page에서 본문(body) 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 본문
@@ -85,82 +220,430 @@ class SiteBase(ABC):
         pass
 
     @abstractmethod
-    def get_bibliography_in_page(self, html_body: str) -> str:
+    def get_bibliography_in_page(self, page: PageDocument) -> str:
         """page에서 인용문(bibliography) 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 인용문
         """
         pass
 
-    def scrap(self, path: str, color) -> None:
+    def make_document(self, html_body: str) -> PageDocument:
+        """backend 설정에 맞는 PageDocument 생성
+
+        Args:
+            html_body (str): page html body
+
+        Returns:
+            PageDocument: 파싱된 page
+        """
+        if self.backend == 'lxml':
+            return LxmlPageDocument(html_body, keep=self.PARSE_TARGETS if self.partial_parse else None)
+        return PageDocument(html_body)
+
+    def parse_page(self, html_body: str, timings: dict = None) -> tuple:
+        """page를 한 번만 파싱해서 모든 extractor에 공유하고 scrap table의 column 값들을 반환
+
+        Args:
+            html_body (str): page html body
+            timings (dict, optional): 전달되면 field별 파싱 시간(초)을 기록. Defaults to None.
+
+        Returns:
+            tuple: (title, abstract, contents, body, bibliography), contents는 json 문자열
+        """
+        page = self.make_document(html_body)
+        timings = timings if timings is not None else {}
+
+        def timed(field, extractor):
+            start = time.perf_counter()
+            value = extractor(page)
+            timings[field] = time.perf_counter() - start
+            return value
+
+        return (
+            timed('title', self.get_title_in_page),
+            timed('abstract', self.get_abstract_in_page),
+            json.dumps(timed('contents', self.get_contents_in_page)),
+            timed('body', self.get_body_in_page),
+            timed('bibliography', self.get_bibliography_in_page),
+        )
+
+    def scrap(
+        self,
+        path: str,
+        color,
+        async_mode: bool = False,
+        concurrency: int = 4,
+        rate: float = 4.0,
+        max_rate: float = None,
+        max_attempts: int = 5,
+        page_uris: list[str] = None,
+        parse_workers: int = 0,
+        queue_size: int = 64,
+        resume: bool = False,
+        refresh: bool = False,
+        offline: bool = False,
+        toc_table: bool = False,
+        search_index: bool = False,
+        compression: str = None,
+        metrics: Metrics = None,
+        progress_interval: float = 5.0,
+        worker_slots=None,
+        parse_executor: ProcessPoolExecutor = None,
+        on_stored: Callable[[list[tuple[str, str]]], None] = None,
+    ) -> None:
         """앞서 재정의된 메소드를 이용해서 스크래핑 진행
 
         Args:
             path (str): 스크래핑 결과가 저장될 파일 경로, sqlite3로 저장됨
+            async_mode (bool, optional): asyncio로 여러 page를 동시에 가져옴. Defaults to False.
+            concurrency (int, optional): async_mode에서 host별 최대 동시 요청 수. Defaults to 4.
+            rate (float, optional): host별 처음 초당 요청 수, 429, 503, timeout이 발생하면 줄어듦. Defaults to 4.0.
+            max_rate (float, optional): 응답이 원활할 때 올릴 수 있는 host별 최대 초당 요청 수, 없으면 rate의 4배. Defaults to None.
+            max_attempts (int, optional): page당 최대 요청 횟수, 모두 실패하면 dead-letter로 기록. Defaults to 5.
+            page_uris (list[str], optional): 스크래핑할 page uri 목록, 없으면 index page에서 발견하는 대로 스크래핑.
+                list가 아닌 iterator(async_mode에서는 async iterator)면 받는 대로 스크래핑함. Defaults to None.
+            parse_workers (int, optional): async_mode에서 파싱을 수행할 process 수, 0이면 event loop에서 파싱. Defaults to 0.
+            queue_size (int, optional): async_mode에서 가져왔지만 아직 파싱되지 않은 page의 최대 개수. Defaults to 64.
+            resume (bool, optional): 기존 파일에 이어서 스크래핑, 이미 저장된 uri는 건너뜀. Defaults to False.
+            refresh (bool, optional): 기존 파일의 page들을 다시 가져와서 html이 바뀐 page만 파싱하고 바뀐 field만 갱신,
+                변경 내역은 change_log table에 기록됨. Defaults to False.
+            offline (bool, optional): network 없이 cache에 저장된 page들을 다시 파싱해서 결과를 갱신. Defaults to False.
+            toc_table (bool, optional): 목차를 항목별 row로 나눈 toc table도 함께 저장. Defaults to False.
+            search_index (bool, optional): 전문 검색 index를 만들고 row를 저장할 때마다 함께 갱신. Defaults to False.
+            compression (str, optional): body, bibliography의 압축 방식 (zlib, zlib-dict, lzma), 없으면 압축하지 않음. Defaults to None.
+            metrics (Metrics, optional): fetch, 파싱, 저장 단계의 측정값을 기록할 metrics, site label이 붙음. Defaults to None.
+            progress_interval (float, optional): 진행 상황을 출력하는 간격 (초). Defaults to 5.0.
+            worker_slots (SiteSlots, optional): 여러 site가 공유하는 WorkerPool의 slot, 요청마다 slot 하나를 사용.
+                Scheduler가 전달함. Defaults to None.
+            parse_executor (ProcessPoolExecutor, optional): 여러 site가 공유하는 parser process pool,
+                pipeline.make_parse_executor()로 생성. Defaults to None.
+            on_stored (Callable, optional): page들의 결과가 저장될 때마다 [(uri, status)]로 호출, ScrapWriter 참고. Defaults to None.
         """
+        if parse_workers and not (async_mode or offline):
+            raise ValueError('parse_workers는 async_mode나 offline에서만 사용할 수 있음')
+        if offline and self.cache is None:
+            raise ValueError('offline은 cache_dir이 지정되어야 사용할 수 있음')
+        if refresh and (resume or offline):
+            raise ValueError('refresh는 resume, offline과 함께 사용할 수 없음')
+        # work queue 등에서 받는 대로 스크래핑하는 uri iterator는 전체 page 수를 미리 알 수 없음
+        streamed = page_uris is not None and not hasattr(page_uris, '__len__')
+        if streamed and resume:
+            raise ValueError('resume은 page_uris가 list일 때만 사용할 수 있음')
         print(self.__class__.__name__, 'Create database file')
         sys.stdout.flush()
-        conn = sqlite3.connect(path, isolation_level=None)
-        cur = conn.cursor()
-        cur.execute(self.TABLE_CREATION_SQL)
+        site_metrics = (metrics if metrics is not None else Metrics()).labeled(site=self.__class__.__name__)
+        set_session_metrics(self.session, site_metrics)
+        # table 생성은 writer가 수행
+        with ScrapWriter(
+            path,
+            toc_table=toc_table,
+            search_index=search_index,
+            compression=compression,
+            metrics=site_metrics,
+            on_stored=on_stored,
+        ) as writer, closing(sqlite3.connect(path)) as conn:  # conn은 읽기 전용으로 사용, 쓰기는 writer만 수행함
+            stored_uris = {uri for uri, in conn.execute('SELECT uri FROM scrap')}
+            if stored_uris and not (resume or offline or refresh):
+                raise RuntimeError(f'{path}에 이미 스크래핑 결과가 있음, 이어서 진행하려면 resume, 다시 가져오려면 refresh를 사용')
+            # refresh에서 이전에 파싱한 html과 hash가 같은 page는 파싱하지 않음
+            # offline은 파싱 메소드가 바뀐 경우에 사용하므로 html이 같더라도 다시 파싱함
+            known_digests = load_html_digests(conn) if refresh else {}
+
+            # page_uris가 없으면 index page에서 발견하는 대로 스크래핑을 시작하므로 전체 page 수는 진행하면서 늘어남
+            discover = page_uris is None and not offline
+            if offline and page_uris is None:
+                page_uris = list(self.cache.uris())
+            if discover:
+                print(f'{color}{self.__class__.__name__} Discover page uris while scraping{Style.RESET_ALL}')
+                sys.stdout.flush()
+            elif streamed:
+                print(f'{color}{self.__class__.__name__} Scrap page uris as they arrive{Style.RESET_ALL}')
+                sys.stdout.flush()
+            else:
+                page_uris_len = len(page_uris)
+                print(f'{color}{self.__class__.__name__} Get {page_uris_len} page uris{Style.RESET_ALL}')
+                sys.stdout.flush()
+                if resume and not offline:
+                    page_uris = [uri for uri in page_uris if uri not in stored_uris]
+                    print(f'{color}{self.__class__.__name__} Resume: {page_uris_len - len(page_uris)} page already stored{Style.RESET_ALL}')
+                    sys.stdout.flush()
+
+            progress = ProgressLine(
+                self.__class__.__name__, color, 0 if discover or streamed else len(page_uris), site_metrics, progress_interval
+            )
+            if streamed:
+                page_uris = self._counted(progress, page_uris)
+            # resume 시 이미 저장된 page는 발견하더라도 다시 가져오지 않음
+            seen = UriSet(stored_uris if resume else ())
+            retry_policy = RetryPolicy(max_attempts)
+            if offline:  # 모든 page를 다시 파싱해서 기존 결과를 갱신
+                asyncio.run(self._parse_pages(
+                    writer, progress, self._cached_pages(page_uris), parse_workers, parse_executor=parse_executor
+                ))
+            elif async_mode:
+                asyncio.run(self._scrap_async(
+                    writer,
+                    progress,
+                    page_uris,
+                    seen,
+                    concurrency,
+                    rate,
+                    max_rate,
+                    retry_policy,
+                    parse_workers,
+                    queue_size,
+                    known_digests,
+                    worker_slots,
+                    parse_executor,
+                ))
+            else:
+                controllers = defaultdict(lambda: AdaptiveRateController(rate, max_rate))
+                if discover:
+                    page_uris = self._counted(
+                        progress, self.iter_page_uris(seen, concurrency, controllers, site_metrics, worker_slots)
+                    )
+                self._scrap_sync(writer, progress, page_uris, controllers, retry_policy, known_digests, worker_slots)
+        progress.print()
+        with closing(sqlite3.connect(path)) as conn:  # writer가 남은 결과를 모두 저장한 후 읽음
+            status_counts = dict(conn.execute("SELECT status, COUNT(*) FROM progress WHERE status != 'done' GROUP BY status"))
+        if status_counts.get('failed'):
+            print(f'{color}{self.__class__.__name__} {status_counts["failed"]} page failed, retry with resume{Style.RESET_ALL}')
+        if status_counts.get('dead'):
+            print(
+                f'{color}{self.__class__.__name__} {status_counts["dead"]} page dead-lettered after {max_attempts} attempts, '
+                f"see progress table (status = 'dead'){Style.RESET_ALL}"
+            )
+        print(f'{color}{self.__class__.__name__} All page scrapped.{Style.RESET_ALL}')
+        sys.stdout.flush()
+
+    def _store_row(
+        self, writer: ScrapWriter, progress: ProgressLine, page_uri: str, row: tuple, html_digest: str = None
+    ) -> None:
+        writer.write(page_uri, row, html_digest)
+        progress.page()
+
+    def _store_unchanged(self, writer: ScrapWriter, progress: ProgressLine, page_uri: str) -> None:
+        writer.unchanged(page_uri)
+        progress.page('unchanged')
 
-        page_uris = self.get_page_uris()
-        page_uris_len = len(page_uris)
-        print(f'{color}{self.__class__.__name__} Get {page_uris_len} page uris{Style.RESET_ALL}')
+    def _store_failure(self, writer: ScrapWriter, progress: ProgressLine, page_uri: str, error: Exception) -> None:
+        print(f'{progress.color}{self.__class__.__name__} Failed: {page_uri}, {error!r}{Style.RESET_ALL}')
         sys.stdout.flush()
+        dead = isinstance(error, RetryExhausted)  # 재시도를 모두 사용한 page는 dead-letter로 기록
+        writer.fail(page_uri, repr(error), dead=dead)
+        progress.page('dead' if dead else 'failed')
+
+    def _fetch_sync(
+        self,
+        page_uri: str,
+        controllers: dict,
+        retry_policy: RetryPolicy,
+        metrics,
+        index_page: bool = False,
+        worker_slots=None,
+    ) -> str:
+        """page 하나를 가져옴, timeout, 연결 에러, 429/5xx 응답이면 backoff 후 재시도
 
-        for idx, page_uri in enumerate(page_uris):
-            print(f'{color}{self.__class__.__name__} > [{idx + 1}/{page_uris_len}] Scrap {page_uri}{Style.RESET_ALL}')
-            sys.stdout.flush()
-            for try_count in count(1):  # 5초 이내에 응답을 받지 못해서 timeout이 발생하면 재시도
+        Args:
+            page_uri (str): page uri
+            controllers (dict): host별 AdaptiveRateController
+            retry_policy (RetryPolicy): 재시도 정책
+            metrics (Metrics): 요청 시간, 재시도 등을 기록할 metrics
+            index_page (bool, optional): index page면 cache와 subtree 추출 없이 전체 body를 반환. Defaults to False.
+            worker_slots (SiteSlots, optional): 여러 site가 공유하는 WorkerPool의 slot. Defaults to None.
+
+        Returns:
+            str: page html body, stream이면 PARSE_TARGETS subtree만 남긴 html
+        """
+        request_uri = self.request_uri(page_uri)
+        host = urlsplit(request_uri).netloc
+        controller = controllers[host]
+        cache = None if index_page else self.cache
+        keep = self.PARSE_TARGETS if self.stream and not index_page else None
+        slots = worker_slots if worker_slots is not None else nullcontext()
+        for attempt in count(1):
+            time.sleep(controller.reserve())
+            headers = cache.request_headers(page_uri) if cache is not None else None
+            with slots:  # rate에 맞춰 기다린 후 요청하는 동안에만 공유 slot을 사용
+                start = time.perf_counter()
                 try:
-                    resp = self.session.get(page_uri, timeout=5)
-                except requests.exceptions.ReadTimeout:
-                    print(f'{color}{self.__class__.__name__} Timeout: {page_uri}, try: {try_count}{Style.RESET_ALL}')
-                    time.sleep(0.25)
+                    with self.session.get(request_uri, timeout=5, headers=headers, stream=keep is not None) as resp:
+                        check_status(page_uri, resp.status_code, resp.headers)
+                        if keep is None:
+                            size, html_body = len(resp.content), resp.text
+                        else:  # body 전체를 모으지 않고 chunk마다 파싱하면서 keep subtree만 남김
+                            stream = SubtreeStream(keep, resp.encoding or 'utf-8')
+                            for chunk in resp.iter_content(SubtreeStream.CHUNK_SIZE):
+                                stream.feed(chunk)
+                            size, html_body = stream.size, stream.close()
+                    error = None
+                except Exception as e:
+                    error = e
+            if error is not None:
+                metrics.observe('scrap_fetch_seconds', time.perf_counter() - start)
+                if isinstance(error, HTTPStatusError):
+                    metrics.inc('scrap_fetch_responses_total', status=error.status)
+                delay = plan_retry(page_uri, attempt, error, controller, retry_policy, metrics)
+                metrics.set('scrap_fetch_rate', controller.rate, host=host)
+                time.sleep(delay)
+                continue
+            latency = time.perf_counter() - start
+            metrics.observe('scrap_fetch_seconds', latency)
+            controller.success(latency)
+            metrics.set('scrap_fetch_rate', controller.rate, host=host)
+            metrics.inc('scrap_fetch_bytes_total', size)
+            metrics.inc('scrap_fetch_responses_total', status=resp.status_code)
+            if cache is not None:
+                html_body = cache.resolve(page_uri, resp.status_code, html_body, resp.headers)
+            return html_body
+
+    def _scrap_sync(
+        self,
+        writer: ScrapWriter,
+        progress: ProgressLine,
+        page_uris: Iterable[str],
+        controllers: dict,
+        retry_policy: RetryPolicy,
+        known_digests: dict,
+        worker_slots,
+    ) -> None:
+        for page_uri in page_uris:
+            try:
+                html_body = self._fetch_sync(
+                    page_uri, controllers, retry_policy, progress.metrics, worker_slots=worker_slots
+                )
+                html_digest = digest(html_body)
+                if known_digests.get(page_uri) == html_digest:
+                    self._store_unchanged(writer, progress, page_uri)
                     continue
-                break
-            title = self.get_title_in_page(resp.text)
-            abstract = self.get_abstract_in_page(resp.text)
-            contents = json.dumps(self.get_contents_in_page(resp.text))
-            body = self.get_body_in_page(resp.text)
-            bibliography = self.get_bibliography_in_page(resp.text)
-            cur.execute(
-                'INSERT INTO scrap (uri, title, abstract, contents, body, bibliography) VALUES (?, ?, ?, ?, ?, ?)',
-                (page_uri, title, abstract, contents, body, bibliography),
-            )
-            conn.commit()
-            time.sleep(0.25)
-        print(f'{color}{self.__class__.__name__} All page scrapped.{Style.RESET_ALL}')
-        sys.stdout.flush()
+                row = self._parse_timed(html_body, progress.metrics)
+            except Exception as e:  # 실패한 page는 기록해두고 resume 시 다시 시도
+                self._store_failure(writer, progress, page_uri, e)
+            else:
+                self._store_row(writer, progress, page_uri, row, html_digest)
+
+    async def _scrap_async(
+        self,
+        writer: ScrapWriter,
+        progress: ProgressLine,
+        page_uris: list[str],
+        seen: UriSet,
+        concurrency: int,
+        rate: float,
+        max_rate: float,
+        retry_policy: RetryPolicy,
+        parse_workers: int,
+        queue_size: int,
+        known_digests: dict,
+        worker_slots,
+        parse_executor: ProcessPoolExecutor,
+    ) -> None:
+        # 요청 간격은 fetcher의 rate limiter가 조절하므로 page마다 고정 sleep을 하지 않음
+        fetcher = AsyncFetcher(
+            self.headers,
+            concurrency=concurrency,
+            rate=rate,
+            request_uri=self.request_uri,
+            cache=self.cache,
+            metrics=progress.metrics,
+            max_rate=max_rate,
+            retry_policy=retry_policy,
+            keep=self.PARSE_TARGETS if self.stream else None,
+            slots=worker_slots,
+        )
+        async with fetcher:  # index page와 page 요청이 같은 keep-alive 연결과 host별 rate를 공유함
+            if page_uris is None:
+                page_uris = self._counted(progress, self._discover_async(fetcher, seen))
+            pages = fetcher.fetch_all(page_uris, queue_size=queue_size, return_exceptions=True)
+            await self._parse_pages(writer, progress, pages, parse_workers, known_digests, parse_executor)
+
+    @staticmethod
+    def _counted(progress: ProgressLine, page_uris: Iterable[str] | AsyncIterable[str]):
+        """발견한 page uri마다 progress의 전체 page 수를 늘림"""
+        if hasattr(page_uris, '__aiter__'):
+            async def counted():
+                async for page_uri in page_uris:
+                    progress.total += 1
+                    yield page_uri
+        else:
+            def counted():
+                for page_uri in page_uris:
+                    progress.total += 1
+                    yield page_uri
+        return counted()
+
+    async def _cached_pages(self, page_uris: list[str]):
+        for page_uri in page_uris:
+            html_body = self.cache.load(page_uri)
+            if html_body is None:
+                yield page_uri, LookupError(f'{page_uri} is not cached')
+            else:
+                yield page_uri, html_body
+
+    def _parse_timed(self, html_body: str, metrics) -> tuple:
+        timings = {}
+        row = self.parse_page(html_body, timings)
+        for field, seconds in timings.items():
+            metrics.observe('scrap_parse_seconds', seconds, field=field)
+        return row
+
+    async def _changed_pages(
+        self, writer: ScrapWriter, progress: ProgressLine, pages, known_digests: dict, html_digests: dict
+    ) -> AsyncIterator[tuple[str, str]]:
+        """html이 이전에 파싱한 html과 같은 page는 파싱하지 않고 완료로 기록, 나머지 page의 html hash는 html_digests에 저장"""
+        async for page_uri, html_body in pages:
+            if not isinstance(html_body, Exception):
+                html_digest = digest(html_body)
+                if known_digests.get(page_uri) == html_digest:
+                    self._store_unchanged(writer, progress, page_uri)
+                    continue
+                html_digests[page_uri] = html_digest
+            yield page_uri, html_body
+
+    async def _parse_pages(
+        self,
+        writer: ScrapWriter,
+        progress: ProgressLine,
+        pages,
+        parse_workers: int,
+        known_digests: dict = None,
+        parse_executor: ProcessPoolExecutor = None,
+    ) -> None:
+        """(uri, html body)를 파싱해서 writer로 전달, parse_workers가 있으면 process pool에서 파싱
 
-    def _split_toc_lines(self, toc_content):
-        return toc_content.replace('\n-', '\n\n-').split('\n\n')
-
-    def _split_toc_depth(self, toc_lines):
-        toc_depths = toc_lines.split('\n')
-        current_depth = toc_depths[0]
-        next_depths = []
-        for next_depth in toc_depths[1:]:
-            next_depths.append(next_depth[1:])
-        return current_depth, '\n'.join(next_depths)
-
-    def _parse_toc(self, toc_content):
-        if toc_content.strip() == '':
-            return []
-
-        toc_list = []
-        for toc_lines in self._split_toc_lines(toc_content):
-            current_depth, next_depths = self._split_toc_depth(toc_lines)
-            toc_list.append({
-                'content': current_depth,
-                'subcontent': self._parse_toc(next_depths),
-            })
-        return toc_list
+        Args:
+            writer (ScrapWriter): 결과를 저장할 writer
+            progress (ProgressLine): 진행 상황과 metrics
+            pages (AsyncIterator[tuple[str, str]]): (uri, html body), html body 대신 예외가 올 수 있음
+            parse_workers (int): 파싱을 수행할 process 수, 0이면 event loop에서 파싱
+            known_digests (dict, optional): {uri: 이전에 파싱한 html의 hash}, html이 같은 page는 파싱하지 않음. Defaults to None.
+            parse_executor (ProcessPoolExecutor, optional): 여러 site가 공유하는 parser process pool. Defaults to None.
+        """
+        html_digests = {}
+        pages = self._changed_pages(writer, progress, pages, known_digests or {}, html_digests)
+        if parse_workers:
+            with ParsePool(self, parse_workers, metrics=progress.metrics, executor=parse_executor) as parse_pool:
+                async for page_uri, row in parse_pool.parse_all(pages):
+                    html_digest = html_digests.pop(page_uri, None)
+                    if isinstance(row, Exception):
+                        self._store_failure(writer, progress, page_uri, row)
+                    else:
+                        self._store_row(writer, progress, page_uri, row, html_digest)
+        else:
+            async for page_uri, html_body in pages:
+                html_digest = html_digests.pop(page_uri, None)
+                try:
+                    if isinstance(html_body, Exception):
+                        raise html_body
+                    row = self._parse_timed(html_body, progress.metrics)
+                except Exception as e:
+                    self._store_failure(writer, progress, page_uri, e)
+                else:
+                    self._store_row(writer, progress, page_uri, row, html_digest)
 
     def _convert_md_to_dict(self, md: str) -> dict:
         """markdown 형태의 list를 dict로 변환
@@ -175,4 +658,4 @@ class SiteBase(ABC):
         # 마지막에 개행 문자가 없으면 마지막 항목은 dict type으로 생성되지 않음
         # 마지막에 개행 문자가 여러개 있으면 yaml 파싱에서 에러 발생
         # 모든 trailing new line을 없앤 후 하나만 추가하는 방식으로 함
-        return self._parse_toc(md)
+        return parse_toc(md)
@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from colorama import Fore
+
+import document
+from replay_server import ReplayServer, recorded_pages
+from wikis import SEP, IEP
+
+SITES = {
+    'plato.stanford.edu': SEP,
+    'iep.utm.edu': IEP,
+}
+# parse_page()에서 호출하는 순서, 앞의 extractor가 만든 tree와 markdown은 뒤의 extractor가 재사용함
+EXTRACTORS = (
+    'get_title_in_page',
+    'get_abstract_in_page',
+    'get_contents_in_page',
+    'get_body_in_page',
+    'get_bibliography_in_page',
+)
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """nearest-rank 방식의 백분위수
+
+    Args:
+        values (list[float]): 정렬된 측정값
+        p (float): 백분위 (0 ~ 100)
+
+    Returns:
+        float: 백분위수
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))  # ceil(len * p / 100)
+    return values[int(rank) - 1]
+
+
+def summarize(samples: list[float]) -> dict:
+    """측정값(초)을 ms 단위의 요약 통계로 변환"""
+    values = sorted(samples)
+    summary = {'count': len(values), 'mean': sum(values) / len(values) * 1e3 if values else 0.0}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = percentile(values, p) * 1e3
+    summary['max'] = values[-1] * 1e3 if values else 0.0
+    return summary
+
+
+class MarkdownifyTimer:
+    """document 모듈의 markdown 변환(markdownify, lxml backend의 convert_element) 호출마다 걸린 시간을
+    현재 측정 중인 extractor 이름으로 기록
+    """
+
+    def __init__(self):
+        self.label = None
+        self.samples = defaultdict(list)
+        self._markdownify = document.markdownify
+        self._convert_element = document.convert_element
+
+    def _timer(self, convert):
+        def timed(*args, **options):
+            start = time.perf_counter()
+            try:
+                return convert(*args, **options)
+            finally:
+                self.samples[self.label].append(time.perf_counter() - start)
+
+        return timed
+
+    def __enter__(self):
+        document.markdownify = self._timer(self._markdownify)
+        document.convert_element = self._timer(self._convert_element)
+        return self
+
+    def __exit__(self, *exc):
+        document.markdownify = self._markdownify
+        document.convert_element = self._convert_element
+
+
+def measure_extractors(site, html_body: str, timer: MarkdownifyTimer, samples: dict) -> bool:
+    """page 하나에 대해 parse_page()와 같은 순서로 extractor들을 실행하면서 각각의 시간을 기록
+
+    Args:
+        site (SiteBase): 측정할 site
+        html_body (str): page html body
+        timer (MarkdownifyTimer): markdownify 호출 시간을 기록할 timer
+        samples (dict): extractor 이름별 측정값(초) 목록
+
+    Returns:
+        bool: 모든 extractor가 성공하면 True, 문서가 아닌 page 등으로 실패하면 False
+    """
+    site_name = site.__class__.__name__
+    page = site.make_document(html_body)
+    elapsed = []
+    try:
+        for extractor in EXTRACTORS:
+            timer.label = f'{site_name}.{extractor}'
+            start = time.perf_counter()
+            getattr(site, extractor)(page)
+            elapsed.append(time.perf_counter() - start)
+    except Exception:
+        return False
+    for extractor, seconds in zip(EXTRACTORS, elapsed):
+        samples[f'{site_name}.{extractor}'].append(seconds)
+    return True
+
+
+def measure_throughput(root: str, site_uris: dict, site_options: dict, scrap_options: dict, stream: bool = False) -> dict:
+    """replay server를 대상으로 scrap()을 실행해서 site별 초당 처리 page 수를 측정
+
+    Args:
+        root (str): 기록된 page directory
+        site_uris (dict): site class별 스크래핑할 uri 목록
+        site_options (dict): site 생성 인자 (backend 등)
+        scrap_options (dict): scrap() 인자 (async_mode, concurrency 등)
+        stream (bool, optional): response를 chunk 단위로 파싱하면서 필요한 subtree만 남김. Defaults to False.
+
+    Returns:
+        dict: site 이름별 {'pages', 'seconds', 'pages_per_sec'}
+    """
+    results = {}
+    with ReplayServer(root) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        for site_cls, uris in site_uris.items():
+            site = site_cls(mirror=server.url, pool_size=scrap_options['concurrency'], stream=stream, **site_options)
+            path = os.path.join(tmp_dir, f'{site_cls.__name__.lower()}.db')
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # page마다 출력하는 진행 상황은 측정에서 제외
+                site.scrap(path, Fore.RESET, page_uris=uris, **scrap_options)
+            seconds = time.perf_counter() - start
+            results[site_cls.__name__] = {
+                'pages': len(uris),
+                'seconds': seconds,
+                'pages_per_sec': len(uris) / seconds if seconds else 0.0,
+            }
+    return results
+
+
+def peak_rss_kb() -> dict:
+    # Linux에서 ru_maxrss는 KB 단위
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def run(args) -> dict:
+    site_options = {'backend': args.backend, 'partial_parse': args.partial_parse}
+    sites = {site_cls: site_cls(**site_options) for site_cls in SITES.values()}
+    extractor_samples = defaultdict(list)
+    site_uris = defaultdict(list)
+    with MarkdownifyTimer() as timer:
+        for uri, path in recorded_pages(args.root):
+            site_cls = SITES.get(urlsplit(uri).netloc)
+            if site_cls is None:
+                continue
+            with open(path, encoding='utf-8') as f:
+                html_body = f.read()
+            for _ in range(args.repeat):
+                if not measure_extractors(sites[site_cls], html_body, timer, extractor_samples):
+                    break
+            else:  # 모든 extractor가 성공한 문서 page만 throughput 측정에 사용
+                site_uris[site_cls].append(uri)
+
+    scrap_options = {
+        'async_mode': True,
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'parse_workers': args.parse_workers,
+    }
+    return {
+        'options': {**site_options, **scrap_options, 'stream': args.stream, 'repeat': args.repeat},
+        'throughput': measure_throughput(args.root, site_uris, site_options, scrap_options, args.stream),
+        'extractors': {name: summarize(samples) for name, samples in sorted(extractor_samples.items())},
+        'markdownify': {name: summarize(samples) for name, samples in sorted(timer.samples.items())},
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def print_report(result: dict) -> None:
+    print('== throughput')
+    for site_name, each in result['throughput'].items():
+        print(f'{site_name:<6} {each["pages"]:6d} pages {each["seconds"]:8.2f}s {each["pages_per_sec"]:8.1f} pages/sec')
+    for section in ('extractors', 'markdownify'):
+        print(f'== {section} (ms)')
+        print(f'{"":<36} {"count":>6} {"mean":>8} ' + ' '.join(f'{f"p{p}":>8}' for p in PERCENTILES) + f' {"max":>8}')
+        for name, each in result[section].items():
+            stats = ' '.join(f'{each[key]:8.2f}' for key in ('mean', *(f'p{p}' for p in PERCENTILES), 'max'))
+            print(f'{name:<36} {each["count"]:6d} {stats}')
+    rss = result['peak_rss_kb']
+    print(f'== peak RSS: {rss["self"] / 1024:.1f} MB (parse workers {rss["children"] / 1024:.1f} MB)')
+
+
+def compare(result: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """baseline 결과와 비교해서 threshold 비율 이상 느려진 항목을 찾음
+
+    Args:
+        result (dict): 이번 측정 결과
+        baseline (dict): 기준 측정 결과 (--output으로 저장한 파일)
+        threshold (float): 허용하는 성능 저하 비율, ex) 0.1이면 10%
+        min_delta_ms (float): 지연 시간이 이 값(ms)보다 적게 늘어난 경우는 측정 오차로 보고 무시
+
+    Returns:
+        list[str]: 느려진 항목 설명 목록
+    """
+    regressions = []
+
+    def check(name, value, base_value, higher_is_better=False, min_delta=0.0):
+        if not base_value:
+            return
+        change = value / base_value - 1
+        slower = -change if higher_is_better else change
+        mark = ''
+        if slower > threshold and abs(value - base_value) >= min_delta:
+            mark = '  <- REGRESSION'
+            regressions.append(f'{name}: {base_value:.2f} -> {value:.2f}')
+        print(f'{name:<44} {base_value:10.2f} -> {value:10.2f} ({change:+.1%}){mark}')
+
+    print(f'== compare with baseline (threshold {threshold:.0%})')
+    for site_name, each in result['throughput'].items():
+        base_each = baseline['throughput'].get(site_name)
+        if base_each is not None:
+            check(f'{site_name} pages/sec', each['pages_per_sec'], base_each['pages_per_sec'], higher_is_better=True)
+    for section in ('extractors', 'markdownify'):
+        for name, each in result[section].items():
+            base_each = baseline[section].get(name)
+            if base_each is not None:
+                for key in ('p50', 'p90'):
+                    check(f'{name} {key}', each[key], base_each[key], min_delta=min_delta_ms)
+    check('peak RSS (KB)', result['peak_rss_kb']['self'], baseline['peak_rss_kb']['self'])
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='기록된 SEP/IEP page들로 스크래핑, 파싱 성능 측정')
+    parser.add_argument('root', help='replay_server.py가 제공하는 기록된 page directory')
+    parser.add_argument('--repeat', type=int, default=3, help='page별 extractor 반복 측정 횟수')
+    parser.add_argument('--backend', choices=('bs4', 'lxml'), default='bs4', help='page 파싱 방식')
+    parser.add_argument('--partial-parse', action='store_true', help='--backend lxml에서 필요한 subtree만 남기고 파싱')
+    parser.add_argument('--stream', action='store_true', help='throughput 측정 시 response를 chunk 단위로 파싱')
+    parser.add_argument('--concurrency', type=int, default=8, help='throughput 측정 시 host별 최대 동시 요청 수')
+    parser.add_argument('--rate', type=float, default=1000.0, help='throughput 측정 시 host별 초당 최대 요청 수')
+    parser.add_argument('--parse-workers', type=int, default=0, help='throughput 측정 시 site별 파싱 process 수')
+    parser.add_argument('--output', default=None, help='측정 결과를 저장할 json 파일 경로, 이후 --baseline으로 사용')
+    parser.add_argument('--baseline', default=None, help='비교할 기준 측정 결과 json 파일')
+    parser.add_argument('--threshold', type=float, default=0.1, help='baseline 대비 허용하는 성능 저하 비율')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='이 값(ms)보다 적게 늘어난 지연 시간은 무시')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    result = run(args)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold, args.min_delta_ms)
+        print(f'{len(regressions)} regression')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import string
+import time
+from urllib.parse import urlsplit
+
+from document import PageDocument
+from replay_server import recorded_pages
+from segmenter import segment_markdown
+from wikis import IEP
+
+# IEP extractor들이 사용하는 markdown 변환 옵션, (replacements, options)
+TITLE_OPTIONS = ((), {'strip': ['a', 'em', 'img'], 'heading_style': 'ATX'})
+CONTENTS_OPTIONS = (
+    (('<ol>', '<ul>'), ('</ol>', '</ul>')),
+    {'strip': ['a', 'em'], 'heading_style': 'ATX', 'bullets': '-'},
+)
+BODY_OPTIONS = ((), {'strip': ['a', 'img'], 'heading_style': 'ATX'})
+BIBLIOGRAPHY_OPTIONS = ((), {'strip': ['a', 'img', 'em'], 'heading_style': 'ATX'})
+
+
+class LegacySegments:
+    """segment_markdown() 이전에 IEP가 section마다 markdown을 따로 훑던 방식, 비교를 위해 남겨둠"""
+
+    def _abstract_with_title(self, md_body: str) -> str:
+        """Table of Contents title이 있어서 abtract의 끝을 분명히 알 수 있는 경우에 대한 파싱
+
+        Args:
+            md_body (str): page markdown body
+
+        Returns:
+            str: abstract 문자열 (markdown)
+        """
+        before_toc, _ = md_body.split('### Table of Contents')
+        lines = []
+        for line in before_toc.split('\n'):
+            if line.strip().startswith('#'):  # page title
+                continue
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _abstract_without_title(self, md_body: str) -> str:
+        """Table of Contents title이 없어서 abstract의 끝을 휴리스틱하게 알 수 있는 경우에 대한 파싱
+
+        list 태그가 보이기 전까지를 묶어서 abstract라고 가정
+
+        Args:
+            md_body (str): page markdown body
+
+        Returns:
+            str: abstract 문자열 (markdown)
+        """
+        lines = []
+        for line in md_body.split('\n'):
+            line = line.strip()
+            if line.startswith('#'):  # page title
+                continue
+            if len(line) > 0 and line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
+                # *, -, +: ul / 0, 1, 2, .., 9: ol
+                break
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _toc_with_title(self, md_body: str) -> str:
+        """Table of Contents title에 이어서 목차 리스트가 시작하는 경우에 대한 파싱
+
+        Args:
+            md_body (str): page markdown body
+
+        Returns:
+            str: 목차 문자열 (markdown)
+        """
+        _, after_toc = md_body.split('### Table of Contents')
+        tocs = []
+        toc_start = False  # list가 끝나면 중단하도록 하기 위한 flag
+        for line in after_toc.split('\n'):
+            stripped_line = line.strip()
+            if len(stripped_line) > 0 and stripped_line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
+                # *, -, +: ul / 0, 1, 2, .., 9: ol
+                tocs.append(line)
+                if not toc_start:
+                    toc_start = True  # list가 시작되면 flag를 True로 변경
+            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
+                break
+        return '\n'.join(tocs).strip()
+
+    def _toc_without_title(self, md_body: str) -> str:
+        """Table of Contents title 없이 바로 목차 리스트가 시작하는 경우에 대한 파싱
+
+        Args:
+            md_body (str): page markdown body
+
+        Returns:
+            str: 목차 문자열 (markdown)
+        """
+        tocs = []
+        toc_start = False  # list가 끝나면 중단하도록 하기 위한 flag
+        for line in md_body.split('\n'):
+            stripped_line = line.strip()
+            if len(stripped_line) > 0 and stripped_line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
+                # *, -, +: ul / 0, 1, 2, .., 9: ol
+                tocs.append(line)
+                if not toc_start:
+                    toc_start = True  # list가 시작되면 flag를 True로 변경
+            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
+                break
+        return '\n'.join(tocs).strip()
+
+    def _body_with_title(self, md_body: str) -> str:
+        """Table of Contents title이 존재하는 경우 body 파싱
+
+        Args:
+            md_body (str): page markdown body
+
+        Returns:
+            str: 목차 문자열 (markdown)
+        """
+        _, after_toc = md_body.split('### Table of Contents')
+        body_lines = []
+        toc_start = False  # list의 종료를 확인하기 위한 flag
+        body_start = False  # list가 종료되면 True로 변경되어서 본문임을 확인할 수 있도록 하는 flag
+        for line in after_toc.split('\n'):
+            line = line.strip()
+            if len(line) > 0 and line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
+                # *, -, +: ul / 0, 1, 2, .., 9: ol
+                if not toc_start:
+                    toc_start = True  # list가 시작되면 flag를 True로 변경
+            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
+                body_start = True  # -> 이후부터 본문 내용
+            if not body_start:  # 아직 본문이 아니라면 아무 작업도 수행하지 않고 계속 진행
+                continue
+            if line.startswith('#') and 'reference' in line.lower():  # Reference 시작하면 탈출
+                break
+            if len(line) == 1 and line[0] == '>':  # 인용문인데 내용이 없는 경우 무시하도록 함
+                continue
+            body_lines.append(line)
+        return '\n'.join(body_lines).strip()
+
+    def _body_without_title(self, md_body: str) -> str:
+        """Table of Contents title이 존재하지 않는 경우 body 파싱
+
+        Args:
+            md_body (str): page markdown body
+
+        Returns:
+            str: 목차 문자열 (markdown)
+        """
+        body_lines = []
+        toc_start = False  # list의 종료를 확인하기 위한 flag
+        body_start = False  # list가 종료되면 True로 변경되어서 본문임을 확인할 수 있도록 하는 flag
+        for line in md_body.split('\n'):
+            line = line.strip()
+            if len(line) > 0 and line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
+                # *, -, +: ul / 0, 1, 2, .., 9: ol
+                if not toc_start:
+                    toc_start = True  # list가 시작되면 flag를 True로 변경
+            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
+                body_start = True  # -> 이후부터 본문 내용
+            if not body_start:  # 아직 본문이 아니라면 아무 작업도 수행하지 않고 계속 진행
+                continue
+            if line.startswith('#') and 'reference' in line.lower():  # Reference 시작하면 탈출
+                break
+            if len(line) == 1 and line[0] == '>':  # 인용문인데 내용이 없는 경우 무시하도록 함
+                continue
+            body_lines.append(line)
+        return '\n'.join(body_lines).strip()
+
+    def title(self, md: str) -> str:
+        for line in md.split('\n'):
+            if line.strip().startswith('#'):  # 문서 본문 중 첫번째로 나오는 title을 가져옴
+                return line.strip().strip('#').strip()
+
+    def abstract(self, md: str) -> str:
+        if '### Table of Contents' in md:
+            return self._abstract_with_title(md)
+        else:
+            return self._abstract_without_title(md)
+
+    def toc(self, md: str) -> str:
+        if '### Table of Contents' in md:
+            return self._toc_with_title(md)
+        else:
+            return self._toc_without_title(md)
+
+    def body(self, md: str) -> str:
+        if '### Table of Contents' in md:
+            return self._body_with_title(md)
+        else:
+            return self._body_without_title(md)
+
+    def references(self, md: str) -> str:
+        lines = []
+        is_reference = False
+        for line in md.split('\n'):
+            if line.startswith('#') and 'reference' in line.lower():
+                is_reference = True
+                continue  # 해당 line은 title이므로 다음 line부터 작업
+            if not is_reference:
+                continue
+
+            if line.startswith('#'):  # reference가 끝남
+                break
+            lines.append(line)
+        return '\n'.join(lines).strip()
+
+
+def page_markdowns(html_body: str) -> dict:
+    """IEP extractor들이 사용하는 markdown들을 변환 (측정 대상이 아님)"""
+    page = PageDocument(html_body)
+    return {
+        label: page.markdown({'class_': 'entry-content'}, replacements=replacements, **options)
+        for label, (replacements, options) in (
+            ('title', TITLE_OPTIONS),
+            ('contents', CONTENTS_OPTIONS),
+            ('body', BODY_OPTIONS),
+            ('bibliography', BIBLIOGRAPHY_OPTIONS),
+        )
+    }
+
+
+def run_legacy(legacy: LegacySegments, mds: dict) -> tuple:
+    return (
+        legacy.title(mds['title']),
+        legacy.abstract(mds['title']),
+        legacy.toc(mds['contents']),
+        legacy.body(mds['body']),
+        legacy.references(mds['bibliography']),
+    )
+
+
+def run_segmenter(mds: dict) -> tuple:
+    # IEP extractor들과 같이 title, abstract, 참고문헌은 같은 markdown에서 한 번에 분류
+    text_sections = segment_markdown(mds['title'], IEP.TEXT_SECTIONS)
+    return (
+        text_sections.title,
+        text_sections.abstract,
+        segment_markdown(mds['contents'], ('toc',)).toc,
+        segment_markdown(mds['body'], ('body',)).body,
+        text_sections.references,
+    )
+
+
+def measure(func, *args, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IEP markdown section 분류의 기존 방식과 segment_markdown() 비교')
+    parser.add_argument('root', help='replay_server.py가 제공하는 기록된 page directory')
+    parser.add_argument('--repeat', type=int, default=20, help='page별 반복 측정 횟수')
+    args = parser.parse_args()
+
+    legacy = LegacySegments()
+    pages = legacy_total = segmenter_total = mismatched = 0
+    for uri, path in recorded_pages(args.root):
+        if urlsplit(uri).netloc != 'iep.utm.edu':
+            continue
+        with open(path, encoding='utf-8') as f:
+            try:
+                mds = page_markdowns(f.read())
+            except AttributeError:  # entry-content가 없는 page
+                continue
+        try:
+            expected = run_legacy(legacy, mds)
+        except ValueError:  # Table of Contents title이 여러 개인 page는 기존 방식에서도 실패
+            continue
+        pages += 1
+        if run_segmenter(mds) != expected:
+            mismatched += 1
+            print(f'mismatch: {uri}')
+        legacy_total += measure(run_legacy, legacy, mds, repeat=args.repeat)
+        segmenter_total += measure(run_segmenter, mds, repeat=args.repeat)
+
+    if not pages:
+        print('IEP page가 없음')
+        return
+    legacy_per_page = legacy_total / pages * 1e6
+    segmenter_per_page = segmenter_total / pages * 1e6
+    print(f'{pages} page, {mismatched} mismatched')
+    print(f'legacy:    {legacy_per_page:10.1f} us/page')
+    print(f'segmenter: {segmenter_per_page:10.1f} us/page')
+    print(f'saving:    {legacy_per_page - segmenter_per_page:10.1f} us/page ({1 - segmenter_per_page / legacy_per_page:.1%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Iterator
+
+
+class PageCache:
+    """가져온 page의 html을 디스크에 저장해두는 cache
+
+    body는 내용의 sha256을 이름으로 gzip 압축해서 objects/ 아래에 저장하고 (content-addressed),
+    uri별로 body의 digest와 ETag, Last-Modified를 meta/ 아래에 저장함
+    다음 요청 때 If-None-Match, If-Modified-Since를 보내서 304 응답을 받으면 저장된 body를 사용함
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): cache를 저장할 directory
+        """
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'meta'), exist_ok=True)
+
+    def _meta_path(self, uri: str) -> str:
+        return os.path.join(self.root, 'meta', hashlib.sha256(uri.encode('utf-8')).hexdigest() + '.json')
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest + '.gz')
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        # 여러 thread, process가 동시에 기록해도 깨진 파일이 보이지 않도록 임시 파일을 만든 후 교체
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_meta(self, uri: str) -> dict:
+        """uri에 대해 저장된 정보, 없으면 None
+
+        Args:
+            uri (str): page uri
+
+        Returns:
+            dict: {'uri', 'digest', 'etag', 'last_modified'}
+        """
+        try:
+            with open(self._meta_path(uri), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self, uri: str) -> str:
+        """uri에 대해 저장된 html body, 없으면 None
+
+        Args:
+            uri (str): page uri
+
+        Returns:
+            str: html body
+        """
+        meta = self.get_meta(uri)
+        if meta is None:
+            return None
+        with gzip.open(self._object_path(meta['digest']), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def store(self, uri: str, html_body: str, etag: str = None, last_modified: str = None) -> None:
+        """uri의 html body와 검증용 header 값을 저장
+
+        Args:
+            uri (str): page uri
+            html_body (str): html body
+            etag (str, optional): ETag header 값. Defaults to None.
+            last_modified (str, optional): Last-Modified header 값. Defaults to None.
+        """
+        data = html_body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):  # 같은 내용은 한 번만 저장
+            self._write_atomic(object_path, gzip.compress(data))
+        meta = {'uri': uri, 'digest': digest, 'etag': etag, 'last_modified': last_modified}
+        self._write_atomic(self._meta_path(uri), json.dumps(meta).encode('utf-8'))
+
+    def request_headers(self, uri: str) -> dict:
+        """저장된 page를 재검증하기 위한 조건부 요청 header
+
+        Args:
+            uri (str): page uri
+
+        Returns:
+            dict: If-None-Match, If-Modified-Since header, 저장된 page가 없으면 빈 dict
+        """
+        meta = self.get_meta(uri)
+        if meta is None:
+            return {}
+        headers = {}
+        if meta['etag']:
+            headers['If-None-Match'] = meta['etag']
+        if meta['last_modified']:
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def resolve(self, uri: str, status: int, html_body: str, headers) -> str:
+        """조건부 요청의 응답을 처리, 304면 저장된 body를 반환하고 200이면 새 body를 저장
+
+        Args:
+            uri (str): page uri
+            status (int): 응답 status code
+            html_body (str): 응답 body
+            headers (Mapping): 응답 header
+
+        Returns:
+            str: page의 html body
+        """
+        if status == 304:
+            cached = self.load(uri)
+            if cached is not None:
+                return cached
+        if status == 200:
+            self.store(uri, html_body, headers.get('ETag'), headers.get('Last-Modified'))
+        return html_body
+
+    def uris(self) -> Iterator[str]:
+        """cache에 저장된 모든 page uri
+
+        Yields:
+            str: page uri
+        """
+        meta_dir = os.path.join(self.root, 'meta')
+        for name in sorted(os.listdir(meta_dir)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(meta_dir, name), encoding='utf-8') as f:
+                yield json.load(f)['uri']
@@ -0,0 +1,86 @@
+import hashlib
+import sqlite3
+
+# parse_page() 결과의 column 순서
+FIELDS = ('title', 'abstract', 'contents', 'body', 'bibliography')
+
+# page별로 마지막에 파싱한 html과 각 field의 hash, 다시 스크래핑할 때 바뀐 page와 field를 찾는 데 사용
+# html이 NULL이면 hash를 기록하기 전에 저장된 row로, 다음 스크래핑에서 항상 파싱함
+PAGE_HASH_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS page_hash '
+    f'(uri TEXT PRIMARY KEY, html TEXT, {", ".join(f"{field} TEXT" for field in FIELDS)}, checked_at TEXT)'
+)
+PAGE_HASH_UPSERT_SQL = (
+    f'INSERT INTO page_hash (uri, html, {", ".join(FIELDS)}, checked_at) '
+    f"VALUES (?, ?, {', '.join('?' * len(FIELDS))}, datetime('now')) "
+    'ON CONFLICT(uri) DO UPDATE SET html = excluded.html, '
+    f'{", ".join(f"{field} = excluded.{field}" for field in FIELDS)}, checked_at = excluded.checked_at'
+)
+PAGE_HASH_CHECKED_SQL = "UPDATE page_hash SET checked_at = datetime('now') WHERE uri = ?"
+# page가 처음 저장되면 change가 added, 저장된 page의 field가 바뀌면 modified이고 fields에 바뀐 field 목록을 기록
+CHANGE_LOG_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS change_log (id INTEGER PRIMARY KEY, uri TEXT, change TEXT, fields TEXT, changed_at TEXT)'
+)
+CHANGE_LOG_INSERT_SQL = "INSERT INTO change_log (uri, change, fields, changed_at) VALUES (?, ?, ?, datetime('now'))"
+
+
+def digest(text: str) -> str:
+    """변경 감지에 사용할 hash, 값이 없으면 None
+
+    Args:
+        text (str): html 또는 field 값
+
+    Returns:
+        str: 128bit blake2b hex digest
+    """
+    if text is None:
+        return None
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def field_digests(row: tuple) -> tuple:
+    """parse_page() 결과의 field별 hash"""
+    return tuple(digest(value) for value in row)
+
+
+def changed_fields(old_digests: tuple, new_digests: tuple) -> list[str]:
+    """hash가 달라진 field 이름 목록"""
+    return [field for field, old, new in zip(FIELDS, old_digests, new_digests) if old != new]
+
+
+def create_change_tables(conn: sqlite3.Connection, decompress=None) -> bool:
+    """page_hash, change_log table을 생성, 기존 row가 있는 db에 처음 만들면 저장된 값으로 field hash를 채움
+
+    Args:
+        conn (sqlite3.Connection): scrap table이 있는 connection, transaction 안에서 호출
+        decompress (Callable, optional): 압축된 column 값을 해제하는 함수. Defaults to None.
+
+    Returns:
+        bool: page_hash table을 새로 생성했으면 True
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'page_hash'").fetchone() is not None
+    conn.execute(PAGE_HASH_TABLE_CREATION_SQL)
+    conn.execute(CHANGE_LOG_TABLE_CREATION_SQL)
+    if exists:
+        return False
+    decompress = decompress if decompress is not None else (lambda value: value)
+    rows = conn.execute(f'SELECT uri, {", ".join(FIELDS)} FROM scrap').fetchall()
+    conn.executemany(
+        PAGE_HASH_UPSERT_SQL,
+        [(uri, None, *field_digests(map(decompress, row))) for uri, *row in rows],
+    )
+    return True
+
+
+def load_html_digests(conn: sqlite3.Connection) -> dict:
+    """page별로 마지막에 파싱한 html의 hash
+
+    Args:
+        conn (sqlite3.Connection): scrap table이 있는 connection
+
+    Returns:
+        dict: {uri: html hash}, hash를 기록하지 않은 page는 포함되지 않음
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'page_hash'").fetchone() is None:
+        return {}
+    return dict(conn.execute('SELECT uri, html FROM page_hash WHERE html IS NOT NULL'))
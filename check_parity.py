@@ -0,0 +1,180 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Iterator
+from urllib.parse import urlsplit
+
+from replay_server import recorded_pages
+from wikis import SEP, IEP
+
+SITES = {
+    'plato.stanford.edu': SEP,
+    'iep.utm.edu': IEP,
+}
+FIELDS = ('title', 'abstract', 'contents', 'body', 'bibliography')
+# 기준 revision의 wikis.py로 page들을 추출하는 script, stdin으로 [uri, class 이름, 파일 경로] 목록을 받음
+# baseline의 SiteBase.scrap()과 같이 get_*_in_page에 html body를 전달하고 contents는 json 문자열로 저장함
+EXTRACT_SCRIPT = '''
+import json, sys
+import wikis
+golden = {}
+for uri, class_name, path in json.load(sys.stdin):
+    site = getattr(wikis, class_name)()
+    with open(path, encoding='utf-8') as f:
+        html_body = f.read()
+    try:
+        golden[uri] = [
+            site.get_title_in_page(html_body),
+            site.get_abstract_in_page(html_body),
+            json.dumps(site.get_contents_in_page(html_body)),
+            site.get_body_in_page(html_body),
+            site.get_bibliography_in_page(html_body),
+        ]
+    except Exception:  # 문서가 아닌 page
+        continue
+json.dump(golden, sys.stdout, ensure_ascii=False)
+'''
+
+
+def document_pages(root: str) -> Iterator[tuple[str, type, str]]:
+    """root에 기록된 page 중 SITES에 있는 site의 문서 page, 목차(index) page는 제외
+
+    Args:
+        root (str): 기록된 page directory
+
+    Yields:
+        tuple[str, type, str]: (uri, site class, 파일 경로)
+    """
+    index_uris = {uri for site_cls in SITES.values() for uri in site_cls().get_index_uris()}
+    for uri, path in recorded_pages(root):
+        site_cls = SITES.get(urlsplit(uri).netloc)
+        if site_cls is not None and uri not in index_uris:
+            yield uri, site_cls, path
+
+
+def check_page(site_cls, html_body: str, expected: list = None) -> list[str]:
+    """bs4 backend(markdownify)의 결과를 기준으로 lxml backend들(lxml_markdown)의 결과가 같은지 확인
+
+    Args:
+        site_cls (type[SiteBase]): page의 site class
+        html_body (str): page html body
+        expected (list, optional): 저장해둔 기준 결과, 있으면 bs4 backend의 결과도 함께 비교. Defaults to None.
+
+    Returns:
+        list[str]: 결과가 다른 (backend, field) 설명 목록, 기준 결과가 없으면 None
+    """
+    backends = (('lxml', {'backend': 'lxml'}), ('lxml-partial', {'backend': 'lxml', 'partial_parse': True}))
+    if expected is None:
+        try:
+            expected = site_cls().parse_page(html_body)
+        except Exception:  # 색인 page 등 문서가 아닌 page
+            return None
+    else:
+        backends = (('bs4', {}), *backends)
+    mismatches = []
+    for label, options in backends:
+        try:
+            result = site_cls(**options).parse_page(html_body)
+        except Exception as e:
+            mismatches.append(f'{label}: {e!r}')
+            continue
+        for field, value, expected_value in zip(FIELDS, result, expected):
+            if value != expected_value:
+                mismatches.append(f'{label}: {field}')
+    return mismatches
+
+
+def baseline_revision() -> str:
+    """repository의 첫 commit, bs4 + markdownify pipeline만 있던 baseline"""
+    return subprocess.run(
+        ['git', 'rev-list', '--max-parents=0', 'HEAD'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True, text=True,
+    ).stdout.split()[0]
+
+
+def extract_golden(root: str, revision: str = None) -> dict:
+    """기록된 문서 page들을 revision 시점의 wikis.py(bs4 + markdownify)로 추출
+
+    현재 tree의 추출 결과를 기준으로 삼으면 변경된 extractor끼리 비교하게 되므로,
+    git archive로 꺼낸 revision의 code를 별도 process에서 실행함
+
+    Args:
+        root (str): 기록된 page directory
+        revision (str, optional): 기준 결과를 만들 git revision. Defaults to baseline_revision().
+
+    Returns:
+        dict: {uri: [title, abstract, contents, body, bibliography]}
+    """
+    repository = os.path.dirname(os.path.abspath(__file__))
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', revision or baseline_revision()], cwd=repository, check=True, capture_output=True,
+    ).stdout
+    pages = [[uri, site_cls.__name__, os.path.abspath(path)] for uri, site_cls, path in document_pages(root)]
+    with tempfile.TemporaryDirectory() as checkout:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(checkout)
+        result = subprocess.run(
+            [sys.executable, '-c', EXTRACT_SCRIPT], cwd=checkout, input=json.dumps(pages),
+            check=True, capture_output=True, text=True, encoding='utf-8',
+        )
+    return json.loads(result.stdout)
+
+
+def save_golden(root: str, path: str, revision: str = None) -> int:
+    """기록된 문서 page들의 baseline 추출 결과를 json 파일로 저장
+
+    Args:
+        root (str): 기록된 page directory
+        path (str): 저장할 파일 경로
+        revision (str, optional): 기준 결과를 만들 git revision. Defaults to baseline_revision().
+
+    Returns:
+        int: 저장한 page 수
+    """
+    golden = extract_golden(root, revision)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1)
+    return len(golden)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='기록된 page들에 대해 lxml backend와 bs4 backend의 결과 비교')
+    parser.add_argument('root', help='replay_server.py가 제공하는 기록된 page directory')
+    parser.add_argument('--save-golden', default=None, help='baseline의 bs4 + markdownify 결과를 기준 결과 json 파일로 저장')
+    parser.add_argument(
+        '--revision', default=None, help='--save-golden의 결과를 만들 git revision, 없으면 repository의 첫 commit (baseline)'
+    )
+    parser.add_argument('--golden', default=None, help='--save-golden으로 저장한 파일과 모든 backend의 결과를 비교')
+    args = parser.parse_args()
+
+    if args.save_golden:
+        print(f'{save_golden(args.root, args.save_golden, args.revision)} page saved to {args.save_golden}')
+        return
+    golden = None
+    if args.golden:
+        with open(args.golden, encoding='utf-8') as f:
+            golden = json.load(f)
+
+    checked = failed = 0
+    for uri, site_cls, path in document_pages(args.root):
+        if golden is not None and uri not in golden:
+            continue
+        with open(path, encoding='utf-8') as f:
+            mismatches = check_page(site_cls, f.read(), golden[uri] if golden is not None else None)
+        if mismatches is None:
+            continue
+        checked += 1
+        if mismatches:
+            failed += 1
+            print(f'{uri}: {", ".join(mismatches)}')
+    print(f'{checked} page checked, {failed} page mismatched')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
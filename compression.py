@@ -0,0 +1,357 @@
+import argparse
+import lzma
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from collections import Counter
+from typing import Iterable
+
+# 압축해서 저장하는 scrap table column, 나머지 column은 그대로 TEXT로 저장함
+COMPRESSED_COLUMNS = ('body', 'bibliography')
+METHODS = ('zlib', 'zlib-dict', 'lzma')
+
+# 압축된 값은 BLOB으로 저장하며 첫 byte로 압축 방식을 구분함, TEXT 값은 압축되지 않은 값
+# zlib-dict는 이어지는 4 byte에 compression_dict table의 id를 저장함
+_ZLIB, _LZMA, _ZLIB_DICT = b'\x01', b'\x02', b'\x03'
+_DICT_ID = struct.Struct('>I')
+DICTIONARY_SIZE = 32 * 1024  # zlib이 사용할 수 있는 최대 dictionary 크기
+# 스크래핑하면서 dictionary를 학습할 때 필요한 최소 문서 수, 그 전까지는 압축하지 않고 TEXT로 저장함
+# 몇 개의 문서로 학습하면 여러 문서에 반복되는 구절이 거의 없어서 dictionary가 비어있게 됨
+MIN_DICTIONARY_SAMPLES = 100
+
+DICTIONARY_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS compression_dict (id INTEGER PRIMARY KEY, data BLOB, created_at TEXT)'
+)
+DICTIONARY_INSERT_SQL = "INSERT INTO compression_dict (data, created_at) VALUES (?, datetime('now'))"
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE, sample_size: int = 16 * 1024) -> bytes:
+    """여러 문서에 공통으로 나오는 구절을 모아서 zlib preset dictionary를 만듦
+
+    문서마다 앞부분 sample_size 글자에서 2 ~ 8 단어로 된 구절을 모으고,
+    여러 문서에 나온 구절을 (문서 수 - 1) * 길이 순서로 size만큼 고름
+    zlib은 dictionary의 뒤쪽을 더 짧은 거리로 참조하므로 가치가 높은 구절을 뒤에 배치함
+
+    Args:
+        samples (Iterable[str]): 학습에 사용할 문서들
+        size (int, optional): dictionary 최대 크기 (byte). Defaults to DICTIONARY_SIZE.
+        sample_size (int, optional): 문서별로 사용할 최대 글자 수. Defaults to 16 * 1024.
+
+    Returns:
+        bytes: dictionary
+    """
+    document_counts = Counter()
+    for text in samples:
+        words = text[:sample_size].split()
+        phrases = set()
+        for n in (2, 3, 5, 8):
+            phrases.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+        document_counts.update(phrases)
+
+    candidates = sorted(
+        ((count - 1) * len(phrase), phrase) for phrase, count in document_counts.items() if count > 1
+    )
+    selected = []
+    total = 0
+    for _, phrase in reversed(candidates):
+        data = phrase.encode('utf-8') + b' '
+        if total + len(data) > size:
+            continue
+        if any(phrase in each for each in selected[-64:]):  # 바로 앞에 고른 긴 구절에 포함된 구절은 제외
+            continue
+        selected.append(phrase)
+        total += len(data)
+    return b''.join(phrase.encode('utf-8') + b' ' for phrase in reversed(selected))
+
+
+class ColumnCodec:
+    """scrap table의 큰 text column을 압축하고, 압축된 값을 투명하게 해제하는 codec
+
+    connection에 decompress() SQL 함수를 등록하므로 SQL에서도 decompress(body)로 읽을 수 있음
+    압축되지 않은 TEXT 값은 그대로 반환하므로 압축 방식이 섞인 db도 읽을 수 있음
+    """
+
+    def __init__(self, conn: sqlite3.Connection, method: str = None):
+        """
+        Args:
+            conn (sqlite3.Connection): scrap table이 있는 connection
+            method (str, optional): 새로 저장할 값의 압축 방식, zlib, zlib-dict, lzma 중 하나. 없으면 압축하지 않음.
+                Defaults to None.
+        """
+        if method is not None and method not in METHODS:
+            raise ValueError(f'지원하지 않는 압축 방식: {method}')
+        self.method = method
+        self.conn = conn
+        self.dictionaries = {}
+        self.dictionary_id = None
+        self.reload()
+        conn.create_function('decompress', 1, self.decompress, deterministic=True)
+
+    def reload(self) -> None:
+        """같은 db에 다른 connection이 학습해서 저장한 dictionary를 읽음
+
+        다른 process의 writer가 학습한 dictionary로 압축된 row도 해제할 수 있도록,
+        writer는 쓰기 lock을 잡은 후 needs_dictionary를 확인하기 전에 호출함
+        """
+        has_table = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'compression_dict'").fetchone()
+        if not has_table:
+            return
+        known = max(self.dictionaries, default=0)
+        self.dictionaries.update(self.conn.execute('SELECT id, data FROM compression_dict WHERE id > ?', (known,)))
+        # zlib-dict는 가장 최근에 학습한 dictionary로 압축
+        self.dictionary_id = max(self.dictionaries) if self.dictionaries else None
+
+    @property
+    def needs_dictionary(self) -> bool:
+        return self.method == 'zlib-dict' and self.dictionary_id is None
+
+    def train(self, conn: sqlite3.Connection, samples: Iterable[str]) -> int:
+        """samples로 dictionary를 학습해서 저장하고 이후 압축에 사용, transaction 안에서 호출
+
+        Args:
+            conn (sqlite3.Connection): scrap table이 있는 connection
+            samples (Iterable[str]): 학습에 사용할 문서들
+
+        Returns:
+            int: 저장한 dictionary의 id
+        """
+        data = train_dictionary(samples)
+        conn.execute(DICTIONARY_TABLE_CREATION_SQL)
+        dictionary_id = conn.execute(DICTIONARY_INSERT_SQL, (data,)).lastrowid
+        self.dictionaries[dictionary_id] = data
+        self.dictionary_id = dictionary_id
+        return dictionary_id
+
+    def train_from_scrap(self, conn: sqlite3.Connection, min_samples: int = 0, max_samples: int = 2000) -> bool:
+        """scrap table에서 body가 있는 문서 max_samples개를 골라서 dictionary를 학습, transaction 안에서 호출
+
+        같은 dictionary로 압축하는 bibliography도 출판사, 학술지 이름 등이 문서마다 반복되므로 body와 함께 학습함
+
+        Args:
+            conn (sqlite3.Connection): scrap table이 있는 connection
+            min_samples (int, optional): body가 있는 문서가 이보다 적으면 학습하지 않음. Defaults to 0.
+            max_samples (int, optional): 학습에 사용할 최대 문서 수. Defaults to 2000.
+
+        Returns:
+            bool: 학습했으면 True
+        """
+        rows = conn.execute(
+            f'SELECT {", ".join(f"decompress({column})" for column in COMPRESSED_COLUMNS)} FROM scrap '
+            "WHERE body IS NOT NULL AND body != '' ORDER BY random() LIMIT ?",
+            (max_samples,),
+        ).fetchall()
+        if len(rows) < min_samples:
+            return False
+        self.train(conn, [value for row in rows for value in row if value])
+        return True
+
+    def compress_stored(self, conn: sqlite3.Connection) -> int:
+        """압축하지 않고 TEXT로 저장된 body, bibliography를 현재 방식으로 압축, transaction 안에서 호출
+
+        Args:
+            conn (sqlite3.Connection): scrap table이 있는 connection
+
+        Returns:
+            int: 압축한 row 수
+        """
+        condition = ' OR '.join(f"typeof({column}) = 'text'" for column in COMPRESSED_COLUMNS)
+        rows = conn.execute(f'SELECT id, {", ".join(COMPRESSED_COLUMNS)} FROM scrap WHERE {condition}').fetchall()
+        conn.executemany(
+            f'UPDATE scrap SET {", ".join(f"{column} = ?" for column in COMPRESSED_COLUMNS)} WHERE id = ?',
+            [(*(self.compress(self.decompress(value)) for value in values), row_id) for row_id, *values in rows],
+        )
+        return len(rows)
+
+    def compress(self, text: str):
+        """method로 text를 압축, method가 없거나 값이 없으면 그대로 반환
+
+        zlib-dict는 dictionary를 학습하기 전까지 그대로 반환하며, 학습한 뒤 compress_stored()로 압축함
+
+        Args:
+            text (str): 압축할 값
+
+        Returns:
+            bytes | str: 압축된 값
+        """
+        if self.method is None or text is None:
+            return text
+        data = text.encode('utf-8')
+        if self.method == 'zlib':
+            return _ZLIB + zlib.compress(data)
+        if self.method == 'lzma':
+            return _LZMA + lzma.compress(data)
+        if self.dictionary_id is None:
+            return text
+        compressor = zlib.compressobj(zdict=self.dictionaries[self.dictionary_id])
+        return _ZLIB_DICT + _DICT_ID.pack(self.dictionary_id) + compressor.compress(data) + compressor.flush()
+
+    def decompress(self, value):
+        """압축된 값을 해제, TEXT 값이면 그대로 반환
+
+        Args:
+            value (bytes | str): column 값
+
+        Returns:
+            str: 해제된 값
+        """
+        if not isinstance(value, bytes):
+            return value
+        header, payload = value[:1], value[1:]
+        if header == _ZLIB:
+            data = zlib.decompress(payload)
+        elif header == _LZMA:
+            data = lzma.decompress(payload)
+        elif header == _ZLIB_DICT:
+            dictionary_id, = _DICT_ID.unpack_from(payload)
+            if dictionary_id not in self.dictionaries:  # 이 codec을 만든 후 다른 connection이 학습한 dictionary
+                self.reload()
+            if dictionary_id not in self.dictionaries:
+                raise ValueError(f'알 수 없는 dictionary: {dictionary_id}')
+            decompressor = zlib.decompressobj(zdict=self.dictionaries[dictionary_id])
+            data = decompressor.decompress(payload[_DICT_ID.size:]) + decompressor.flush()
+        else:
+            raise ValueError(f'알 수 없는 압축 형식: {header!r}')
+        return data.decode('utf-8')
+
+    def compress_column(self, column: str, value: str):
+        """COMPRESSED_COLUMNS에 속한 column의 값만 압축"""
+        return self.compress(value) if column in COMPRESSED_COLUMNS else value
+
+    def compress_row(self, row: tuple) -> tuple:
+        """parse_page() 결과 (title, abstract, contents, body, bibliography)의 body, bibliography를 압축"""
+        title, abstract, contents, body, bibliography = row
+        return title, abstract, contents, self.compress(body), self.compress(bibliography)
+
+
+def connect(path: str, readonly: bool = False, **kwargs) -> sqlite3.Connection:
+    """decompress() SQL 함수가 등록된 connection, 압축된 db를 읽는 모든 곳에서 사용
+
+    Args:
+        path (str): sqlite3 파일 경로
+        readonly (bool, optional): 읽기 전용으로 연결. Defaults to False.
+        **kwargs: sqlite3.connect()에 전달할 인자
+
+    Returns:
+        sqlite3.Connection: connection
+    """
+    if readonly:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, **kwargs)
+    else:
+        conn = sqlite3.connect(path, **kwargs)
+    ColumnCodec(conn)
+    return conn
+
+
+def migrate(path: str, method: str = None, chunk_size: int = 500, dictionary_samples: int = 2000) -> None:
+    """기존 db의 body, bibliography를 method로 다시 저장, method가 없으면 압축을 해제함
+
+    Args:
+        path (str): sqlite3 파일 경로
+        method (str, optional): zlib, zlib-dict, lzma 중 하나, 없으면 압축 해제. Defaults to None.
+        chunk_size (int, optional): 한 transaction에서 갱신할 row 수. Defaults to 500.
+        dictionary_samples (int, optional): zlib-dict의 dictionary 학습에 사용할 문서 수. Defaults to 2000.
+    """
+    conn = sqlite3.connect(path)
+    codec = ColumnCodec(conn, method)
+    if method == 'zlib-dict':  # 기존 dictionary가 있더라도 현재 corpus로 다시 학습
+        with conn:
+            codec.train_from_scrap(conn, max_samples=dictionary_samples)
+    ids = [row_id for row_id, in conn.execute('SELECT id FROM scrap ORDER BY id')]
+    columns = ', '.join(COMPRESSED_COLUMNS)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows = conn.execute(
+            f'SELECT id, {columns} FROM scrap WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+        ).fetchall()
+        with conn:  # 검색 index trigger도 같은 transaction에서 갱신됨
+            conn.executemany(
+                f'UPDATE scrap SET {", ".join(f"{column} = ?" for column in COMPRESSED_COLUMNS)} WHERE id = ?',
+                [(*(codec.compress(codec.decompress(value)) for value in values), row_id) for row_id, *values in rows],
+            )
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'scrap_fts'").fetchone():
+        with conn:  # trigger로 쌓인 검색 index segment를 합침
+            conn.execute("INSERT INTO scrap_fts (scrap_fts) VALUES ('optimize')")
+    conn.execute('VACUUM')  # 줄어든 page를 파일에서 반환
+    conn.close()
+
+
+def benchmark(path: str, methods: tuple = (None, *METHODS)) -> list[dict]:
+    """db를 복사해서 압축 방식별로 파일 크기와 전체 body, bibliography의 해제 속도를 측정
+
+    Args:
+        path (str): sqlite3 파일 경로
+        methods (tuple, optional): 측정할 압축 방식, None은 압축하지 않음. Defaults to 전체.
+
+    Returns:
+        list[dict]: 압축 방식별 {'method', 'size', 'migrate_seconds', 'decode_seconds', 'decoded_bytes'}
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for method in methods:
+            copy_path = os.path.join(tmp_dir, f'{method or "none"}.db')
+            shutil.copyfile(path, copy_path)
+            start = time.perf_counter()
+            migrate(copy_path, method)
+            migrate_seconds = time.perf_counter() - start
+
+            conn = sqlite3.connect(copy_path)
+            codec = ColumnCodec(conn)
+            values = [value for row in conn.execute(f'SELECT {", ".join(COMPRESSED_COLUMNS)} FROM scrap') for value in row]
+            conn.close()
+            start = time.perf_counter()
+            texts = [codec.decompress(value) for value in values if value is not None]
+            decode_seconds = time.perf_counter() - start
+            results.append({
+                'method': method or 'none',
+                'size': os.path.getsize(copy_path),
+                'migrate_seconds': migrate_seconds,
+                'decode_seconds': decode_seconds,
+                'decoded_bytes': sum(len(text.encode('utf-8')) for text in texts),
+            })
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='scrap table의 body, bibliography 압축 migration과 benchmark')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help='기존 db를 지정한 방식으로 다시 저장')
+    migrate_parser.add_argument('paths', nargs='+', help='sqlite3 파일 경로, ex) sep.db iep.db')
+    migrate_parser.add_argument(
+        '--method', choices=(*METHODS, 'none'), required=True, help='압축 방식, none이면 압축을 해제'
+    )
+    bench_parser = subparsers.add_parser('bench', help='압축 방식별 파일 크기와 해제 속도 비교')
+    bench_parser.add_argument('paths', nargs='+', help='sqlite3 파일 경로')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for path in args.paths:
+        if args.command == 'migrate':
+            before = os.path.getsize(path)
+            start = time.perf_counter()
+            migrate(path, None if args.method == 'none' else args.method)
+            after = os.path.getsize(path)
+            print(
+                f'{path}: {before / 2 ** 20:.1f} MB -> {after / 2 ** 20:.1f} MB '
+                f'({after / before:.0%}) in {time.perf_counter() - start:.1f}s'
+            )
+            continue
+        print(f'== {path}')
+        print(f'{"method":<10} {"size (MB)":>10} {"ratio":>7} {"migrate (s)":>12} {"decode (MB/s)":>14}')
+        results = benchmark(path)
+        base_size = results[0]['size']
+        for each in results:
+            throughput = each['decoded_bytes'] / 2 ** 20 / each['decode_seconds'] if each['decode_seconds'] else 0.0
+            print(
+                f'{each["method"]:<10} {each["size"] / 2 ** 20:10.1f} {each["size"] / base_size:7.1%} '
+                f'{each["migrate_seconds"]:12.1f} {throughput:14.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
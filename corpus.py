@@ -0,0 +1,228 @@
+import argparse
+import os
+import sqlite3
+import time
+from typing import Iterator
+
+from compression import COMPRESSED_COLUMNS, ColumnCodec
+
+CORPUS_COLUMNS = ('uri', 'title', 'abstract', 'contents', 'body', 'bibliography')
+# site별 db의 scrap table을 source column으로 구분해서 합친 table, body, bibliography는 압축을 해제해서 저장함
+CORPUS_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS corpus (id INTEGER PRIMARY KEY, source TEXT NOT NULL, uri TEXT NOT NULL, '
+    'title TEXT, abstract TEXT, contents TEXT, body TEXT, bibliography TEXT, updated_at TEXT, UNIQUE (source, uri))'
+)
+# (source, uri)는 unique 제약의 index를 사용, title로 여러 site의 같은 항목을 찾는 query를 위한 index
+CORPUS_INDEX_SQLS = ('CREATE INDEX IF NOT EXISTS corpus_title ON corpus (title, source)',)
+# source별로 마지막에 합친 change_log id, 다음에는 이후에 바뀐 page만 합침
+SOURCE_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS corpus_source (source TEXT PRIMARY KEY, path TEXT, last_change_id INTEGER, merged_at TEXT)'
+)
+SOURCE_UPSERT_SQL = (
+    "INSERT INTO corpus_source (source, path, last_change_id, merged_at) VALUES (?, ?, ?, datetime('now')) "
+    'ON CONFLICT(source) DO UPDATE SET path = excluded.path, last_change_id = excluded.last_change_id, '
+    'merged_at = excluded.merged_at'
+)
+# 값이 같은 row는 갱신하지 않으므로 변경 없는 page를 다시 합쳐도 쓰기가 일어나지 않음
+MERGE_SQL = (
+    f'INSERT INTO corpus (source, {", ".join(CORPUS_COLUMNS)}, updated_at) '
+    'SELECT ?, uri, title, abstract, contents, {name}_decompress(body), {name}_decompress(bibliography), '
+    "datetime('now') FROM {name}.scrap WHERE {condition} "
+    'ON CONFLICT(source, uri) DO UPDATE SET '
+    f'{", ".join(f"{column} = excluded.{column}" for column in CORPUS_COLUMNS[1:])}, updated_at = excluded.updated_at '
+    f'WHERE ({", ".join(f"corpus.{column}" for column in CORPUS_COLUMNS[1:])}) '
+    f'IS NOT ({", ".join(f"excluded.{column}" for column in CORPUS_COLUMNS[1:])})'
+)
+# 처음 합치거나 source db를 새로 만든 경우, source에 없는 page는 corpus에서도 지움
+PRUNE_SQL = 'DELETE FROM corpus WHERE source = ? AND uri NOT IN (SELECT uri FROM {name}.scrap)'
+
+
+def attach_source(conn: sqlite3.Connection, name: str, path: str) -> None:
+    """site별 db를 name으로 ATTACH 하고, 그 db의 압축을 해제하는 {name}_decompress() SQL 함수를 등록
+
+    zlib-dict dictionary는 db마다 다르므로 source별로 함수를 따로 등록함
+
+    Args:
+        conn (sqlite3.Connection): corpus db 또는 in-memory connection
+        name (str): source 이름, SQL에서 schema 이름으로 사용됨
+        path (str): site별 sqlite3 파일 경로
+
+    Raises:
+        ValueError: name을 schema 이름으로 사용할 수 없는 경우
+        FileNotFoundError: path가 없는 경우
+    """
+    if not name.isidentifier() or name.lower() in ('main', 'temp'):
+        raise ValueError(f'source 이름으로 사용할 수 없음: {name}')
+    if not os.path.exists(path):  # ATTACH는 없는 파일을 빈 db로 만들므로 미리 확인
+        raise FileNotFoundError(path)
+    source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    codec = ColumnCodec(source)  # source db의 dictionary를 읽어둠
+    source.close()
+    conn.create_function(f'{name}_decompress', 1, codec.decompress, deterministic=True)
+    conn.execute(f'ATTACH DATABASE ? AS {name}', (path,))
+
+
+def create_corpus_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(CORPUS_TABLE_CREATION_SQL)
+    for sql in CORPUS_INDEX_SQLS:
+        conn.execute(sql)
+    conn.execute(SOURCE_TABLE_CREATION_SQL)
+
+
+def merge_source(conn: sqlite3.Connection, name: str, path: str) -> int:
+    """site별 db의 scrap table을 corpus table에 upsert, source 하나를 하나의 transaction으로 합침
+
+    이전에 합친 이후의 change_log에 기록된 page만 합치고, 처음 합치거나 change_log가 없거나
+    source db를 새로 만들어서 change_log id가 줄어든 경우에는 전체 page를 합침
+
+    Args:
+        conn (sqlite3.Connection): corpus table이 있는 connection
+        name (str): source 이름
+        path (str): site별 sqlite3 파일 경로
+
+    Returns:
+        int: 추가, 갱신, 삭제된 corpus row 수
+    """
+    attach_source(conn, name, path)
+    try:
+        with conn:
+            return _merge_attached(conn, name, path)
+    finally:  # DETACH는 transaction 밖에서만 가능
+        conn.execute(f'DETACH DATABASE {name}')
+
+
+def _merge_attached(conn: sqlite3.Connection, name: str, path: str) -> int:
+    has_change_log = conn.execute(f"SELECT 1 FROM {name}.sqlite_master WHERE name = 'change_log'").fetchone() is not None
+    last_change_id = conn.execute(f'SELECT MAX(id) FROM {name}.change_log').fetchone()[0] if has_change_log else None
+    merged = conn.execute('SELECT last_change_id FROM corpus_source WHERE source = ?', (name,)).fetchone()
+    before = conn.total_changes
+    if merged and merged[0] is not None and last_change_id is not None and last_change_id >= merged[0]:
+        conn.execute(
+            MERGE_SQL.format(name=name, condition=f'uri IN (SELECT uri FROM {name}.change_log WHERE id > ?)'),
+            (name, merged[0]),
+        )
+    else:
+        conn.execute(MERGE_SQL.format(name=name, condition='true'), (name,))
+        conn.execute(PRUNE_SQL.format(name=name), (name,))
+    changes = conn.total_changes - before
+    conn.execute(SOURCE_UPSERT_SQL, (name, os.path.abspath(path), last_change_id))
+    return changes
+
+
+def build_corpus(path: str, sources: dict) -> dict:
+    """site별 db들을 corpus db에 합침, 이미 있는 corpus db는 바뀐 page만 갱신
+
+    Args:
+        path (str): corpus sqlite3 파일 경로
+        sources (dict): {source 이름: site별 sqlite3 파일 경로}
+
+    Returns:
+        dict: {source 이름: 추가, 갱신, 삭제된 row 수}
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    changes = {}
+    try:
+        with conn:
+            create_corpus_tables(conn)
+        for name, source_path in sources.items():
+            changes[name] = merge_source(conn, name, source_path)
+    finally:
+        conn.close()
+    return changes
+
+
+def iter_corpus(
+    columns: tuple,
+    corpus_path: str = None,
+    sources: dict = None,
+    chunk_size: int = 1000,
+) -> Iterator[tuple]:
+    """(source, *columns) row를 chunk_size 개씩 읽어서 반환, 한 번의 순차 scan으로 모든 source를 읽음
+
+    corpus_path가 있으면 corpus table에서 sources에 해당하는 row를 읽고,
+    없으면 sources의 site별 db를 ATTACH 해서 UNION ALL로 이어서 읽음
+
+    Args:
+        columns (tuple): CORPUS_COLUMNS 중 읽을 column
+        corpus_path (str, optional): corpus sqlite3 파일 경로. Defaults to None.
+        sources (dict, optional): {source 이름: site별 sqlite3 파일 경로}, corpus_path가 있으면 이름만 사용하고 없으면 모든 source.
+            Defaults to None.
+        chunk_size (int, optional): db에서 한 번에 읽을 row 수. Defaults to 1000.
+
+    Yields:
+        tuple: (source, *columns)
+    """
+    unknown = set(columns) - set(CORPUS_COLUMNS)
+    if unknown:
+        raise ValueError(f'알 수 없는 column: {", ".join(sorted(unknown))}')
+    if corpus_path is not None:
+        conn = sqlite3.connect(f'file:{corpus_path}?mode=ro', uri=True)
+        sql = f'SELECT source, {", ".join(columns)} FROM corpus'
+        params = tuple(sources or ())
+        if params:
+            sql += f' WHERE source IN ({", ".join("?" * len(params))})'
+    else:
+        conn = sqlite3.connect(':memory:')
+        for name, path in sources.items():
+            attach_source(conn, name, path)
+        params = ()
+        sql = ' UNION ALL '.join(
+            'SELECT ' + ', '.join(
+                [f"'{name}'"] + [f'{name}_decompress({column})' if column in COMPRESSED_COLUMNS else column for column in columns]
+            ) + f' FROM {name}.scrap'
+            for name in sources
+        )
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def source_paths(db_dir: str, names: tuple = None, plugins: tuple = ()) -> dict:
+    """{source 이름: {db_dir}/{이름}.db}
+
+    Args:
+        db_dir (str): site별 db가 있는 directory
+        names (tuple, optional): source 이름, 없으면 db 파일이 있는 등록된 모든 site. Defaults to None.
+        plugins (tuple, optional): names가 없을 때 site를 등록할 plugin module. Defaults to ().
+
+    Returns:
+        dict: {source 이름: sqlite3 파일 경로}
+    """
+    if names:
+        return {name: os.path.join(db_dir, f'{name}.db') for name in names}
+    from registry import load_plugins  # site module은 등록된 이름이 필요할 때만 불러옴
+
+    paths = {name: os.path.join(db_dir, f'{name}.db') for name in load_plugins(plugins)}
+    return {name: path for name, path in paths.items() if os.path.exists(path)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='site별 db를 source column이 있는 하나의 corpus db로 합침')
+    parser.add_argument('--output', default='corpus.db', help='corpus db 경로')
+    parser.add_argument('--db-dir', default='.', help='site별 db({site}.db)가 있는 directory')
+    parser.add_argument('--sources', nargs='+', default=None, help='합칠 site 이름, 없으면 db 파일이 있는 등록된 모든 site')
+    parser.add_argument(
+        '--plugin', dest='plugins', action='append', default=[], help='register_site()로 site를 등록하는 module, 여러 번 지정 가능'
+    )
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    sources = source_paths(options.db_dir, options.sources, options.plugins)
+    start = time.perf_counter()
+    changes = build_corpus(options.output, sources)
+    for name, count in changes.items():
+        print(f'{name}: {count} rows changed')
+    print(f'{options.output}: merged {len(sources)} sources in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
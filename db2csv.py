@@ -1,21 +1,25 @@
+import argparse
 import csv
-import sqlite3
-import sys
 
+from corpus import iter_corpus, source_paths
 
-def read_data_from_db(path):
-    conn = sqlite3.connect(path, isolation_level=None)
-    cur = conn.cursor()
-    data = cur.execute('SELECT title, body FROM scrap').fetchall()
-    return data
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='sep.db, iep.db 등의 source, title, body를 csv로 변환')
+    parser.add_argument('--output', default='title_body.csv', help='결과 파일 경로')
+    parser.add_argument('--corpus', default=None, help='corpus.py로 합친 corpus db, 없으면 site별 db를 UNION ALL로 읽음')
+    parser.add_argument('--db-dir', default='.', help='site별 db({site}.db)가 있는 directory')
+    parser.add_argument('--sources', nargs='+', default=None, help='변환할 site 이름, 없으면 모든 site')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='db에서 한 번에 읽을 row 수')
+    return parser.parse_args()
 
 def main():
-    sep = read_data_from_db('./sep.db')
-    iep = read_data_from_db('./iep.db')
-    data = sep + iep
-    with open('title_body.csv', 'w') as f:
+    options = parse_args()
+    sources = options.sources if options.corpus else source_paths(options.db_dir, options.sources)
+    rows = iter_corpus(('title', 'body'), options.corpus, sources, options.chunk_size)
+    with open(options.output, 'w') as f:
         writer = csv.writer(f)
-        writer.writerows(data)
+        writer.writerows(rows)
 
 if __name__ == '__main__':
     main()
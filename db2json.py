@@ -1,30 +1,53 @@
+import argparse
 import json
-import sqlite3
-import sys
-
-
-def read_data_from_db(path):
-    conn = sqlite3.connect(path, isolation_level=None)
-    cur = conn.cursor()
-    data = cur.execute('SELECT title, abstract, contents FROM scrap').fetchall()
-    return [dict(zip(('title', 'abstract', 'contents'), each)) for each in data]
-
-def reformat(db_list):
-    data = []
-    for each in db_list:
-        data.append({
-            'title': each['title'],
-            'contents': json.loads(each['contents']),
-            'abstract': each['abstract'].strip(),
-        })
-    return data
+import textwrap
+
+from corpus import iter_corpus, source_paths
+
+
+def reformat(rows):
+    for source, title, abstract, contents in rows:
+        yield {
+            'source': source,
+            'title': title,
+            'contents': json.loads(contents),
+            'abstract': abstract.strip(),
+        }
+
+def write_json(data, f):
+    """json.dump(data, f, indent=4)와 같은 결과를 항목 하나씩 기록"""
+    first = True
+    for each in data:
+        f.write('[\n' if first else ',\n')
+        f.write(textwrap.indent(json.dumps(each, indent=4, ensure_ascii=False), ' ' * 4))
+        first = False
+    f.write('[]' if first else '\n]')
+
+def write_jsonl(data, f):
+    for each in data:
+        f.write(json.dumps(each, ensure_ascii=False))
+        f.write('\n')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='sep.db, iep.db 등의 source, title, abstract, contents를 json으로 변환')
+    parser.add_argument('--jsonl', action='store_true', help='한 줄에 문서 하나씩 기록하는 JSON Lines 형식으로 저장')
+    parser.add_argument('--output', default=None, help='결과 파일 경로')
+    parser.add_argument('--corpus', default=None, help='corpus.py로 합친 corpus db, 없으면 site별 db를 UNION ALL로 읽음')
+    parser.add_argument('--db-dir', default='.', help='site별 db({site}.db)가 있는 directory')
+    parser.add_argument('--sources', nargs='+', default=None, help='변환할 site 이름, 없으면 모든 site')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='db에서 한 번에 읽을 row 수')
+    return parser.parse_args()
 
 def main():
-    sep = read_data_from_db('./sep.db')
-    iep = read_data_from_db('./iep.db')
-    data = reformat(sep + iep)
-    with open('title_abstract_contents.json', 'w') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    options = parse_args()
+    sources = options.sources if options.corpus else source_paths(options.db_dir, options.sources)
+    data = reformat(iter_corpus(('title', 'abstract', 'contents'), options.corpus, sources, options.chunk_size))
+    output = options.output or ('title_abstract_contents.jsonl' if options.jsonl else 'title_abstract_contents.json')
+    with open(output, 'w') as f:
+        if options.jsonl:
+            write_jsonl(data, f)
+        else:
+            write_json(data, f)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,60 @@
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_uri(uri: str) -> str:
+    """같은 page를 가리키는 uri들이 같은 문자열이 되도록 정규화
+
+    scheme, host는 소문자로, 기본 port와 fragment는 제거하고 연속된 slash는 하나로 합침
+    확장자가 없는 directory 형태의 path는 trailing slash로 끝나도록 통일함
+    ex) HTTPS://IEP.utm.edu:443/aristotle#H2 -> https://iep.utm.edu/aristotle/
+
+    Args:
+        uri (str): 절대 주소 형식의 uri
+
+    Returns:
+        str: 정규화된 uri
+    """
+    parts = urlsplit(uri.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if parts.port is not None and parts.port == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = re.sub('/{2,}', '/', parts.path) or '/'
+    if not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]:
+        path += '/'
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+class UriSet:
+    """이미 발견한 page uri를 정규화된 형태로 기억해서 같은 page를 한 번만 반환하도록 함"""
+
+    def __init__(self, uris=()):
+        """
+        Args:
+            uris (Iterable[str], optional): 이미 처리한 것으로 볼 uri 목록. Defaults to ().
+        """
+        self._seen = {normalize_uri(uri) for uri in uris}
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, uri: str) -> bool:
+        return normalize_uri(uri) in self._seen
+
+    def add(self, uri: str) -> str:
+        """처음 발견한 uri면 정규화된 uri를 반환하고, 이미 발견한 uri면 None을 반환
+
+        Args:
+            uri (str): 발견한 uri
+
+        Returns:
+            str: 정규화된 uri 또는 None
+        """
+        uri = normalize_uri(uri)
+        if uri in self._seen:
+            return None
+        self._seen.add(uri)
+        return uri
@@ -0,0 +1,284 @@
+import codecs
+import html
+from functools import cached_property
+
+from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+from markdownify import markdownify
+
+from lxml_markdown import convert_element
+
+
+class PageDocument:
+    """한 page의 html을 한 번만 파싱해서 모든 extractor가 공유하도록 하는 객체
+
+    BeautifulSoup tree, subtree 탐색 결과, markdown 변환 결과를 모두 memoize 하므로
+    같은 page에 대해 여러 get_*_in_page 메소드를 호출해도 파싱/변환은 한 번씩만 수행됨
+    """
+
+    def __init__(self, html_body: str):
+        self.html_body = html_body
+        self._nodes = {}
+        self._inner_htmls = {}
+        self._markdowns = {}
+        self._derived = {}
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        return BeautifulSoup(self.html_body, 'lxml')
+
+    @staticmethod
+    def _selector_key(name, attrs: dict) -> tuple:
+        return name, tuple(sorted(attrs.items()))
+
+    def _find(self, name, attrs: dict):
+        return self.soup.find(name, **attrs)
+
+    def _text(self, node) -> str:
+        return node.text
+
+    def _decode_contents(self, node) -> str:
+        return node.decode_contents()
+
+    def find(self, name=None, **attrs):
+        """soup.find()와 같지만 결과를 memoize 함
+
+        Args:
+            name (str, optional): tag 이름. Defaults to None.
+
+        Returns:
+            bs4.Tag | None: 처음 찾은 tag
+        """
+        key = self._selector_key(name, attrs)
+        if key not in self._nodes:
+            self._nodes[key] = self._find(name, attrs)
+        return self._nodes[key]
+
+    def text(self, name=None, **attrs) -> str:
+        """find()로 찾은 tag의 모든 text를 이어붙여서 반환 (bs4의 Tag.text)
+
+        Args:
+            name (str, optional): tag 이름. Defaults to None.
+
+        Returns:
+            str: tag의 text
+        """
+        return self._text(self.find(name, **attrs))
+
+    def inner_html(self, name=None, **attrs) -> str:
+        """find()로 찾은 tag의 내부 html(decode_contents)을 memoize 해서 반환
+
+        Args:
+            name (str, optional): tag 이름. Defaults to None.
+
+        Returns:
+            str: tag의 내부 html
+        """
+        key = self._selector_key(name, attrs)
+        if key not in self._inner_htmls:
+            self._inner_htmls[key] = self._decode_contents(self.find(name, **attrs))
+        return self._inner_htmls[key]
+
+    def markdown(self, selector: dict, replacements: tuple = (), **options) -> str:
+        """selector로 찾은 tag의 내부 html을 markdown으로 변환, 같은 인자의 변환은 한 번만 수행
+
+        Args:
+            selector (dict): find()에 전달할 인자, tag 이름은 'name' key로 전달
+            replacements (tuple, optional): 변환 전 내부 html에 적용할 (old, new) 쌍 목록. Defaults to ().
+            **options: markdownify 옵션 (strip, bullets, heading_style, ...)
+
+        Returns:
+            str: 변환된 markdown
+        """
+        selector = dict(selector)
+        name = selector.pop('name', None)
+        # strip 등의 list 옵션은 순서와 무관하므로 정렬해서 key로 사용
+        option_key = tuple(sorted((k, tuple(sorted(v)) if isinstance(v, list) else v) for k, v in options.items()))
+        key = (self._selector_key(name, selector), tuple(replacements), option_key)
+        if key not in self._markdowns:
+            self._markdowns[key] = self._convert_markdown(name, selector, replacements, options)
+        return self._markdowns[key]
+
+    def _convert_markdown(self, name, selector: dict, replacements: tuple, options: dict) -> str:
+        html = self.inner_html(name, **selector)
+        for old, new in replacements:
+            html = html.replace(old, new)
+        return markdownify(html, **options)
+
+    def memoize(self, key, factory):
+        """extractor가 page에서 만든 값을 key별로 한 번만 계산하도록 memoize
+
+        Args:
+            key (Hashable): 값을 구분하는 key
+            factory (Callable[[], Any]): 값을 계산하는 함수, key에 대해 처음 호출될 때만 실행됨
+
+        Returns:
+            Any: 계산된 값
+        """
+        if key not in self._derived:
+            self._derived[key] = factory()
+        return self._derived[key]
+
+
+# 하위 text를 모두 이어붙인 값, bs4의 Tag.text와 같이 script, style, template 안의 text는 제외함
+_text_nodes = etree.XPath('descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+
+
+class LxmlPageDocument(PageDocument):
+    """BeautifulSoup tree 없이 lxml.html tree와 미리 compile 된 XPath로 tag를 찾는 PageDocument
+
+    extractor가 필요한 tag는 몇 개뿐이므로 전체 page에 대해 BeautifulSoup tree를 만들지 않음
+    keep이 주어지면 해당 selector에 맞는 subtree만 남기고 나머지 element는 파싱하면서 버림
+    markdown은 내부 html을 문자열로 만들어 다시 파싱하지 않고 lxml_markdown으로 element tree에서 바로 변환함
+    """
+
+    FEED_SIZE = 64 * 1024
+    _xpaths = {}  # selector별로 compile 된 XPath, 모든 page가 공유
+
+    def __init__(self, html_body: str, keep: tuple = None):
+        """
+        Args:
+            html_body (str): page html body
+            keep (tuple, optional): 남길 subtree의 selector 목록, ex) ({'name': 'h1'}, {'id': 'toc'}).
+                없으면 전체 tree를 유지. Defaults to None.
+        """
+        super().__init__(html_body)
+        self.keep = keep
+
+    @cached_property
+    def soup(self):
+        raise AttributeError('LxmlPageDocument는 BeautifulSoup tree를 만들지 않음')
+
+    @cached_property
+    def root(self):
+        if self.keep is None:
+            return lxml_html.document_fromstring(self.html_body)
+        parser = SubtreeParser(self.keep)
+        for start in range(0, len(self.html_body), self.FEED_SIZE):
+            parser.feed(self.html_body[start:start + self.FEED_SIZE])
+        return parser.close()
+
+    @classmethod
+    def compile_selector(cls, name, attrs: dict) -> etree.XPath:
+        key = cls._selector_key(name, attrs)
+        if key not in cls._xpaths:
+            conditions = []
+            if 'id' in attrs:
+                conditions.append('@id = $id')
+            if 'class_' in attrs:
+                conditions.append("contains(concat(' ', normalize-space(@class), ' '), concat(' ', $class_, ' '))")
+            unknown = set(attrs) - {'id', 'class_'}
+            if unknown:
+                raise ValueError(f'지원하지 않는 selector: {unknown}')
+            predicate = f'[{" and ".join(conditions)}]' if conditions else ''
+            cls._xpaths[key] = etree.XPath(f'(//{name or "*"}{predicate})[1]')
+        return cls._xpaths[key]
+
+    def _find(self, name, attrs: dict):
+        found = self.compile_selector(name, attrs)(self.root, **attrs)
+        return found[0] if found else None
+
+    def _text(self, node) -> str:
+        return ''.join(_text_nodes(node))
+
+    def _decode_contents(self, node) -> str:
+        parts = [html.escape(node.text, quote=False)] if node.text else []
+        parts.extend(etree.tostring(child, method='html', encoding='unicode') for child in node)  # tail 포함
+        return ''.join(parts)
+
+    def _convert_markdown(self, name, selector: dict, replacements: tuple, options: dict) -> str:
+        md = convert_element(self.find(name, **selector), replacements, **options)
+        if md is None:  # lxml_markdown이 지원하지 않는 옵션이나 치환
+            return super()._convert_markdown(name, selector, replacements, options)
+        return md
+
+
+def matches_selector(element, selector: dict) -> bool:
+    """element가 PageDocument.find()에 전달하는 형태의 selector에 맞는지 확인
+
+    Args:
+        element (lxml.etree._Element): 확인할 element
+        selector (dict): 'name', 'id', 'class_' key를 가지는 selector
+
+    Returns:
+        bool: selector에 맞으면 True
+    """
+    if 'name' in selector and element.tag != selector['name']:
+        return False
+    if 'id' in selector and element.get('id') != selector['id']:
+        return False
+    if 'class_' in selector and selector['class_'] not in (element.get('class') or '').split():
+        return False
+    return True
+
+
+class SubtreeParser:
+    """html을 나눠서 입력받으며 keep selector에 맞는 subtree만 남기는 incremental parser
+
+    필요한 subtree 밖에서 끝난 element는 바로 tree에서 제거하므로 tree의 크기가 page 전체로 커지지 않음
+    """
+
+    def __init__(self, keep: tuple):
+        """
+        Args:
+            keep (tuple): 남길 subtree의 selector 목록
+        """
+        self.keep = keep
+        self._parser = etree.HTMLPullParser(events=('start', 'end'))
+        self._keep_depth = 0  # 현재 열려있는 element 중 남길 subtree에 속한 element 수
+
+    def feed(self, data) -> None:
+        self._parser.feed(data)
+        self._prune()
+
+    def close(self):
+        root = self._parser.close()
+        self._prune()
+        return root
+
+    def _prune(self) -> None:
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._keep_depth > 0 or any(matches_selector(element, selector) for selector in self.keep):
+                    self._keep_depth += 1
+                continue
+            if self._keep_depth > 0:
+                self._keep_depth -= 1
+                continue
+            parent = element.getparent()
+            if parent is not None and not len(element):  # 남길 subtree를 포함하지 않는 element
+                parent.remove(element)
+
+
+class SubtreeStream:
+    """response body를 byte chunk 단위로 입력받아 decode 하면서 keep subtree만 남기는 reader
+
+    전체 body를 bytes나 str로 모으지 않고 바로 SubtreeParser에 전달하므로
+    page 하나를 처리하는 동안 메모리에는 chunk 하나와 남길 subtree만 유지됨
+    """
+
+    CHUNK_SIZE = LxmlPageDocument.FEED_SIZE
+
+    def __init__(self, keep: tuple, encoding: str = 'utf-8'):
+        """
+        Args:
+            keep (tuple): 남길 subtree의 selector 목록
+            encoding (str, optional): response body의 encoding. Defaults to 'utf-8'.
+        """
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._parser = SubtreeParser(keep)
+        self.size = 0  # 입력받은 byte 수
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self._parser.feed(self._decoder.decode(chunk))
+
+    def close(self) -> str:
+        """남은 입력을 처리하고 keep subtree와 그 상위 element만 남은 html을 반환
+
+        Returns:
+            str: 축소된 page html, 전체 page와 같은 PageDocument 결과를 얻을 수 있음
+        """
+        self._parser.feed(self._decoder.decode(b'', final=True))
+        return etree.tostring(self._parser.close(), method='html', encoding='unicode')
@@ -0,0 +1,451 @@
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack, nullcontext
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import count
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+
+from cache import PageCache
+from document import SubtreeStream
+from metrics import Metrics
+from transport import ACCEPT_ENCODING, connection_trace, make_connector
+
+
+# 재시도할 응답 status, 이 중 429, 503은 서버가 부하를 알린 것이므로 요청 속도도 줄임
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+BACKOFF_STATUSES = frozenset((429, 503))
+TIMEOUT_ERRORS = (asyncio.TimeoutError, requests.exceptions.Timeout)
+CONNECTION_ERRORS = (aiohttp.ClientConnectionError, requests.exceptions.ConnectionError)
+
+
+class HTTPStatusError(Exception):
+    """page 대신 에러 status(4xx, 5xx)를 응답받은 경우"""
+
+    def __init__(self, uri: str, status: int, retry_after: float = None):
+        super().__init__(f'{status} {uri}')
+        self.uri = uri
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RetryExhausted(Exception):
+    """재시도 횟수를 모두 사용한 경우, 해당 page는 dead-letter로 기록됨"""
+
+    def __init__(self, uri: str, attempts: int, error: Exception):
+        super().__init__(f'{uri} failed after {attempts} attempts: {error!r}')
+        self.uri = uri
+        self.attempts = attempts
+        self.error = error
+
+
+def parse_retry_after(value: str) -> float:
+    """Retry-After header 값(초 또는 HTTP-date)을 기다릴 시간(초)으로 변환
+
+    Args:
+        value (str): Retry-After header 값
+
+    Returns:
+        float: 기다릴 시간 (초), header가 없거나 해석할 수 없으면 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def check_status(uri: str, status: int, headers) -> None:
+    """응답 status가 에러면 HTTPStatusError를 발생시켜서 에러 page가 본문으로 파싱되지 않도록 함
+
+    Args:
+        uri (str): page uri
+        status (int): 응답 status code
+        headers (Mapping): 응답 header
+    """
+    if status >= 400:
+        raise HTTPStatusError(uri, status, parse_retry_after(headers.get('Retry-After')))
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, HTTPStatusError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, TIMEOUT_ERRORS + CONNECTION_ERRORS)
+
+
+def needs_backoff(error: Exception) -> bool:
+    if isinstance(error, HTTPStatusError):
+        return error.status in BACKOFF_STATUSES
+    return isinstance(error, TIMEOUT_ERRORS)
+
+
+class AdaptiveRateController:
+    """host별 초당 요청 수(politeness budget)를 응답 상태에 맞춰 조절하는 controller
+
+    요청 시작 시각을 1 / rate 간격으로 예약해서 burst 없이 일정한 속도로 요청하도록 하며,
+    응답이 latency_target 안에 오면 rate를 조금씩 올리고 (additive increase)
+    429, 503, timeout이 발생하면 rate를 절반으로 줄임 (multiplicative decrease)
+    Retry-After가 있으면 그 시간 동안은 해당 host에 요청하지 않음
+    """
+
+    # max_rate가 없을 때 처음 rate에 곱해서 최대 초당 요청 수로 사용하는 값
+    MAX_RATE_FACTOR = 4
+
+    def __init__(
+        self,
+        rate: float,
+        max_rate: float = None,
+        min_rate: float = 0.25,
+        latency_target: float = 1.0,
+        increase: float = 0.25,
+        decrease: float = 0.5,
+    ):
+        """
+        Args:
+            rate (float): 처음 초당 요청 수, 0이면 제한 없음
+            max_rate (float, optional): 올릴 수 있는 최대 초당 요청 수, 없으면 rate의 MAX_RATE_FACTOR배. Defaults to None.
+            min_rate (float, optional): 줄일 수 있는 최소 초당 요청 수. Defaults to 0.25.
+            latency_target (float, optional): 이 시간(초) 안에 응답이 오면 rate를 올림. Defaults to 1.0.
+            increase (float, optional): 응답 하나마다 올리는 초당 요청 수. Defaults to 0.25.
+            decrease (float, optional): backoff 시 rate에 곱하는 값. Defaults to 0.5.
+        """
+        self.rate = rate
+        self.max_rate = max(rate * self.MAX_RATE_FACTOR if max_rate is None else max_rate, rate)
+        self.min_rate = min(min_rate, rate)
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease = decrease
+        self._next_at = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()  # index page를 여러 thread에서 가져올 때 같은 시각을 중복 예약하지 않도록 함
+
+    def reserve(self) -> float:
+        """다음 요청 시작 시각을 예약하고 그때까지 기다려야 하는 시간(초)을 반환"""
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._blocked_until)
+            if self.rate:
+                start_at = max(start_at, self._next_at)
+                self._next_at = start_at + 1 / self.rate
+            return start_at - now
+
+    async def wait(self) -> None:
+        delay = self.reserve()  # 예약은 await 없이 끝나므로 event loop를 막지 않음
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def success(self, latency: float) -> None:
+        if self.rate and latency <= self.latency_target:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def backoff(self, retry_after: float = None) -> None:
+        if self.rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+
+class RetryPolicy:
+    """bounded exponential backoff with full jitter"""
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        max_retry_after: float = 300.0,
+    ):
+        """
+        Args:
+            max_attempts (int, optional): page당 최대 요청 횟수. Defaults to 5.
+            base_delay (float, optional): 첫 재시도 전 최대 대기 시간 (초). Defaults to 0.5.
+            max_delay (float, optional): 재시도 전 최대 대기 시간 (초). Defaults to 30.0.
+            max_retry_after (float, optional): 이보다 긴 Retry-After를 받으면 재시도하지 않음 (초). Defaults to 300.0.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, uri: str, attempt: int, error: Exception) -> float:
+        """attempt번째 요청이 error로 실패했을 때 다음 요청까지 기다릴 시간(초)
+
+        Args:
+            uri (str): page uri
+            attempt (int): 실패한 요청이 몇 번째 요청인지 (1부터 시작)
+            error (Exception): 실패 원인
+
+        Raises:
+            RetryExhausted: 재시도 횟수를 모두 사용했거나 Retry-After가 너무 긴 경우
+
+        Returns:
+            float: 기다릴 시간 (초)
+        """
+        retry_after = getattr(error, 'retry_after', None)
+        if attempt >= self.max_attempts or (retry_after or 0) > self.max_retry_after:
+            raise RetryExhausted(uri, attempt, error) from error
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        return max(backoff, retry_after or 0)
+
+
+def plan_retry(
+    uri: str,
+    attempt: int,
+    error: Exception,
+    controller: AdaptiveRateController,
+    retry_policy: RetryPolicy,
+    metrics,
+) -> float:
+    """실패한 요청을 재시도할지 결정하고 rate를 조절, 재시도하지 않으면 예외를 발생시킴
+
+    Args:
+        uri (str): page uri
+        attempt (int): 실패한 요청이 몇 번째 요청인지 (1부터 시작)
+        error (Exception): 실패 원인
+        controller (AdaptiveRateController): 요청한 host의 rate controller
+        retry_policy (RetryPolicy): 재시도 정책
+        metrics (Metrics): 재시도, timeout, backoff 횟수를 기록할 metrics
+
+    Raises:
+        Exception: 재시도할 수 없는 에러는 그대로 발생
+        RetryExhausted: 재시도 횟수를 모두 사용한 경우
+
+    Returns:
+        float: 다음 요청까지 기다릴 시간 (초)
+    """
+    if not is_retryable(error):
+        raise error
+    if isinstance(error, TIMEOUT_ERRORS):
+        metrics.inc('scrap_fetch_timeouts_total')
+    if needs_backoff(error):
+        controller.backoff(getattr(error, 'retry_after', None))
+        metrics.inc('scrap_fetch_backoffs_total')
+    delay = retry_policy.delay(uri, attempt, error)
+    metrics.inc('scrap_fetch_retries_total')
+    return delay
+
+
+class AsyncFetcher:
+    """asyncio 기반으로 여러 page를 동시에 가져오는 fetcher
+
+    host별로 동시에 진행중인 요청 수(concurrency)와 초당 요청 수(rate)를 제한함
+    async with로 사용하면 여러 fetch_all() 호출이 같은 session의 keep-alive 연결을 재사용함
+    초당 요청 수는 AdaptiveRateController가 응답 상태에 맞춰 rate와 max_rate 사이에서 조절함
+    """
+
+    def __init__(
+        self,
+        headers: dict,
+        concurrency: int = 4,
+        rate: float = 4.0,
+        timeout: float = 5,
+        request_uri: Callable[[str], str] = None,
+        cache: PageCache = None,
+        metrics: Metrics = None,
+        max_rate: float = None,
+        retry_policy: RetryPolicy = None,
+        keep: tuple = None,
+        slots=None,
+    ):
+        """
+        Args:
+            headers (dict): 모든 요청에 사용할 header
+            concurrency (int, optional): host별 최대 동시 요청 수. Defaults to 4.
+            rate (float, optional): host별 처음 초당 요청 수, 0이면 제한 없음. Defaults to 4.0.
+            timeout (float, optional): 요청 timeout (초). Defaults to 5.
+            request_uri (Callable[[str], str], optional): 실제 요청할 주소로 변환하는 함수. Defaults to None.
+            cache (PageCache, optional): 조건부 요청에 사용할 page cache. Defaults to None.
+            metrics (Metrics, optional): 요청 시간, 재시도, 받은 byte 수 등을 기록할 metrics. Defaults to None.
+            max_rate (float, optional): 응답이 원활할 때 올릴 수 있는 host별 최대 초당 요청 수, 없으면 rate의 4배. Defaults to None.
+            retry_policy (RetryPolicy, optional): 재시도 정책. Defaults to RetryPolicy().
+            keep (tuple, optional): 있으면 response를 chunk 단위로 파싱하면서 이 selector들의 subtree만 남긴 html을 반환.
+                Defaults to None.
+            slots (SiteSlots, optional): 여러 site가 공유하는 WorkerPool의 slot, 요청하는 동안 slot 하나를 사용.
+                Defaults to None.
+        """
+        self.headers = headers
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.request_uri = request_uri or (lambda uri: uri)
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._semaphores = defaultdict(lambda: asyncio.Semaphore(concurrency))
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self._controllers = defaultdict(lambda: AdaptiveRateController(rate, max_rate))
+        self.keep = keep
+        self.slots = slots if slots is not None else nullcontext()
+        self._session = None
+
+    def open_session(self) -> aiohttp.ClientSession:
+        """host별 concurrency 개의 keep-alive 연결을 유지하고 연결 생성 시간을 기록하는 session"""
+        return aiohttp.ClientSession(
+            headers={**self.headers, 'Accept-Encoding': ACCEPT_ENCODING},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=make_connector(self.concurrency),
+            trace_configs=[connection_trace(self.metrics)],
+        )
+
+    async def __aenter__(self):
+        self._session = self.open_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    async def fetch(self, session: aiohttp.ClientSession, uri: str, index_page: bool = False) -> str:
+        """page 하나를 가져옴, timeout, 연결 에러, 429/5xx 응답이면 backoff 후 재시도
+
+        Args:
+            session (aiohttp.ClientSession): 요청에 사용할 session
+            uri (str): page uri
+            index_page (bool, optional): index page면 cache와 subtree 추출 없이 전체 body를 반환. Defaults to False.
+
+        Raises:
+            HTTPStatusError: 재시도하지 않는 에러 status를 응답받은 경우
+            RetryExhausted: 재시도 횟수를 모두 사용한 경우
+
+        Returns:
+            str: page html body
+        """
+        request_uri = self.request_uri(uri)
+        host = urlsplit(request_uri).netloc
+        controller = self._controllers[host]
+        cache = None if index_page else self.cache
+        keep = None if index_page else self.keep
+        for attempt in count(1):
+            async with self._semaphores[host]:
+                await controller.wait()
+                headers = cache.request_headers(uri) if cache is not None else None
+                async with self.slots:  # rate에 맞춰 기다린 후 요청하는 동안에만 공유 slot을 사용
+                    start = time.perf_counter()
+                    try:
+                        async with session.get(request_uri, headers=headers) as resp:
+                            check_status(uri, resp.status, resp.headers)
+                            if keep is None:
+                                body = await resp.read()
+                                size, html_body = len(body), await resp.text()  # read()로 받은 body를 decode
+                            else:  # body 전체를 모으지 않고 chunk마다 파싱하면서 keep subtree만 남김
+                                stream = SubtreeStream(keep, resp.charset or 'utf-8')  # resp.text()와 같은 기본값
+                                async for chunk in resp.content.iter_chunked(SubtreeStream.CHUNK_SIZE):
+                                    stream.feed(chunk)
+                                size, html_body = stream.size, stream.close()
+                        error = None
+                    except (HTTPStatusError, *TIMEOUT_ERRORS, *CONNECTION_ERRORS) as e:
+                        error = e
+                    latency = time.perf_counter() - start
+                    self.metrics.observe('scrap_fetch_seconds', latency)
+            if error is None:
+                controller.success(latency)
+                self.metrics.set('scrap_fetch_rate', controller.rate, host=host)
+                self.metrics.inc('scrap_fetch_bytes_total', size)
+                self.metrics.inc('scrap_fetch_responses_total', status=resp.status)
+                if cache is None:
+                    return html_body
+                return cache.resolve(uri, resp.status, html_body, resp.headers)
+            if isinstance(error, HTTPStatusError):
+                self.metrics.inc('scrap_fetch_responses_total', status=error.status)
+            # 다음 요청까지의 대기는 semaphore 밖에서 해서 같은 host의 다른 요청을 막지 않음
+            delay = plan_retry(uri, attempt, error, controller, self.retry_policy, self.metrics)
+            self.metrics.set('scrap_fetch_rate', controller.rate, host=host)
+            await asyncio.sleep(delay)
+
+    async def fetch_all(
+        self,
+        uris: Iterable[str] | AsyncIterable[str],
+        queue_size: int = 64,
+        return_exceptions: bool = False,
+        index_page: bool = False,
+    ) -> AsyncIterator[tuple[str, str]]:
+        """모든 uri를 동시에 가져오고 완료된 순서대로 (uri, html body)를 반환
+
+        uris가 async iterator이면 uri가 발견되는 대로 요청을 시작하므로
+        index page를 모두 가져오기 전에 먼저 발견된 page부터 가져올 수 있음
+        가져온 page는 크기가 queue_size로 제한된 queue를 거쳐서 반환되므로
+        소비하는 쪽(파싱, 저장)이 느리면 queue가 차서 fetch worker들도 함께 멈춤 (backpressure)
+
+        Args:
+            uris (Iterable[str] | AsyncIterable[str]): page uri 목록
+            queue_size (int, optional): 가져왔지만 아직 소비되지 않은 page의 최대 개수. Defaults to 64.
+            return_exceptions (bool, optional): 실패한 page의 예외를 raise 하지 않고 html body 대신 반환. Defaults to False.
+            index_page (bool, optional): index page면 cache와 subtree 추출 없이 전체 body를 반환. Defaults to False.
+
+        Raises:
+            Exception: uris를 만드는 중에 발생한 예외 (index page 요청 실패 등)
+
+        Yields:
+            tuple[str, str]: (uri, html body)
+        """
+        results = asyncio.Queue(maxsize=queue_size)
+        pending_by_host = {}
+        workers = []
+
+        async with AsyncExitStack() as stack:
+            # async with fetcher 안에서 호출되면 열려있는 session의 keep-alive 연결을 재사용
+            session = self._session or await stack.enter_async_context(self.open_session())
+
+            async def worker(pending):
+                while (uri := await pending.get()) is not None:
+                    try:
+                        result = await self.fetch(session, uri, index_page)
+                    except Exception as e:  # 소비하는 쪽에서 처리하도록 전달
+                        result = e
+                    await results.put((uri, result))
+                    self.metrics.set('scrap_queue_depth', results.qsize(), queue='fetched')
+
+            async def feed():
+                try:
+                    async for uri in _aiter(uris):
+                        host = urlsplit(self.request_uri(uri)).netloc
+                        if host not in pending_by_host:
+                            # 처음 보는 host마다 concurrency 만큼 worker를 만들어서 모든 host가 동시에 요청할 수 있도록 함
+                            pending_by_host[host] = asyncio.Queue()
+                            workers.extend(
+                                asyncio.create_task(worker(pending_by_host[host])) for _ in range(self.concurrency)
+                            )
+                        pending_by_host[host].put_nowait(uri)
+                    for pending in pending_by_host.values():
+                        for _ in range(self.concurrency):
+                            pending.put_nowait(None)
+                    await asyncio.gather(*workers)
+                except Exception:
+                    await results.put(None)  # 소비하는 쪽이 종료하도록 알리고 예외는 await feeder에서 발생
+                    raise
+                await results.put(None)
+
+            feeder = asyncio.create_task(feed())
+            try:
+                while (item := await results.get()) is not None:
+                    uri, result = item
+                    self.metrics.set('scrap_queue_depth', results.qsize(), queue='fetched')
+                    if isinstance(result, Exception) and not return_exceptions:
+                        raise result
+                    yield uri, result
+                await feeder  # uri 목록을 만들다 실패했으면 예외 발생
+            finally:
+                feeder.cancel()
+                for task in workers:
+                    task.cancel()
+
+
+async def _aiter(uris: Iterable[str] | AsyncIterable[str]) -> AsyncIterator[str]:
+    if hasattr(uris, '__aiter__'):
+        async for uri in uris:
+            yield uri
+    else:
+        for uri in uris:
+            yield uri
@@ -0,0 +1,474 @@
+import re
+from copy import deepcopy
+
+from markdownify import chomp
+
+# markdownify.MarkdownConverter와 같은 정규식
+_line_beginning = re.compile(r'^', re.MULTILINE)
+_whitespace = re.compile(r'[\t ]+')
+_heading = re.compile(r'h[1-6]')
+_convert_heading = re.compile(r'h(\d+)')
+
+# markdownify에서 내부의 공백 text를 지우는 tag
+NESTED_TAGS = frozenset(('ol', 'ul', 'li', 'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'))
+# 지원하는 markdownify 옵션, 나머지 옵션은 markdownify의 기본값을 사용하는 경우만 변환함
+SUPPORTED_OPTIONS = frozenset(('strip', 'bullets', 'heading_style'))
+DOCUMENT = '[document]'  # BeautifulSoup의 최상위 node 이름
+# BeautifulSoup이 공백만 있는 text를 줄이지 않는 tag
+PRESERVE_WHITESPACE_TAGS = frozenset(('pre', 'textarea'))
+_ASCII_SPACES = dict.fromkeys(map(ord, '\x20\x0a\x09\x0c\x0d'))
+# 닫는 tag 없이 바로 닫히는 tag, lxml이 html로 출력할 때 닫는 tag를 쓰지 않음
+VOID_TAGS = frozenset(
+    ('area', 'base', 'basefont', 'br', 'col', 'embed', 'frame', 'hr', 'img', 'input', 'isindex', 'keygen', 'link',
+     'meta', 'param', 'source', 'track', 'wbr')
+)
+
+
+class _Comment:
+    """주석, 변환 결과에는 나오지 않지만 markdownify와 같이 형제 node로 취급함"""
+
+    name = None
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LxmlMarkdownConverter:
+    """lxml element tree를 직접 순회하면서 markdownify와 같은 markdown을 만드는 변환기
+
+    markdownify는 내부 html 문자열을 html.parser로 다시 파싱한 BeautifulSoup tree를 변환하므로,
+    SEP/IEP 본문에서 사용하는 tag(heading, p, list, blockquote, 강조, table, code, a/hr/img 등)에 대해
+    markdownify의 변환 규칙과 공백 처리(형제 node 기준의 공백 text 제거 등)를 그대로 따름
+    지원하지 않는 옵션이나 치환이 있으면 convert_element()가 None을 반환하므로 markdownify를 사용해야 함
+    """
+
+    def __init__(
+        self,
+        strip: list = None,
+        bullets: str = '*+-',
+        heading_style: str = 'underlined',
+        text_replacements: tuple = (),
+        renames: dict = None,
+        texts: dict = None,
+    ):
+        """
+        Args:
+            strip (list, optional): 변환하지 않고 내용만 남길 tag. Defaults to None.
+            bullets (str, optional): list 깊이별 bullet 문자. Defaults to '*+-'.
+            heading_style (str, optional): underlined, atx, atx_closed 중 하나. Defaults to 'underlined'.
+            text_replacements (tuple, optional): text와 attribute 값에 적용할 (old, new) 쌍 목록. Defaults to ().
+            renames (dict, optional): {원래 tag: 바꿀 tag}, attribute가 없는 tag에만 적용. Defaults to None.
+            texts (dict, optional): {(element, 'text' | 'tail'): text node 목록}, 여러 text node로 나눠서 변환할 text.
+                Defaults to None.
+        """
+        self.strip = frozenset(tag.lower() for tag in strip or ())
+        self.bullets = bullets
+        self.heading_style = heading_style.lower()
+        self.text_replacements = text_replacements
+        self.renames = renames or {}
+        self.texts = texts or {}
+
+    def convert(self, root) -> str:
+        """root의 내부 html을 markdownify로 변환한 것과 같은 결과
+
+        Args:
+            root (lxml.etree._Element): 변환할 subtree의 최상위 element, root 자신은 변환하지 않음
+
+        Returns:
+            str: markdown
+        """
+        self.root = root
+        self._contents = {}  # element별 자식 node list, 공백 text를 지운 후의 상태
+        try:
+            return self._process_children(root, DOCUMENT, convert_as_inline=False, preserve=False)
+        finally:
+            self.root = self._contents = None
+
+    def _replace(self, text: str) -> str:
+        for old, new in self.text_replacements:
+            text = text.replace(old, new)
+        return text
+
+    def _text(self, text: str, preserve: bool) -> str:
+        """BeautifulSoup tree의 text를 치환하고 html.parser로 다시 파싱했을 때의 text
+
+        BeautifulSoup은 pre 밖의 공백만 있는 text를 줄바꿈 또는 공백 하나로 줄이므로 치환 전후에 모두 적용
+        """
+        if preserve:
+            return self._replace(text)
+        return _collapse(self._replace(_collapse(text)))
+
+    def _name(self, element) -> str:
+        if element is None:
+            return None
+        if element is self.root:
+            return DOCUMENT
+        if isinstance(element, (str, _Comment)):
+            return None
+        name = element.tag
+        return self.renames.get(name, name) if not element.attrib else name
+
+    def _parent(self, element):
+        """fragment 안에서의 상위 element, root의 자식이면 root, root이면 None"""
+        return None if element is self.root else element.getparent()
+
+    def _get(self, element, attribute: str):
+        value = element.get(attribute)
+        return self._replace(value) if value is not None else None
+
+    def _children(self, element, name: str, preserve: bool) -> list:
+        nodes = []
+        if element.text:
+            nodes.extend(self._text_nodes(element, 'text', preserve))
+        for child in element:
+            if isinstance(child.tag, str):
+                nodes.append(child)
+            else:  # 주석, processing instruction
+                nodes.append(_Comment(child.text or ''))
+            if child.tail:
+                nodes.extend(self._text_nodes(child, 'tail', preserve))
+        if name in NESTED_TAGS:
+            _remove_whitespace(nodes, self._name)
+        self._contents[element] = nodes
+        return nodes
+
+    def _text_nodes(self, element, attribute: str, preserve: bool) -> list:
+        """element의 text 또는 tail에 해당하는 BeautifulSoup text node들, 빈 text는 제외"""
+        texts = self.texts.get((element, attribute)) or (getattr(element, attribute),)
+        return [text for text in (self._text(each, preserve) for each in texts) if text]
+
+    def _sibling(self, element, offset: int):
+        """element의 이전(-1), 다음(1) 형제 node, 없으면 None"""
+        parent = self._parent(element)
+        if parent is None:
+            return None
+        nodes = self._contents[parent]
+        index = _index(nodes, element) + offset
+        return nodes[index] if 0 <= index < len(nodes) else None
+
+    def _process_children(self, element, name: str, convert_as_inline: bool, preserve: bool) -> str:
+        nodes = self._children(element, name, preserve)
+        parts = []
+        for index, node in enumerate(nodes):
+            if isinstance(node, str):
+                parts.append(self._process_text(node, element, name, nodes[index + 1] if index + 1 < len(nodes) else None))
+            elif isinstance(node, _Comment):
+                continue
+            else:
+                parts.append(self._process_tag(node, convert_as_inline, preserve))
+        return ''.join(parts)
+
+    def _process_tag(self, element, convert_as_inline: bool, preserve: bool) -> str:
+        name = self._name(element)
+        # heading과 table cell은 block element를 포함할 수 없으므로 내부를 inline으로 변환
+        children_inline = convert_as_inline or _heading.match(name) is not None or name in ('td', 'th')
+        text = self._process_children(element, name, children_inline, preserve or name in PRESERVE_WHITESPACE_TAGS)
+        if name in self.strip:
+            return text
+        convert = self._converters.get(name)
+        if convert is None:
+            match = _convert_heading.match(name)
+            if match is None:
+                return text
+            return self._convert_heading(int(match.group(1)), text, convert_as_inline)
+        return convert(self, element, text, convert_as_inline)
+
+    def _process_text(self, text: str, parent, parent_name: str, next_sibling) -> str:
+        # pre 안의 공백은 그대로 유지
+        grandparent_name = self._name(self._parent(parent)) if parent_name == 'code' else None
+        if not (parent_name == 'pre' or (parent_name == 'code' and grandparent_name == 'pre')):
+            text = _whitespace.sub(' ', text)
+        if parent_name != 'code':
+            text = text.replace('*', r'\*').replace('_', r'\_')
+        # li의 마지막 text이거나 하위 list가 이어지면 뒤의 공백을 지움
+        if parent_name == 'li' and (next_sibling is None or self._name(next_sibling) in ('ul', 'ol')):
+            text = text.rstrip()
+        return text
+
+    def _convert_a(self, element, text, convert_as_inline):
+        prefix, suffix, text = chomp(text)
+        if not text:
+            return ''
+        href = self._get(element, 'href')
+        title = self._get(element, 'title')
+        if text.replace(r'\_', '_') == href and not title:
+            return f'<{href}>'
+        title_part = ' "%s"' % title.replace('"', r'\"') if title else ''
+        return f'{prefix}[{text}]({href}{title_part}){suffix}' if href else text
+
+    def _convert_blockquote(self, element, text, convert_as_inline):
+        if convert_as_inline:
+            return text
+        return '\n' + (_line_beginning.sub('> ', text) + '\n\n') if text else ''
+
+    def _convert_br(self, element, text, convert_as_inline):
+        return '' if convert_as_inline else '  \n'
+
+    def _convert_code(self, element, text, convert_as_inline):
+        if self._name(self._parent(element)) == 'pre':
+            return text
+        return _inline(text, '`')
+
+    def _convert_heading(self, level: int, text: str, convert_as_inline: bool) -> str:
+        if convert_as_inline:
+            return text
+        text = text.rstrip()
+        if self.heading_style == 'underlined' and level <= 2:
+            return '%s\n%s\n\n' % (text, ('=' if level == 1 else '-') * len(text)) if text else ''
+        hashes = '#' * level
+        if self.heading_style == 'atx_closed':
+            return f'{hashes} {text} {hashes}\n\n'
+        return f'{hashes} {text}\n\n'
+
+    def _convert_hr(self, element, text, convert_as_inline):
+        return '\n\n---\n\n'
+
+    def _convert_img(self, element, text, convert_as_inline):
+        alt = self._get(element, 'alt') or ''
+        src = self._get(element, 'src') or ''
+        title = self._get(element, 'title') or ''
+        title_part = ' "%s"' % title.replace('"', r'\"') if title else ''
+        if convert_as_inline:
+            return alt
+        return f'![{alt}]({src}{title_part})'
+
+    def _convert_list(self, element, text, convert_as_inline):
+        next_sibling = self._sibling(element, 1)
+        before_paragraph = next_sibling is not None and self._name(next_sibling) not in ('ul', 'ol')
+        ancestor = element
+        while ancestor is not None:
+            if self._name(ancestor) == 'li':  # 하위 list는 들여쓰기 하고 마지막 줄바꿈을 지움
+                return '\n' + (_line_beginning.sub('\t', text) if text else '').rstrip()
+            ancestor = self._parent(ancestor)
+        return text + ('\n' if before_paragraph else '')
+
+    def _convert_li(self, element, text, convert_as_inline):
+        parent = self._parent(element)
+        if parent is not None and self._name(parent) == 'ol':
+            start = parent.get('start')
+            bullet = '%s.' % ((int(start) if start else 1) + _index(self._contents[parent], element))
+        else:
+            depth = -1
+            ancestor = element
+            while ancestor is not None:
+                if self._name(ancestor) == 'ul':
+                    depth += 1
+                ancestor = self._parent(ancestor)
+            bullet = self.bullets[depth % len(self.bullets)]
+        return '%s %s\n' % (bullet, (text or '').strip())
+
+    def _convert_p(self, element, text, convert_as_inline):
+        if convert_as_inline:
+            return text
+        return f'{text}\n\n' if text else ''
+
+    def _convert_pre(self, element, text, convert_as_inline):
+        return f'\n```\n{text}\n```\n' if text else ''
+
+    def _convert_table(self, element, text, convert_as_inline):
+        return '\n\n' + text + '\n'
+
+    def _convert_cell(self, element, text, convert_as_inline):
+        return ' ' + text + ' |'
+
+    def _convert_tr(self, element, text, convert_as_inline):
+        cells = list(element.iterdescendants('td', 'th'))
+        is_headrow = all(cell.tag == 'th' for cell in cells)
+        previous = self._sibling(element, -1)
+        parent = self._parent(element)
+        overline = underline = ''
+        if is_headrow and previous is None:
+            underline = '| ' + ' | '.join(['---'] * len(cells)) + ' |\n'
+        elif previous is None and (
+            self._name(parent) == 'table' or (self._name(parent) == 'tbody' and self._sibling(parent, -1) is None)
+        ):
+            overline = '| ' + ' | '.join([''] * len(cells)) + ' |\n'
+            overline += '| ' + ' | '.join(['---'] * len(cells)) + ' |\n'
+        return overline + '|' + text + '\n' + underline
+
+    _converters = {
+        'a': _convert_a,
+        'b': lambda self, element, text, convert_as_inline: _inline(text, '**'),
+        'blockquote': _convert_blockquote,
+        'br': _convert_br,
+        'code': _convert_code,
+        'del': lambda self, element, text, convert_as_inline: _inline(text, '~~'),
+        'em': lambda self, element, text, convert_as_inline: _inline(text, '*'),
+        'hr': _convert_hr,
+        'i': lambda self, element, text, convert_as_inline: _inline(text, '*'),
+        'img': _convert_img,
+        'kbd': _convert_code,
+        'li': _convert_li,
+        'ol': _convert_list,
+        'p': _convert_p,
+        'pre': _convert_pre,
+        's': lambda self, element, text, convert_as_inline: _inline(text, '~~'),
+        'samp': _convert_code,
+        'strong': lambda self, element, text, convert_as_inline: _inline(text, '**'),
+        'sub': lambda self, element, text, convert_as_inline: _inline(text, ''),
+        'sup': lambda self, element, text, convert_as_inline: _inline(text, ''),
+        'table': _convert_table,
+        'td': _convert_cell,
+        'th': _convert_cell,
+        'tr': _convert_tr,
+        'ul': _convert_list,
+    }
+
+
+def _collapse(text: str) -> str:
+    if text and not text.translate(_ASCII_SPACES):
+        return '\n' if '\n' in text else ' '
+    return text
+
+
+def _inline(text: str, markup: str) -> str:
+    """b, em 등 inline tag의 변환, 앞뒤 공백은 markup 밖으로 옮김"""
+    prefix, suffix, text = chomp(text)
+    if not text:
+        return ''
+    return f'{prefix}{markup}{text}{markup}{suffix}'
+
+
+def _index(nodes: list, node) -> int:
+    for index, each in enumerate(nodes):
+        if each is node:
+            return index
+    raise ValueError(node)
+
+
+def _remove_whitespace(nodes: list, name) -> None:
+    """list, table 관련 tag 안에서 처음, 마지막, list/table tag와 이웃한 공백 text를 지움
+
+    markdownify는 자식 node를 순회하면서 지우므로 하나를 지우면 바로 다음 node를 건너뛰는데, 이 동작도 그대로 따름
+    """
+    index = 0
+    while index < len(nodes):
+        node = nodes[index]
+        previous = nodes[index - 1] if index > 0 else None
+        following = nodes[index + 1] if index + 1 < len(nodes) else None
+        removable = (
+            previous is None or following is None or name(previous) in NESTED_TAGS or name(following) in NESTED_TAGS
+        )
+        text = node if isinstance(node, str) else node.text if isinstance(node, _Comment) else None
+        if text is not None and text.strip() == '' and removable:
+            del nodes[index]
+        index += 1
+
+
+def native_replacements(replacements: tuple):
+    """markdownify 전에 내부 html에 적용하던 치환을 tree에 적용할 수 있는 형태로 변환
+
+    줄바꿈, tab의 제거(치환)는 tag 안에 나오지 않으므로 text와 attribute 값의 치환으로,
+    attribute가 없는 여는 tag와 닫는 tag의 쌍(ex. <ol> -> <ul>, </ol> -> </ul>)은 tag 이름 변경으로 바꿈
+
+    Args:
+        replacements (tuple): (old, new) 쌍 목록
+
+    Returns:
+        tuple: (text_replacements, renames), 변환할 수 없는 치환이 있으면 None
+    """
+    text_replacements = []
+    opening, closing = {}, {}
+    for old, new in replacements:
+        if old and set(old) <= set('\n\r\t') and not set(new) & set('<>&"'):
+            text_replacements.append((old, new))
+        elif (match := re.fullmatch(r'<(/?)([a-z][a-z0-9]*)>', old)) and re.fullmatch(rf'<{match[1]}[a-z][a-z0-9]*>', new):
+            (closing if match[1] else opening)[match[2]] = new.strip('</>')
+        else:
+            return None
+    if opening != closing:
+        return None
+    return tuple(text_replacements), opening
+
+
+def rebuild_renamed(root, renames: dict):
+    """attribute가 있는 tag의 닫는 tag만 바뀌었을 때 html.parser와 BeautifulSoup이 만드는 tree를 다시 만듦
+
+    ex) <ol start="3">...</ol>에 (<ol>, <ul>), (</ol>, </ul>) 치환을 적용하면 <ol start="3">...</ul>이 되고,
+    BeautifulSoup은 열려있는 가장 가까운 ul까지 닫거나 열린 ul이 없으면 닫는 tag를 무시하므로
+    ol은 상위 element가 닫힐 때까지 이어지는 형제 node를 자식으로 가지게 됨
+    원래 tree를 html로 출력한 순서대로 여는/닫는 tag를 다시 적용하며, attribute가 없는 tag는 이름을 바꿔서 만듦
+    무시된 닫는 tag 앞뒤의 text는 BeautifulSoup에서 별도의 text node이므로 이어붙인 text와 함께 나뉜 text 목록을 반환함
+
+    Args:
+        root (lxml.etree._Element): 변환할 subtree의 최상위 element
+        renames (dict): {원래 tag: 바꿀 tag}
+
+    Returns:
+        tuple: (다시 만든 tree의 최상위 element, {(element, 'text' | 'tail'): text node 목록}),
+            tree에는 renames를 적용할 필요 없음
+    """
+    root = deepcopy(root)  # 원래 tree는 다른 변환에서도 사용하므로 복사한 tree의 node를 다시 배치함
+    stack = [root]
+    texts = {}
+
+    def append_text(text):
+        if not text:
+            return
+        parent = stack[-1]
+        if len(parent):
+            key = parent[-1], 'tail'
+            parent[-1].tail = (parent[-1].tail or '') + text
+        else:
+            key = parent, 'text'
+            parent.text = (parent.text or '') + text
+        texts.setdefault(key, []).append(text)
+
+    def close(name):
+        for index in range(len(stack) - 1, 0, -1):  # 최상위 element는 fragment 밖이므로 닫지 않음
+            if stack[index].tag == name:
+                del stack[index:]
+                return
+
+    def detach(element):
+        text, children = element.text, list(element)
+        element.text = None
+        for child in children:
+            element.remove(child)  # tail은 child와 함께 이동함
+        return text, children
+
+    def build(text, children):
+        append_text(text)
+        for child in children:
+            tail, child.tail = child.tail, None
+            if not isinstance(child.tag, str):  # 주석, processing instruction
+                stack[-1].append(child)
+                append_text(tail)
+                continue
+            name, end = child.tag, renames.get(child.tag, child.tag)
+            inner = detach(child)
+            if not child.attrib:
+                child.tag = end
+            stack[-1].append(child)
+            if name not in VOID_TAGS:
+                stack.append(child)
+                build(*inner)
+                close(end)
+            append_text(tail)
+
+    build(*detach(root))
+    return root, {key: nodes for key, nodes in texts.items() if len(nodes) > 1}
+
+
+def convert_element(root, replacements: tuple = (), **options) -> str:
+    """root의 내부 html을 replacements로 치환하고 markdownify(html, **options)로 변환한 것과 같은 결과
+
+    Args:
+        root (lxml.etree._Element): 변환할 subtree의 최상위 element
+        replacements (tuple, optional): 변환 전 내부 html에 적용하던 (old, new) 쌍 목록. Defaults to ().
+        **options: markdownify 옵션 중 strip, bullets, heading_style
+
+    Returns:
+        str: markdown, 지원하지 않는 옵션이나 치환이 있으면 None
+    """
+    if set(options) - SUPPORTED_OPTIONS:
+        return None
+    native = native_replacements(replacements)
+    if native is None:
+        return None
+    text_replacements, renames = native
+    # 닫는 tag는 attribute와 관계없이 바뀌므로 attribute가 있는 tag가 있으면 치환한 html을 파싱한 tree를 다시 만듦
+    if any(element.attrib for tag in renames for element in root.iter(tag)):
+        root, texts = rebuild_renamed(root, renames)
+        return LxmlMarkdownConverter(text_replacements=text_replacements, texts=texts, **options).convert(root)
+    return LxmlMarkdownConverter(text_replacements=text_replacements, renames=renames, **options).convert(root)
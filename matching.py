@@ -0,0 +1,424 @@
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+# 주제 구절을 만들 때 건너뛰는 흔한 단어, 백과사전 문체의 상투적인 연결어가 서로 다른 주제의 글을 비슷하게 만들지 않도록 함
+STOPWORDS = frozenset(
+    'a an and are as at be been but by can for from had has have he his in is it its may more not of on one or '
+    'such that the their there these they this to was were which who will with would also other than into only '
+    'so some what when how if all most many both'.split()
+)
+_WORD = re.compile(r'[^\W\d_]{2,}')
+# 2^32보다 작은 가장 큰 소수, a와 x가 32bit이므로 (a * x + b) % PRIME 계산이 uint64를 넘지 않음
+PRIME = np.uint64(4294967291)
+MAX_HASH = np.uint32(0xFFFFFFFF)
+# 한 번에 계산하는 (permutation, shingle) 원소 수, uint64 기준 약 32MB
+BLOCK_ELEMENTS = 1 << 22
+
+# corpus.db의 row별 signature, updated_at은 signature를 만들 때의 corpus.updated_at으로 바뀐 row를 찾는 데 사용
+# shingle이 없는 문서는 signature가 NULL이며 bucket에 넣지 않음
+MINHASH_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS minhash (corpus_id INTEGER PRIMARY KEY, source TEXT, signature BLOB, updated_at TEXT)'
+)
+BUCKET_TABLE_CREATION_SQLS = (
+    'CREATE TABLE IF NOT EXISTS lsh_bucket (band INTEGER, bucket INTEGER, corpus_id INTEGER)',
+    'CREATE INDEX IF NOT EXISTS lsh_bucket_key ON lsh_bucket (band, bucket)',
+    'CREATE INDEX IF NOT EXISTS lsh_bucket_corpus ON lsh_bucket (corpus_id)',
+)
+# 서로 다른 source의 문서 쌍, left_id < right_id
+MATCH_TABLE_CREATION_SQLS = (
+    'CREATE TABLE IF NOT EXISTS article_match (left_id INTEGER, right_id INTEGER, score REAL, PRIMARY KEY (left_id, right_id))',
+    'CREATE INDEX IF NOT EXISTS article_match_right ON article_match (right_id)',
+)
+CONFIG_TABLE_CREATION_SQL = 'CREATE TABLE IF NOT EXISTS minhash_config (key TEXT PRIMARY KEY, value)'
+# index를 처음 만들 때 max_df 비율보다 많은 문서에 나온 shingle, 이후 추가하는 문서에도 같은 목록을 사용
+FREQUENT_TABLE_CREATION_SQL = 'CREATE TABLE IF NOT EXISTS minhash_frequent (shingle INTEGER PRIMARY KEY)'
+# signature가 없거나 signature를 만든 후에 바뀐 corpus row
+PENDING_SQL = (
+    'SELECT corpus.id FROM corpus LEFT JOIN minhash ON minhash.corpus_id = corpus.id '
+    'WHERE minhash.corpus_id IS NULL OR minhash.updated_at IS NOT corpus.updated_at ORDER BY corpus.id'
+)
+# 새로 bucket에 넣은 문서와 같은 bucket에 있는 다른 source의 문서
+CANDIDATES_SQL = (
+    'SELECT DISTINCT new.corpus_id, other.corpus_id FROM lsh_bucket AS new '
+    'JOIN lsh_bucket AS other ON other.band = new.band AND other.bucket = new.bucket AND other.corpus_id != new.corpus_id '
+    'JOIN minhash AS a ON a.corpus_id = new.corpus_id JOIN minhash AS b ON b.corpus_id = other.corpus_id '
+    'WHERE new.corpus_id IN (SELECT id FROM temp.indexing) AND a.source != b.source'
+)
+MATCH_UPSERT_SQL = (
+    'INSERT INTO article_match (left_id, right_id, score) VALUES (?, ?, ?) '
+    'ON CONFLICT(left_id, right_id) DO UPDATE SET score = excluded.score'
+)
+MATCHES_QUERY_SQL = (
+    'SELECT l.source, l.title, r.source, r.title, m.score FROM article_match AS m '
+    'JOIN corpus AS l ON l.id = m.left_id JOIN corpus AS r ON r.id = m.right_id '
+    'WHERE m.score >= ? ORDER BY m.score DESC LIMIT ?'
+)
+
+
+class _WordHashes(dict):
+    """단어별 32bit hash cache, 실행마다 달라지는 hash() 대신 blake2b를 사용"""
+
+    def __missing__(self, word: str) -> int:
+        value = self[word] = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=4).digest(), 'little')
+        return value
+
+
+class MinHasher:
+    """문서의 단어 shingle 집합으로 MinHash signature를 만듦
+
+    두 signature에서 값이 같은 위치의 비율이 두 shingle 집합의 Jaccard 유사도의 추정값
+    shingle hash와 permutation은 seed로 결정되므로 나중에 추가하는 문서도 같은 signature 공간에 있음
+    """
+
+    def __init__(self, num_perm: int = 192, shingle_size: int = 1, seed: int = 1):
+        """
+        Args:
+            num_perm (int, optional): signature 길이 (hash 함수 수). Defaults to 192.
+            shingle_size (int, optional): shingle 하나의 단어 수, 불용어를 뺀 단어 기준. Defaults to 1.
+            seed (int, optional): permutation을 만드는 seed. Defaults to 1.
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.excluded = np.empty(0, dtype=np.uint32)  # 주제와 관계없이 여러 문서에 나오는 shingle
+        rng = np.random.default_rng(seed)
+        # h(x) = (a * x + b) % PRIME, a와 x가 2^32보다 작으므로 uint64에서 overflow 하지 않음
+        self.a = rng.integers(1, int(PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(PRIME), size=num_perm, dtype=np.uint64)
+        self._word_hashes = _WordHashes()
+
+    def shingles(self, text: str) -> np.ndarray:
+        """불용어를 뺀 소문자 단어 shingle_size 개씩의 32bit hash 집합
+
+        Args:
+            text (str): 문서
+
+        Returns:
+            np.ndarray: 정렬된 unique uint32 hash
+        """
+        words = _WORD.findall(text.lower())
+        if self.shingle_size == 1:  # 순서가 필요 없으므로 같은 단어는 한 번만 hash
+            words = list(set(words) - STOPWORDS)
+        else:
+            words = [word for word in words if word not in STOPWORDS]
+        if len(words) < self.shingle_size:
+            return np.empty(0, dtype=np.uint32)
+        word_hashes = np.fromiter(map(self._word_hashes.__getitem__, words), dtype=np.uint64, count=len(words))
+        count = len(words) - self.shingle_size + 1
+        hashes = word_hashes[:count].copy()
+        for offset in range(1, self.shingle_size):  # 이어진 단어의 hash를 섞어서 shingle hash를 만듦
+            hashes = (hashes * np.uint64(0x01000193) ^ word_hashes[offset:offset + count]) & np.uint64(0xFFFFFFFF)
+        hashes = np.unique(hashes.astype(np.uint32))
+        return hashes[~np.isin(hashes, self.excluded, assume_unique=True)] if len(self.excluded) else hashes
+
+    def signatures(self, shingle_sets: list) -> np.ndarray:
+        """여러 문서의 signature를 한 번에 계산
+
+        모든 문서의 shingle을 하나의 배열로 이어 붙인 후 permutation 묶음마다 hash를 계산하고
+        np.minimum.reduceat으로 문서별 최솟값을 구함
+
+        Args:
+            shingle_sets (list): shingles() 결과 목록, 비어있지 않아야 함
+
+        Returns:
+            np.ndarray: (문서 수, num_perm) uint32
+        """
+        values = np.concatenate(shingle_sets).astype(np.uint64)
+        offsets = np.cumsum([0] + [len(each) for each in shingle_sets[:-1]])
+        result = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint32)
+        block = max(1, min(self.num_perm, BLOCK_ELEMENTS // max(len(values), 1)))
+        for start in range(0, self.num_perm, block):
+            a = self.a[start:start + block, None]
+            b = self.b[start:start + block, None]
+            hashed = (a * values[None, :] + b) % PRIME
+            result[:, start:start + block] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return result
+
+
+def band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """signature를 bands 개의 band로 나누고 band마다 값들을 64bit bucket key로 합침
+
+    Returns:
+        np.ndarray: (문서 수, bands) int64, sqlite3 INTEGER로 저장할 수 있도록 signed
+    """
+    rows = signatures.shape[1] // bands
+    values = signatures[:, :bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for i in range(rows):  # FNV 방식으로 섞음, uint64 overflow는 의도된 동작
+        keys = keys * np.uint64(0x100000001B3) ^ values[:, :, i]
+    return keys.view(np.int64)
+
+
+def lsh_threshold(num_perm: int, bands: int) -> float:
+    """후보가 될 확률이 급격히 올라가는 Jaccard 유사도, (1 / bands)^(1 / rows)"""
+    return (1 / bands) ** (bands / num_perm)
+
+
+def similarity(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """signature 쌍의 Jaccard 유사도 추정값, 같은 행끼리 비교"""
+    return (left == right).mean(axis=1)
+
+
+class ArticleMatcher:
+    """corpus.db의 문서들을 MinHash LSH index로 묶어서 서로 다른 source의 비슷한 문서 쌍을 찾음
+
+    band 하나의 값이 모두 같은 문서 쌍만 후보로 비교하므로 모든 쌍을 비교하지 않음
+    Jaccard 유사도가 s인 쌍이 후보가 될 확률은 1 - (1 - s^rows)^bands
+    기본값(192 / 64 band = 3 rows)의 threshold는 (1/64)^(1/3) ≈ 0.25이고 min_score도 같은 값을 사용함,
+    유사도 0.4인 쌍은 98%, 0.1인 쌍은 6%, 0.05인 쌍은 1% 확률로 후보가 됨
+    shingle은 기본으로 단어 하나이며 (불용어와 흔한 단어를 뺀 단어 집합), 서로 다른 저자가 같은 주제로 쓴 글은
+    여러 단어 shingle을 거의 공유하지 않으므로 주제 비교에 적합함. 복사본 찾기처럼 거의 같은 글을 찾을 때는
+    shingle_size 3 이상과 row가 많은 band 설정(ex. num_perm 128, bands 16 = 8 rows, threshold ≈ 0.71)을 사용
+    같은 분야의 글은 주제가 달라도 흔한 단어를 많이 공유하므로 max_df 비율보다 많은 문서에 나온 shingle은 빼고 비교함
+    index는 corpus.db에 저장되며 update()는 새로 추가되거나 바뀐 문서만 signature를 만들고 비교함
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        num_perm: int = 192,
+        bands: int = 64,
+        shingle_size: int = 1,
+        seed: int = 1,
+        max_df: float = 0.05,
+        min_score: float = 0.25,
+        rebuild: bool = False,
+    ):
+        """
+        Args:
+            conn (sqlite3.Connection): corpus table이 있는 connection
+            num_perm (int, optional): signature 길이. Defaults to 192.
+            bands (int, optional): LSH band 수, num_perm의 약수여야 함. Defaults to 64.
+            shingle_size (int, optional): shingle 하나의 단어 수, 1이면 단어 집합. Defaults to 1.
+            seed (int, optional): permutation seed. Defaults to 1.
+            max_df (float, optional): 이 비율보다 많은 문서에 나온 shingle은 제외, 1 이상이면 모두 사용.
+                index를 처음 만들 때의 corpus로 정함. Defaults to 0.05.
+            min_score (float, optional): article_match에 저장할 최소 유사도, lsh_threshold()와 비슷하게 맞춤. Defaults to 0.25.
+            rebuild (bool, optional): 기존 index를 지우고 현재 설정으로 다시 만듦. Defaults to False.
+
+        Raises:
+            ValueError: bands가 num_perm의 약수가 아니거나, rebuild 없이 기존 index와 설정이 다른 경우
+        """
+        if num_perm % bands:
+            raise ValueError(f'bands({bands})는 num_perm({num_perm})의 약수여야 함')
+        self.conn = conn
+        self.config = {'num_perm': num_perm, 'bands': bands, 'shingle_size': shingle_size, 'seed': seed, 'max_df': max_df}
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands = bands
+        self.min_score = min_score
+        with conn:
+            conn.execute(MINHASH_TABLE_CREATION_SQL)
+            for sql in (*BUCKET_TABLE_CREATION_SQLS, *MATCH_TABLE_CREATION_SQLS):
+                conn.execute(sql)
+            conn.execute(CONFIG_TABLE_CREATION_SQL)
+            conn.execute(FREQUENT_TABLE_CREATION_SQL)
+            stored = dict(conn.execute('SELECT key, value FROM minhash_config'))
+            self.df_documents = stored.pop('df_documents', None)  # 제외할 shingle을 정할 때의 문서 수
+            if rebuild:
+                for table in ('minhash', 'lsh_bucket', 'article_match', 'minhash_config', 'minhash_frequent'):
+                    conn.execute(f'DELETE FROM {table}')
+                self.df_documents = None
+            elif stored and stored != self.config:  # 설정이 다르면 기존 signature와 비교할 수 없음
+                raise ValueError(f'기존 index와 설정이 다름: {stored}, rebuild로 다시 만들어야 함')
+            conn.executemany('INSERT OR IGNORE INTO minhash_config VALUES (?, ?)', self.config.items())
+        self.hasher.excluded = np.array(
+            [row[0] for row in conn.execute('SELECT shingle FROM minhash_frequent ORDER BY shingle')], dtype=np.uint32
+        )
+
+    def update(self, batch_size: int = 500, progress=None) -> dict:
+        """signature가 없거나 바뀐 문서를 batch_size 개씩 index에 넣고 다른 source의 후보 문서와 비교
+
+        Args:
+            batch_size (int, optional): 한 번에 signature를 만들고 저장할 문서 수. Defaults to 500.
+            progress (Callable, optional): batch마다 처리한 문서 수로 호출. Defaults to None.
+
+        Returns:
+            dict: {'removed', 'indexed', 'candidates', 'matches'} 개수
+        """
+        counts = dict.fromkeys(('removed', 'indexed', 'candidates', 'matches'), 0)
+        if self.df_documents is None:
+            self._exclude_frequent(batch_size)
+        with self.conn:  # corpus에서 지워진 문서
+            removed = [row[0] for row in self.conn.execute(
+                'SELECT corpus_id FROM minhash WHERE corpus_id NOT IN (SELECT id FROM corpus)'
+            )]
+            self._forget(removed)
+            counts['removed'] = len(removed)
+
+        pending = [row[0] for row in self.conn.execute(PENDING_SQL)]  # 저장하면서 바뀌므로 id를 먼저 모두 읽음
+        for rows in self._documents(pending, batch_size):
+            for key, value in self._index_batch(rows).items():
+                counts[key] += value
+            if progress is not None:
+                progress(counts['indexed'])
+        return counts
+
+    def _documents(self, ids: list, batch_size: int):
+        """(id, source, updated_at, title, abstract, body)를 batch_size 개씩 반환"""
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            yield self.conn.execute(
+                'SELECT id, source, updated_at, title, abstract, body FROM corpus '
+                f'WHERE id IN ({", ".join("?" * len(chunk))}) ORDER BY id',
+                chunk,
+            ).fetchall()
+
+    @staticmethod
+    def _text(row: tuple) -> str:
+        _, _, _, title, abstract, body = row
+        return ' '.join(filter(None, (title, abstract, body)))
+
+    def _exclude_frequent(self, batch_size: int) -> None:
+        """전체 corpus에서 shingle별 문서 수를 세서 max_df 비율보다 많은 문서에 나온 shingle을 저장
+
+        같은 주제의 두 문서에만 나오는 shingle은 제외되지 않도록 최소 기준은 2개 문서
+        """
+        ids = [row[0] for row in self.conn.execute('SELECT id FROM corpus ORDER BY id')]
+        values = np.empty(0, dtype=np.uint32)
+        counts = np.empty(0, dtype=np.int64)
+        if self.config['max_df'] < 1:
+            for rows in self._documents(ids, batch_size):
+                shingle_sets = [self.hasher.shingles(self._text(row)) for row in rows]
+                # batch의 문서 수를 앞서 센 문서 수와 합침
+                merged, inverse = np.unique(np.concatenate([values, *shingle_sets]), return_inverse=True)
+                weights = np.concatenate([counts, np.ones(len(inverse) - len(counts), dtype=np.int64)])
+                counts = np.bincount(inverse, weights=weights, minlength=len(merged)).astype(np.int64)
+                values = merged
+        frequent = values[counts > max(2, self.config['max_df'] * len(ids))]
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO minhash_frequent VALUES (?)', ((int(each),) for each in frequent))
+            self.conn.execute("INSERT OR REPLACE INTO minhash_config VALUES ('df_documents', ?)", (len(ids),))
+        self.hasher.excluded = frequent
+        self.df_documents = len(ids)
+
+    def _forget(self, ids: list) -> None:
+        """문서의 signature, bucket, match를 지움, transaction 안에서 호출"""
+        params = [(each,) for each in ids]
+        self.conn.executemany('DELETE FROM lsh_bucket WHERE corpus_id = ?', params)
+        self.conn.executemany('DELETE FROM article_match WHERE left_id = ? OR right_id = ?', [(each, each) for each in ids])
+        self.conn.executemany('DELETE FROM minhash WHERE corpus_id = ?', params)
+
+    def _index_batch(self, rows: list) -> dict:
+        ids = [row[0] for row in rows]
+        shingle_sets = [self.hasher.shingles(self._text(row)) for row in rows]
+        hashed = [i for i, shingles in enumerate(shingle_sets) if len(shingles)]
+        has_signature = set(hashed)
+        signatures = np.full((len(rows), self.hasher.num_perm), MAX_HASH, dtype=np.uint32)
+        if hashed:
+            signatures[hashed] = self.hasher.signatures([shingle_sets[i] for i in hashed])
+        keys = band_keys(signatures[hashed], self.bands)
+
+        with self.conn:
+            self._forget(ids)  # 바뀐 문서는 기존 bucket과 match를 지우고 다시 만듦
+            self.conn.executemany(
+                'INSERT INTO minhash (corpus_id, source, signature, updated_at) VALUES (?, ?, ?, ?)',
+                [
+                    (corpus_id, source, signatures[i].astype('<u4').tobytes() if i in has_signature else None, updated_at)
+                    for i, (corpus_id, source, updated_at, *_) in enumerate(rows)
+                ],
+            )
+            self.conn.executemany(
+                'INSERT INTO lsh_bucket (band, bucket, corpus_id) VALUES (?, ?, ?)',
+                [
+                    (band, int(key), ids[i])
+                    for i, row_keys in zip(hashed, keys)
+                    for band, key in enumerate(row_keys)
+                ],
+            )
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS indexing (id INTEGER PRIMARY KEY)')
+            self.conn.execute('DELETE FROM temp.indexing')
+            self.conn.executemany('INSERT INTO temp.indexing VALUES (?)', [(ids[i],) for i in hashed])
+            # 두 문서가 모두 이번 batch에 있으면 양쪽에서 나오므로 (작은 id, 큰 id)로 중복을 없앰
+            pairs = sorted({(min(a, b), max(a, b)) for a, b in self.conn.execute(CANDIDATES_SQL)})
+            matches = self._score(pairs)
+            self.conn.executemany(MATCH_UPSERT_SQL, matches)
+        return {'indexed': len(rows), 'candidates': len(pairs), 'matches': len(matches)}
+
+    def _score(self, pairs: list) -> list:
+        """후보 쌍의 signature를 한 번에 비교해서 min_score 이상인 쌍만 반환"""
+        if not pairs:
+            return []
+        pair_ids = np.array(pairs, dtype=np.int64)
+        ids = np.unique(pair_ids)
+        signatures = {}
+        for start in range(0, len(ids), 500):  # sqlite3의 변수 개수 제한
+            chunk = ids[start:start + 500].tolist()
+            signatures.update(self.conn.execute(
+                f'SELECT corpus_id, signature FROM minhash WHERE corpus_id IN ({", ".join("?" * len(chunk))})', chunk
+            ))
+        matrix = np.stack([np.frombuffer(signatures[each], dtype='<u4') for each in ids.tolist()])
+        left = matrix[np.searchsorted(ids, pair_ids[:, 0])]
+        right = matrix[np.searchsorted(ids, pair_ids[:, 1])]
+        scores = similarity(left, right)
+        keep = scores >= self.min_score
+        return [(int(a), int(b), float(score)) for (a, b), score in zip(pair_ids[keep], scores[keep])]
+
+
+def best_matches(conn: sqlite3.Connection, min_score: float = 0.0, limit: int = 20) -> list[tuple]:
+    """유사도가 높은 순서대로 (source, title, source, title, score)"""
+    return conn.execute(MATCHES_QUERY_SQL, (min_score, limit)).fetchall()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='corpus.db에서 MinHash LSH로 서로 다른 source의 같은 주제 문서를 찾음')
+    parser.add_argument('--corpus', default='corpus.db', help='corpus.py로 만든 corpus db')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    update_parser = subparsers.add_parser('update', help='새로 추가되거나 바뀐 문서를 index에 넣고 match를 갱신')
+    update_parser.add_argument('--num-perm', type=int, default=192, help='MinHash signature 길이')
+    update_parser.add_argument(
+        '--bands', type=int, default=64, help='LSH band 수, --num-perm의 약수, threshold는 (1/bands)^(bands/num_perm)'
+    )
+    update_parser.add_argument('--shingle-size', type=int, default=1, help='shingle 하나의 단어 수, 1이면 단어 집합')
+    update_parser.add_argument(
+        '--max-df', type=float, default=0.05, help='이 비율보다 많은 문서에 나온 shingle은 제외, 1이면 모두 사용'
+    )
+    update_parser.add_argument('--seed', type=int, default=1, help='permutation seed')
+    update_parser.add_argument(
+        '--min-score', type=float, default=0.25, help='저장할 최소 유사도 (Jaccard 추정값), LSH threshold와 비슷하게 맞춤'
+    )
+    update_parser.add_argument('--batch-size', type=int, default=500, help='한 번에 처리할 문서 수')
+    update_parser.add_argument('--rebuild', action='store_true', help='기존 index를 지우고 현재 설정으로 다시 만듦')
+    show_parser = subparsers.add_parser('show', help='유사도가 높은 문서 쌍을 출력')
+    show_parser.add_argument('--min-score', type=float, default=0.0, help='출력할 최소 유사도')
+    show_parser.add_argument('--limit', type=int, default=20, help='최대 출력 수')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    conn = sqlite3.connect(options.corpus)
+    if options.command == 'show':
+        for left_source, left_title, right_source, right_title, score in best_matches(conn, options.min_score, options.limit):
+            print(f'{score:.3f}  [{left_source.upper()}] {left_title}  <->  [{right_source.upper()}] {right_title}')
+        return
+
+    try:
+        matcher = ArticleMatcher(
+            conn,
+            num_perm=options.num_perm,
+            bands=options.bands,
+            shingle_size=options.shingle_size,
+            seed=options.seed,
+            max_df=options.max_df,
+            min_score=options.min_score,
+            rebuild=options.rebuild,
+        )
+    except ValueError as e:
+        sys.exit(f'matching.py: error: {e}')
+    print(f'LSH threshold {lsh_threshold(options.num_perm, options.bands):.2f}, min score {options.min_score:.2f}')
+    start = time.perf_counter()
+    counts = matcher.update(options.batch_size, progress=lambda done: print(f'\r{done} documents indexed', end=''))
+    print(
+        f'\n{counts["indexed"]} indexed, {counts["removed"]} removed, {counts["candidates"]} candidate pairs, '
+        f'{counts["matches"]} matches in {time.perf_counter() - start:.1f}s'
+    )
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
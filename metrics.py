@@ -0,0 +1,314 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from colorama import Style
+
+# histogram bucket의 상한 (초)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheus textfile의 HELP에 사용할 설명
+DESCRIPTIONS = {
+    'scrap_pages_total': '처리한 page 수, status는 done, unchanged, failed 또는 dead',
+    'scrap_fetch_seconds': 'page 요청 하나에 걸린 시간',
+    'scrap_fetch_retries_total': '재시도한 요청 수',
+    'scrap_fetch_backoffs_total': '429, 503, timeout으로 요청 속도를 줄인 횟수',
+    'scrap_fetch_rate': 'host별 현재 초당 요청 수',
+    'scrap_fetch_timeouts_total': 'timeout이 발생한 요청 수',
+    'scrap_fetch_bytes_total': '받은 응답 body의 byte 수',
+    'scrap_fetch_responses_total': 'status code별 응답 수',
+    'scrap_connect_seconds': '새 연결(TCP, TLS)을 만드는 데 걸린 시간',
+    'scrap_connections_total': '요청에 사용한 연결 수, kind는 new 또는 reused (keep-alive)',
+    'scrap_parse_seconds': 'field별 파싱에 걸린 시간',
+    'scrap_db_write_seconds': 'transaction 하나를 저장하는 데 걸린 시간',
+    'scrap_db_rows_total': '추가하거나 갱신한 row 수',
+    'scrap_changes_total': 'page별 변경 여부, change는 added, modified 또는 unchanged',
+    'scrap_queue_depth': 'stage 사이 queue에 쌓인 항목 수',
+}
+
+
+class Histogram:
+    """고정된 bucket으로 측정값의 분포를 기록하는 histogram"""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막은 +Inf bucket
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """q 분위수가 속한 bucket의 상한, +Inf bucket이면 최댓값
+
+        Args:
+            q (float): 분위 (0 ~ 1)
+
+        Returns:
+            float: 분위수의 근삿값
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([*map(str, self.buckets), '+Inf'], self.counts)),
+        }
+
+
+class Metrics:
+    """counter, gauge, histogram을 이름과 label별로 모아두는 registry
+
+    fetch(event loop), 파싱, writer thread 등 여러 thread에서 함께 기록하므로 모든 갱신은 lock 안에서 수행함
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def labeled(self, **labels) -> 'LabeledMetrics':
+        """모든 기록에 labels를 붙이는 view, ex) metrics.labeled(site='SEP')"""
+        return LabeledMetrics(self, labels)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """with 구문 안에서 걸린 시간을 histogram에 기록"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def quantile(self, name: str, q: float, **labels) -> float:
+        with self._lock:
+            histogram = self._histograms.get(self._key(name, labels))
+            return histogram.quantile(q) if histogram is not None else 0.0
+
+    def snapshot(self) -> dict:
+        """현재까지 기록된 모든 값을 json으로 저장할 수 있는 형태로 반환"""
+        def entries(values, convert=lambda value: value):
+            return [
+                {'name': name, 'labels': dict(labels), 'value': convert(value)}
+                for (name, labels), value in sorted(values.items())
+            ]
+
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'counters': entries(self._counters),
+                'gauges': entries(self._gauges),
+                'histograms': entries(self._histograms, Histogram.to_dict),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (node_exporter textfile collector에서 읽을 수 있음)"""
+        def label_text(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in DESCRIPTIONS:
+                    lines.append(f'# HELP {name} {DESCRIPTIONS[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                describe(name, 'counter')
+                lines.append(f'{name}{label_text(labels)} {value}')
+            for (name, labels), value in sorted(self._gauges.items()):
+                describe(name, 'gauge')
+                lines.append(f'{name}{label_text(labels)} {value}')
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                describe(name, 'histogram')
+                cumulative = 0
+                for bound, bucket_count in zip([*map(str, histogram.buckets), '+Inf'], histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{label_text(labels, (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{label_text(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{label_text(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class LabeledMetrics:
+    """Metrics에 기록할 때마다 정해진 label을 함께 붙이는 view"""
+
+    def __init__(self, metrics: Metrics, labels: dict):
+        self.metrics = metrics
+        self.labels = labels
+
+    def labeled(self, **labels) -> 'LabeledMetrics':
+        return LabeledMetrics(self.metrics, {**self.labels, **labels})
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        self.metrics.inc(name, value, **self.labels, **labels)
+
+    def set(self, name: str, value: float, **labels) -> None:
+        self.metrics.set(name, value, **self.labels, **labels)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        self.metrics.observe(name, value, **self.labels, **labels)
+
+    def time(self, name: str, **labels):
+        return self.metrics.time(name, **self.labels, **labels)
+
+    def quantile(self, name: str, q: float, **labels) -> float:
+        return self.metrics.quantile(name, q, **self.labels, **labels)
+
+
+class MetricsSink:
+    """interval 초마다 metrics를 파일로 저장하는 thread
+
+    파일 확장자가 .prom이면 Prometheus textfile 형식, 그 외에는 json으로 저장함
+    임시 파일에 기록한 후 교체하므로 읽는 쪽에서 기록 중인 파일을 보지 않음
+    """
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 10.0):
+        """
+        Args:
+            metrics (Metrics): 저장할 metrics
+            path (str): 저장할 파일 경로
+            interval (float, optional): 저장 간격 (초). Defaults to 10.0.
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-sink', daemon=True)
+
+    def write(self) -> None:
+        if self.path.endswith('.prom'):
+            data = self.metrics.to_prometheus()
+        else:
+            data = json.dumps(self.metrics.snapshot(), ensure_ascii=False, indent=4)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def start(self) -> 'MetricsSink':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """thread를 종료하고 마지막 값을 저장"""
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+
+class ProgressLine:
+    """page마다 출력하는 대신 interval 초마다 진행 상황을 한 줄로 모아서 출력"""
+
+    def __init__(self, name: str, color, total: int, metrics: LabeledMetrics, interval: float = 5.0):
+        """
+        Args:
+            name (str): 출력할 이름, ex) SEP
+            color (str): colorama 색상
+            total (int): 전체 page 수
+            metrics (LabeledMetrics): 지연 시간 분위수를 읽을 metrics
+            interval (float, optional): 출력 간격 (초). Defaults to 5.0.
+        """
+        self.name = name
+        self.color = color
+        self.total = total
+        self.metrics = metrics
+        self.interval = interval
+        self.done = 0
+        self.unchanged = 0
+        self.failed = 0
+        self._started_at = time.monotonic()
+        self._printed_at = self._started_at
+
+    def page(self, status: str = 'done') -> None:
+        """page 하나의 처리 결과를 기록하고 interval이 지났으면 진행 상황을 출력
+
+        Args:
+            status (str, optional): done, unchanged (html이 바뀌지 않아 파싱하지 않음), failed 또는 dead. Defaults to 'done'.
+        """
+        if status in ('done', 'unchanged'):
+            self.done += 1
+            self.unchanged += status == 'unchanged'
+        else:
+            self.failed += 1
+        self.metrics.inc('scrap_pages_total', status=status)
+        now = time.monotonic()
+        if now - self._printed_at >= self.interval:
+            self._printed_at = now
+            self.print()
+
+    def print(self) -> None:
+        elapsed = time.monotonic() - self._started_at
+        processed = self.done + self.failed
+        rate = processed / elapsed if elapsed else 0.0
+        unchanged = f'{self.unchanged} unchanged, ' if self.unchanged else ''
+        fetch_p50 = self.metrics.quantile('scrap_fetch_seconds', 0.5)
+        write_p50 = self.metrics.quantile('scrap_db_write_seconds', 0.5)
+        print(
+            f'{self.color}{self.name} > [{processed}/{self.total}] {unchanged}{self.failed} failed, {rate:.1f} pages/sec, '
+            f'fetch p50 {fetch_p50 * 1e3:.0f}ms, db write p50 {write_p50 * 1e3:.0f}ms{Style.RESET_ALL}'
+        )
+        sys.stdout.flush()
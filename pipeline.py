@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+from metrics import Metrics
+
+_sites = {}
+
+
+def _init_worker(sites: dict) -> None:
+    _sites.update(sites)
+
+
+def _parse_in_worker(site_name: str, html_body: str) -> tuple:
+    timings = {}
+    return _sites[site_name].parse_page(html_body, timings), timings
+
+
+def make_parse_executor(sites: list, workers: int) -> ProcessPoolExecutor:
+    """여러 site가 함께 사용하는 parser process pool, 각 site의 설정(backend 등)이 worker process로 복사됨
+
+    Args:
+        sites (list[SiteBase]): 파싱에 사용할 site들, class 이름으로 구분함
+        workers (int): parser worker process 수
+
+    Returns:
+        ProcessPoolExecutor: ParsePool의 executor로 전달
+    """
+    return ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=({site.__class__.__name__: site for site in sites},)
+    )
+
+
+class ParsePool:
+    """site의 get_*_in_page 메소드들을 별도 process에서 실행하는 파싱 stage
+
+    BeautifulSoup/markdownify 작업은 CPU를 사용하고 GIL을 점유하므로
+    network I/O와 분리해서 process pool에서 실행해야 core 수만큼 파싱 처리량이 늘어남
+    """
+
+    def __init__(self, site, workers: int, metrics: Metrics = None, executor: ProcessPoolExecutor = None):
+        """
+        Args:
+            site (SiteBase): 파싱에 사용할 site, 설정(backend 등)과 함께 각 worker process로 복사됨
+            workers (int): parser worker process 수
+            metrics (Metrics, optional): worker에서 측정한 field별 파싱 시간을 기록할 metrics. Defaults to None.
+            executor (ProcessPoolExecutor, optional): 여러 site가 공유하는 make_parse_executor()의 executor,
+                없으면 이 site만 사용하는 executor를 만듦. Defaults to None.
+        """
+        self.site_name = site.__class__.__name__
+        self.workers = workers
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._owns_executor = executor is None
+        self.executor = make_parse_executor([site], workers) if executor is None else executor
+
+    async def parse_all(self, pages: AsyncIterator[tuple[str, str]]) -> AsyncIterator[tuple[str, tuple]]:
+        """가져온 page들을 process pool에서 파싱하고 완료된 순서대로 (uri, row)를 반환
+
+        동시에 파싱중인 page는 worker 수의 2배로 제한되며, 가득 차면 pages를 더 읽지 않으므로
+        앞 단계의 bounded queue가 차서 fetch도 멈춤 (backpressure)
+        executor를 공유하는 경우에도 site별로 이 제한이 적용되므로 한 site가 executor의 queue를 독점하지 않음
+        pages는 별도 task에서 읽으므로 다음 page를 기다리는 동안에도 파싱이 끝난 page는 바로 반환됨
+
+        Args:
+            pages (AsyncIterator[tuple[str, str]]): (uri, html body), html body 대신 예외가 올 수 있음
+
+        Yields:
+            tuple[str, tuple]: (uri, parse_page() 결과), 실패한 page는 결과 대신 예외를 반환
+        """
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers * 2)
+        results = asyncio.Queue()
+        in_flight = set()
+
+        async def parse(uri, html_body):
+            if isinstance(html_body, Exception):  # fetch 단계에서 실패한 page는 그대로 전달
+                results.put_nowait((uri, html_body))
+                return
+            try:
+                row, timings = await loop.run_in_executor(self.executor, _parse_in_worker, self.site_name, html_body)
+            except Exception as e:
+                results.put_nowait((uri, e))
+                return
+            for field, seconds in timings.items():  # worker process의 측정값은 main process에서 기록
+                self.metrics.observe('scrap_parse_seconds', seconds, field=field)
+            results.put_nowait((uri, row))
+
+        async def feed():
+            try:
+                async for page_uri, html_body in pages:
+                    await slots.acquire()
+                    task = asyncio.create_task(parse(page_uri, html_body))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    self.metrics.set('scrap_queue_depth', len(in_flight), queue='parsing')
+                await asyncio.gather(*in_flight)
+            except Exception:
+                results.put_nowait(None)  # 소비하는 쪽이 종료하도록 알리고 예외는 await feeder에서 발생
+                raise
+            results.put_nowait(None)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while (item := await results.get()) is not None:
+                # 반환한 page만큼 다음 page를 읽으므로 소비하는 쪽이 느리면 파싱도 멈춤
+                slots.release()
+                self.metrics.set('scrap_queue_depth', len(in_flight), queue='parsing')
+                yield item
+            await feeder  # pages를 읽다 실패했으면 예외 발생
+        finally:
+            feeder.cancel()
+            for task in list(in_flight):
+                task.cancel()
+
+    def close(self) -> None:
+        if self._owns_executor:  # 공유하는 executor는 만든 쪽에서 종료
+            self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,397 @@
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from compression import COMPRESSED_COLUMNS, ColumnCodec
+from corpus import CORPUS_COLUMNS, source_paths
+from writer import ScrapWriter
+
+FIELDS = CORPUS_COLUMNS
+DEFAULT_LIST_FIELDS = ('uri', 'title')
+MAX_LIST_LIMIT = 1000
+TITLE_URI_SQL = 'SELECT uri FROM scrap WHERE title = ? ORDER BY id LIMIT 1'
+
+
+class LRUCache:
+    """크기 합계가 max_bytes를 넘지 않도록 오래 사용하지 않은 항목부터 버리는 thread-safe LRU cache"""
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes (int): 항목 크기의 합계 상한, 항목 하나가 이보다 크면 저장하지 않음
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key: (value, size), 마지막이 가장 최근에 사용한 항목
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size: int) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
+
+    def discard(self, prefix: tuple) -> None:
+        """key가 prefix로 시작하는 항목을 모두 지움"""
+        with self._lock:
+            for key in [key for key in self._items if key[:len(prefix)] == prefix]:
+                self.size -= self._items.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'items': len(self._items), 'bytes': self.size, 'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses
+            }
+
+
+def create_title_index(path: str) -> None:
+    """ScrapWriter가 title index를 만들기 전에 저장된 db에도 scrap_title index를 추가
+
+    쓰기 권한이 없거나 다른 process가 오래 쓰고 있으면 건너뛰며, 이 경우 title 검색은 index 없이 동작함
+
+    Args:
+        path (str): sqlite3 파일 경로
+    """
+    try:
+        conn = sqlite3.connect(f'file:{path}?mode=rw', uri=True, timeout=5.0)
+    except sqlite3.OperationalError:  # 파일이 없는 경우는 읽기 전용 connection에서 오류를 냄
+        return
+    try:
+        with conn:
+            conn.execute(ScrapWriter.TITLE_INDEX_CREATION_SQL)
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        conn.close()
+
+
+class ConnectionPool:
+    """읽기 전용 connection pool, 요청마다 db 파일을 새로 열지 않고 connection을 돌려가며 사용
+
+    모든 connection을 미리 만들어서 db가 바뀌었는지 확인하는 기준(PRAGMA data_version)이 cache보다 먼저 정해지도록 함
+    """
+
+    def __init__(self, path: str, size: int = 4):
+        """
+        Args:
+            path (str): sqlite3 파일 경로
+            size (int, optional): connection 수, 동시에 처리할 수 있는 요청 수. Defaults to 4.
+
+        Raises:
+            sqlite3.OperationalError: db 파일을 열 수 없는 경우
+        """
+        self.path = path
+        create_title_index(path)
+        self._idle = queue.LifoQueue()  # 최근에 사용한 connection을 다시 사용
+        self._versions = {}
+        for _ in range(size):
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            ColumnCodec(conn)  # decompress() SQL 함수 등록
+            self._versions[conn] = conn.execute('PRAGMA data_version').fetchone()[0]
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """(connection, changed), changed는 이 connection으로 마지막에 읽은 이후 다른 process가 db를 바꿨는지 여부"""
+        conn = self._idle.get()
+        try:
+            version = conn.execute('PRAGMA data_version').fetchone()[0]
+            changed = version != self._versions[conn]
+            if changed:
+                self._versions[conn] = version
+                ColumnCodec(conn)  # 그 사이에 추가된 zlib-dict dictionary를 다시 읽음
+            yield conn, changed
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for conn in self._versions:
+            conn.close()
+
+
+class ArticleStore:
+    """site별 db의 문서를 uri, title로 찾고 목록을 나누어 읽는 읽기 전용 저장소
+
+    압축을 해제한 field와 json을 파싱한 contents tree를 (source, uri)별로 LRU cache에 저장하고,
+    요청한 field 중 cache에 없는 field만 db에서 읽어서 합침
+    스크래핑 중인 db도 읽을 수 있으며, db가 바뀐 것을 발견하면 그 source의 cache를 비움
+    """
+
+    def __init__(self, sources: dict, pool_size: int = 4, cache_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            sources (dict): {source 이름: site별 sqlite3 파일 경로}
+            pool_size (int, optional): source별 connection 수. Defaults to 4.
+            cache_bytes (int, optional): cache 크기 상한, 압축을 해제한 column 값의 길이 기준. Defaults to 64MB.
+        """
+        self.pools = {name: ConnectionPool(path, pool_size) for name, path in sources.items()}
+        self.cache = LRUCache(cache_bytes)
+        self._generations = dict.fromkeys(sources, 0)  # source의 cache를 비운 횟수
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self, source: str):
+        try:
+            pool = self.pools[source]
+        except KeyError:
+            raise KeyError(f'알 수 없는 source: {source}') from None
+        with pool.connection() as (conn, changed):
+            if changed:
+                with self._lock:
+                    self._generations[source] += 1
+                self.cache.discard((source,))
+            yield conn
+
+    def article(self, source: str, uri: str = None, title: str = None, fields: tuple = FIELDS) -> dict:
+        """uri 또는 title에 해당하는 문서의 fields, title이 같은 문서가 여럿이면 먼저 저장된 문서
+
+        Args:
+            source (str): source 이름
+            uri (str, optional): page uri. Defaults to None.
+            title (str, optional): 문서 title, uri가 없을 때 사용. Defaults to None.
+            fields (tuple, optional): 반환할 field, FIELDS 중 선택. Defaults to FIELDS.
+
+        Raises:
+            KeyError: 알 수 없는 source인 경우
+            ValueError: uri, title이 모두 없거나 알 수 없는 field인 경우
+
+        Returns:
+            dict: {field: 값}, contents는 목차 tree, 문서가 없으면 None
+        """
+        _check_fields(fields)
+        if uri is None and title is None:
+            raise ValueError('uri 또는 title이 필요함')
+        with self._connection(source) as conn:
+            if uri is None:
+                uri = self._title_uri(conn, title)
+                if uri is None:
+                    return None
+            key = (source, uri)
+            generation = self._generations[source]
+            cached, size = self.cache.get(key) or ({}, 0)
+            missing = [field for field in fields if field not in cached]
+            if missing:
+                row = conn.execute(
+                    f'SELECT {", ".join(map(_select_column, missing))} FROM scrap WHERE uri = ?', (uri,)
+                ).fetchone()
+                if row is None:
+                    return None
+                # cache의 dict는 다른 thread와 공유하므로 새 dict를 만들어서 저장
+                cached = cached | {field: _decode(field, value) for field, value in zip(missing, row)}
+                size += sum(len(value) if isinstance(value, str) else 8 for value in row)
+                with self._lock:  # 읽는 동안 db가 바뀌어 cache를 비웠으면 이전 값을 저장하지 않음
+                    if generation == self._generations[source]:
+                        self.cache.put(key, (cached, size), size)
+        return {field: cached[field] for field in fields}
+
+    @staticmethod
+    def _title_uri(conn: sqlite3.Connection, title: str) -> str:
+        row = conn.execute(TITLE_URI_SQL, (title,)).fetchone()  # scrap_title index 사용
+        return row[0] if row else None
+
+    def articles(self, source: str, after: int = 0, limit: int = 50, fields: tuple = DEFAULT_LIST_FIELDS) -> tuple:
+        """id 순서로 after 다음의 문서 limit 개, 목록은 cache에 저장하지 않음
+
+        Args:
+            source (str): source 이름
+            after (int, optional): 이전 page의 next 값, 처음이면 0. Defaults to 0.
+            limit (int, optional): 최대 문서 수. Defaults to 50.
+            fields (tuple, optional): 반환할 field. Defaults to ('uri', 'title').
+
+        Raises:
+            KeyError: 알 수 없는 source인 경우
+            ValueError: 알 수 없는 field인 경우
+
+        Returns:
+            tuple: (list[dict], next), next는 다음 page의 after 값, 마지막 page이면 None
+        """
+        _check_fields(fields)
+        with self._connection(source) as conn:
+            rows = conn.execute(
+                f'SELECT id, {", ".join(map(_select_column, fields))} FROM scrap WHERE id > ? ORDER BY id LIMIT ?',
+                (after, limit),
+            ).fetchall()
+        items = [{field: _decode(field, value) for field, value in zip(fields, row[1:])} for row in rows]
+        return items, rows[-1][0] if len(rows) == limit else None
+
+    def sources(self) -> dict:
+        """{source 이름: 문서 수}"""
+        counts = {}
+        for source in self.pools:
+            with self._connection(source) as conn:
+                counts[source] = conn.execute('SELECT COUNT(*) FROM scrap').fetchone()[0]
+        return counts
+
+    def close(self) -> None:
+        for pool in self.pools.values():
+            pool.close()
+
+
+def _check_fields(fields: tuple) -> None:
+    unknown = set(fields) - set(FIELDS)
+    if unknown or not fields:
+        raise ValueError(f'알 수 없는 field: {", ".join(sorted(unknown))}, 사용할 수 있는 field: {", ".join(FIELDS)}')
+
+
+def _select_column(field: str) -> str:
+    return f'decompress({field})' if field in COMPRESSED_COLUMNS else field
+
+
+def _decode(field: str, value):
+    return json.loads(value) if field == 'contents' and value is not None else value
+
+
+def _int_param(params: dict, name: str, default: int, minimum: int = 0) -> int:
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f'{name} 값은 정수여야 함: {value}') from None
+    if value < minimum:
+        raise ValueError(f'{name} 값은 {minimum} 이상이어야 함: {value}')
+    return value
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET 요청을 ArticleStore로 처리하고 json으로 응답
+
+    /sources
+    /stats
+    /{source}/article?uri=...&fields=title,contents
+    /{source}/article?title=...
+    /{source}/articles?after=0&limit=50&fields=uri,title
+    """
+
+    protocol_version = 'HTTP/1.1'  # keep-alive 연결을 유지함
+    disable_nagle_algorithm = True  # header와 body를 따로 보내므로 keep-alive 연결에서 delayed ACK를 기다리지 않도록 함
+    store: ArticleStore = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        path = parts.path.strip('/').split('/')
+        try:
+            if path == ['sources']:
+                return self._send(200, self.store.sources())
+            if path == ['stats']:
+                return self._send(200, self.store.cache.stats())
+            if len(path) != 2 or path[1] not in ('article', 'articles'):
+                return self._send(404, {'error': f'알 수 없는 경로: {parts.path}'})
+            source, command = path
+            if command == 'article':
+                fields = tuple(params['fields'].split(',')) if 'fields' in params else FIELDS
+                result = self.store.article(source, params.get('uri'), params.get('title'), fields)
+                if result is None:
+                    return self._send(404, {'error': '문서가 없음'})
+                return self._send(200, result)
+            fields = tuple(params['fields'].split(',')) if 'fields' in params else DEFAULT_LIST_FIELDS
+            limit = min(_int_param(params, 'limit', 50, minimum=1), MAX_LIST_LIMIT)
+            items, next_after = self.store.articles(source, _int_param(params, 'after', 0), limit, fields)
+            return self._send(200, {'items': items, 'next': next_after})
+        except KeyError as e:
+            return self._send(404, {'error': e.args[0]})
+        except ValueError as e:  # 잘못된 field, after, limit
+            return self._send(400, {'error': str(e)})
+
+    def _send(self, status: int, data) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # 요청마다 출력하지 않음
+        pass
+
+
+class QueryServer:
+    """site별 db를 읽기 전용으로 조회하는 local HTTP json server"""
+
+    def __init__(self, store: ArticleStore, host: str = '127.0.0.1', port: int = 0):
+        handler = type('BoundQueryHandler', (QueryHandler,), {'store': store})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'QueryServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='query-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='site별 db의 문서를 uri, title로 조회하는 local HTTP json server')
+    parser.add_argument('--db-dir', default='.', help='site별 db({site}.db)가 있는 directory')
+    parser.add_argument('--sources', nargs='+', default=None, help='제공할 site 이름, 없으면 db 파일이 있는 등록된 모든 site')
+    parser.add_argument(
+        '--plugin', dest='plugins', action='append', default=[], help='register_site()로 site를 등록하는 module, 여러 번 지정 가능'
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pool-size', type=int, default=4, help='source별 읽기 connection 수')
+    parser.add_argument('--cache-mb', type=int, default=64, help='문서 cache 크기 상한 (MB)')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    sources = source_paths(options.db_dir, options.sources, options.plugins)
+    start = time.perf_counter()
+    store = ArticleStore(sources, options.pool_size, options.cache_mb * 1024 * 1024)
+    server = QueryServer(store, options.host, options.port)
+    print(f'Serving {", ".join(sources)} at {server.url} ({(time.perf_counter() - start) * 1e3:.1f}ms)')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import importlib
+
+# 이름별로 등록된 SiteBase 구현체, register_site()로 등록됨
+SITES = {}
+# 항상 불러오는 site module, 다른 site는 load_plugins()에 module 이름을 전달해서 추가
+BUILTIN_PLUGINS = ('wikis',)
+
+
+def register_site(name: str):
+    """SiteBase 구현체를 이름으로 등록하는 class decorator, 결과 파일의 기본 경로는 {name}.db
+
+    ex)
+        @register_site('sep')
+        class SEP(SiteBase): ...
+
+    Args:
+        name (str): scrap.py의 --sites에서 사용할 이름
+
+    Raises:
+        ValueError: 다른 class가 같은 이름으로 등록되어 있는 경우
+    """
+    def decorator(cls):
+        if SITES.get(name, cls) is not cls:
+            raise ValueError(f'이미 등록된 site 이름: {name}')
+        cls.NAME = name
+        SITES[name] = cls
+        return cls
+
+    return decorator
+
+
+def load_plugins(modules: tuple = ()) -> dict:
+    """기본 site module과 modules를 import 해서 site들을 등록
+
+    Args:
+        modules (tuple, optional): register_site()로 site를 등록하는 module 이름, ex) ('mysites.stanford',). Defaults to ().
+
+    Returns:
+        dict: {이름: site class}
+    """
+    for module in (*BUILTIN_PLUGINS, *modules):
+        importlib.import_module(module)
+    return SITES
+
+
+def get_site(name: str) -> type:
+    """이름으로 등록된 site class
+
+    Raises:
+        KeyError: 등록되지 않은 이름인 경우
+    """
+    try:
+        return SITES[name]
+    except KeyError:
+        raise KeyError(f'등록되지 않은 site: {name}, 등록된 site: {", ".join(sorted(SITES))}') from None
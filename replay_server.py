@@ -0,0 +1,137 @@
+import argparse
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import urlsplit
+
+
+def page_path(root: str, uri: str) -> str:
+    """uri에 해당하는 기록된 page의 파일 경로
+
+    https://plato.stanford.edu/entries/kant/ -> {root}/plato.stanford.edu/entries/kant/index.html
+
+    Args:
+        root (str): 기록된 page들이 저장된 directory
+        uri (str): page uri
+
+    Returns:
+        str: 파일 경로
+    """
+    parts = urlsplit(uri)
+    path = parts.path.lstrip('/')
+    if path == '' or path.endswith('/'):
+        path += 'index.html'
+    return os.path.join(root, parts.netloc, path)
+
+
+def save_page(root: str, uri: str, html_body: str) -> None:
+    """page를 replay server가 제공할 수 있는 위치에 기록
+
+    Args:
+        root (str): 기록된 page들이 저장될 directory
+        uri (str): page uri
+        html_body (str): page html body
+    """
+    path = page_path(root, uri)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html_body)
+
+
+def recorded_pages(root: str) -> Iterator[tuple[str, str]]:
+    """root에 기록된 모든 page의 uri와 파일 경로
+
+    Args:
+        root (str): 기록된 page들이 저장된 directory
+
+    Yields:
+        tuple[str, str]: (uri, 파일 경로)
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, root).replace(os.sep, '/')
+            if rel_path.endswith('index.html'):
+                rel_path = rel_path[:-len('index.html')]
+            yield f'https://{rel_path}', path
+
+
+def mirror_uri(mirror: str, uri: str) -> str:
+    """실제 uri를 replay server의 주소로 변환
+
+    https://plato.stanford.edu/entries/kant/ -> {mirror}/plato.stanford.edu/entries/kant/
+
+    Args:
+        mirror (str): replay server 주소, ex) http://127.0.0.1:8000
+        uri (str): page uri
+
+    Returns:
+        str: replay server에서의 page 주소
+    """
+    parts = urlsplit(uri)
+    query = f'?{parts.query}' if parts.query else ''
+    return f'{mirror.rstrip("/")}/{parts.netloc}{parts.path}{query}'
+
+
+class ReplayHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 실제 사이트와 같이 keep-alive 연결을 유지함
+
+    def log_message(self, format, *args):  # 요청마다 출력하지 않음
+        pass
+
+
+class ReplayServer:
+    """기록된 SEP/IEP page들을 제공하는 local stand-in HTTP server
+
+    실제 사이트 대신 이 server를 대상으로 스크래핑하면 network 없이 crawl을 재현할 수 있음
+    """
+
+    def __init__(self, root: str, host: str = '127.0.0.1', port: int = 0):
+        handler = lambda *args, **kwargs: ReplayHandler(*args, directory=root, **kwargs)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'ReplayServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='기록된 page들을 제공하는 replay server')
+    parser.add_argument('root', help='기록된 page들이 저장된 directory')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    server = ReplayServer(args.root, args.host, args.port)
+    print(f'Serving {args.root} at {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
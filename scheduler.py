@@ -0,0 +1,208 @@
+import asyncio
+import sys
+import threading
+from collections import deque
+
+from colorama import Fore, Style
+
+from metrics import Metrics
+from pipeline import make_parse_executor
+
+COLORS = (Fore.CYAN, Fore.MAGENTA, Fore.YELLOW, Fore.GREEN, Fore.BLUE, Fore.RED)
+
+
+class WorkerPool:
+    """여러 site가 함께 사용하는 fetch worker slot pool
+
+    동시에 진행되는 요청 수를 전체 workers 개로 제한하고, site별로도 limit 개를 넘지 않도록 함
+    slot이 반환되면 기다리는 site들에 돌아가면서(round robin) 배정하므로 한 site가 pool을 독점하지 않고,
+    먼저 끝난 site의 slot은 남은 site들이 사용함
+    site마다 별도 thread, event loop에서 스크래핑하므로 모든 상태는 lock 안에서 갱신함
+    """
+
+    def __init__(self, workers: int):
+        """
+        Args:
+            workers (int): 모든 site를 합한 최대 동시 요청 수
+        """
+        self.workers = workers
+        self.running = 0
+        self._lock = threading.Lock()
+        self._order = deque()  # slot을 배정할 site 순서, 배정할 때마다 회전함
+
+    def site(self, name: str, limit: int) -> 'SiteSlots':
+        """site별 slot, with 또는 async with로 요청 하나 동안 slot을 사용
+
+        Args:
+            name (str): site 이름
+            limit (int): site의 최대 동시 요청 수
+
+        Returns:
+            SiteSlots: site의 slot
+        """
+        slots = SiteSlots(self, name, limit)
+        with self._lock:
+            self._order.append(slots)
+        return slots
+
+    def _dispatch(self) -> None:
+        """빈 slot을 기다리는 site들에 돌아가면서 배정, lock 안에서 호출"""
+        while self.running < self.workers:
+            for _ in range(len(self._order)):
+                slots = self._order[0]
+                self._order.rotate(-1)
+                if slots.waiters and slots.running < slots.limit:
+                    wake = slots.waiters.popleft()
+                    slots.running += 1
+                    self.running += 1
+                    wake()
+                    break
+            else:  # 배정할 수 있는 site가 없음
+                return
+
+
+class SiteSlots:
+    """WorkerPool에서 site 하나가 사용하는 slot, 기다리는 요청은 site 안에서 먼저 온 순서대로 배정됨"""
+
+    def __init__(self, pool: WorkerPool, name: str, limit: int):
+        self.pool = pool
+        self.name = name
+        self.limit = limit
+        self.running = 0
+        self.waiters = deque()  # slot이 배정되면 호출할 함수
+
+    def acquire(self) -> None:
+        """slot이 배정될 때까지 thread를 멈추고 기다림, 동기 방식 fetch에서 사용"""
+        granted = threading.Event()
+        with self.pool._lock:
+            self.waiters.append(granted.set)
+            self.pool._dispatch()
+        granted.wait()
+
+    async def acquire_async(self) -> None:
+        """slot이 배정될 때까지 기다림, 다른 thread의 release()가 이 event loop로 배정을 알림"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(resolve)
+
+        def resolve():
+            if granted.cancelled():  # 배정된 후 기다리던 요청이 취소되었으면 slot을 반환
+                self.release()
+            else:
+                granted.set_result(None)
+
+        with self.pool._lock:
+            self.waiters.append(wake)
+            self.pool._dispatch()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            with self.pool._lock:
+                if wake in self.waiters:  # 아직 배정되지 않음
+                    self.waiters.remove(wake)
+                    raise
+            if granted.done() and not granted.cancelled():  # 배정된 직후 취소됨
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self.pool._lock:
+            self.running -= 1
+            self.pool.running -= 1
+            self.pool._dispatch()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class Scheduler:
+    """여러 site를 하나의 fetch worker pool과 parser process pool을 공유하면서 동시에 스크래핑
+
+    site마다 thread에서 scrap()을 실행하고, 요청은 WorkerPool의 slot을, 파싱은 공유하는 process pool을 사용함
+    """
+
+    def __init__(
+        self,
+        sites: dict,
+        paths: dict = None,
+        fetch_workers: int = None,
+        parse_workers: int = 0,
+        concurrency: int = 4,
+        site_concurrency: dict = None,
+        metrics: Metrics = None,
+    ):
+        """
+        Args:
+            sites (dict): {이름: SiteBase 구현체의 instance}
+            paths (dict, optional): {이름: 결과 파일 경로}, 없는 site는 {이름}.db. Defaults to None.
+            fetch_workers (int, optional): 모든 site를 합한 최대 동시 요청 수, 없으면 site별 최대 동시 요청 수의 합. Defaults to None.
+            parse_workers (int, optional): 모든 site가 공유하는 parser process 수, 0이면 site별 event loop에서 파싱. Defaults to 0.
+            concurrency (int, optional): site별 최대 동시 요청 수의 기본값. Defaults to 4.
+            site_concurrency (dict, optional): {이름: 최대 동시 요청 수}, concurrency 대신 사용. Defaults to None.
+            metrics (Metrics, optional): 모든 site가 함께 기록할 metrics, site label로 구분됨. Defaults to None.
+        """
+        self.sites = sites
+        self.paths = {name: f'{name}.db' for name in sites} | (paths or {})
+        self.limits = {name: (site_concurrency or {}).get(name, concurrency) for name in sites}
+        self.fetch_workers = fetch_workers if fetch_workers is not None else sum(self.limits.values())
+        self.parse_workers = parse_workers
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def run(self, **options) -> dict:
+        """모든 site의 스크래핑이 끝날 때까지 실행
+
+        Args:
+            **options: 모든 site의 scrap()에 전달할 인자 (async_mode, rate, resume 등)
+
+        Returns:
+            dict: {이름: 예외}, 실패한 site만 포함
+        """
+        pool = WorkerPool(self.fetch_workers)
+        errors = {}
+        executor = make_parse_executor(list(self.sites.values()), self.parse_workers) if self.parse_workers else None
+
+        def run_site(name, color):
+            try:
+                self.sites[name].scrap(
+                    self.paths[name],
+                    color,
+                    concurrency=self.limits[name],
+                    parse_workers=self.parse_workers,
+                    parse_executor=executor,
+                    worker_slots=pool.site(name, self.limits[name]),
+                    metrics=self.metrics,
+                    **options,
+                )
+            except Exception as e:  # 다른 site는 계속 진행
+                errors[name] = e
+                print(f'{color}{name} Scrap failed: {e!r}{Style.RESET_ALL}')
+            else:
+                print(f'** Scrap done: {name}')
+            sys.stdout.flush()
+
+        threads = [
+            threading.Thread(target=run_site, args=(name, COLORS[i % len(COLORS)]), name=name)
+            for i, name in enumerate(self.sites)
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return errors
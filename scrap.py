@@ -1,27 +1,122 @@
+import argparse
+import os
 import sys
-from threading import Thread
 
-from colorama import Fore
+from compression import METHODS as COMPRESSION_METHODS
+from metrics import Metrics, MetricsSink
+from registry import get_site, load_plugins
+from scheduler import Scheduler
 
-from wikis import SEP, IEP
 
+def make_site(site_class, options, pool_size: int):
+    return site_class(
+        mirror=options.mirror,
+        cache_dir=options.cache_dir,
+        backend=options.backend,
+        partial_parse=options.partial_parse,
+        pool_size=pool_size,
+        stream=options.stream,
+    )
 
-def scrap(wikiClass, path, color):
-    wiki = wikiClass()
-    wiki.scrap(path, color)
-    print(f'** Scrap done: {wikiClass.__name__}')
-    sys.stdout.flush()
 
+def key_value(text: str) -> tuple[str, str]:
+    """NAME=VALUE 형식의 인자"""
+    name, sep, value = text.partition('=')
+    if not sep or not name or not value:
+        raise argparse.ArgumentTypeError(f'NAME=VALUE 형식이어야 함: {text}')
+    return name, value
 
-def main():
-    sep_thread = Thread(target=scrap, args=(SEP, 'sep.db', Fore.CYAN), name='sep')
-    sep_thread.start()
-    iep_thread = Thread(target=scrap, args=(IEP, 'iep.db', Fore.MAGENTA), name='iep')
-    iep_thread.start()
 
-    sep_thread.join()
-    iep_thread.join()
+def parse_args():
+    parser = argparse.ArgumentParser(description='SEP, IEP 등 등록된 site 스크래핑')
+    parser.add_argument('--sites', nargs='+', default=None, help='스크래핑할 site 이름, 없으면 등록된 모든 site')
+    parser.add_argument(
+        '--plugin', dest='plugins', action='append', default=[], help='register_site()로 site를 등록하는 module, 여러 번 지정 가능'
+    )
+    parser.add_argument('--db-dir', default='.', help='결과 파일({site}.db)을 저장할 directory')
+    parser.add_argument(
+        '--output', type=key_value, action='append', default=[], help='site별 결과 파일 경로, ex) --output sep=/data/sep.db'
+    )
+    parser.add_argument('--async', dest='async_mode', action='store_true', help='asyncio로 여러 page를 동시에 가져옴')
+    parser.add_argument('--concurrency', type=int, default=4, help='site별 최대 동시 요청 수 (keep-alive 연결 pool 크기)')
+    parser.add_argument(
+        '--site-concurrency', type=key_value, action='append', default=[], help='특정 site의 최대 동시 요청 수, ex) --site-concurrency iep=2'
+    )
+    parser.add_argument(
+        '--fetch-workers', type=int, default=None, help='모든 site가 공유하는 최대 동시 요청 수, 없으면 site별 최대 동시 요청 수의 합'
+    )
+    parser.add_argument('--rate', type=float, default=4.0, help='host별 처음 초당 요청 수')
+    parser.add_argument(
+        '--max-rate', type=float, default=None, help='응답이 원활할 때 올릴 수 있는 host별 최대 초당 요청 수, 없으면 --rate의 4배'
+    )
+    parser.add_argument('--max-attempts', type=int, default=5, help='page당 최대 요청 횟수, 모두 실패하면 dead-letter로 기록')
+    parser.add_argument('--parse-workers', type=int, default=0, help='--async, --offline 사용 시 모든 site가 공유하는 파싱 process 수')
+    parser.add_argument('--resume', action='store_true', help='기존 db에 이어서 스크래핑, 이미 저장된 page는 건너뜀')
+    parser.add_argument(
+        '--refresh', action='store_true', help='기존 db의 page를 다시 가져와서 바뀐 page만 파싱하고 바뀐 field만 갱신'
+    )
+    parser.add_argument('--cache-dir', default=None, help='가져온 page를 저장하고 조건부 요청에 사용할 directory')
+    parser.add_argument('--offline', action='store_true', help='network 없이 --cache-dir의 page들을 다시 파싱해서 db를 갱신')
+    parser.add_argument('--toc-table', action='store_true', help='목차를 항목별 row로 나눈 toc table도 함께 저장')
+    parser.add_argument(
+        '--search-index', action='store_true', help='title, abstract, body, bibliography 전문 검색 index도 함께 저장'
+    )
+    parser.add_argument(
+        '--compress', choices=COMPRESSION_METHODS, default=None, help='body, bibliography를 압축해서 저장 (zlib-dict는 공유 dictionary 사용)'
+    )
+    parser.add_argument('--backend', choices=('bs4', 'lxml'), default='bs4', help='page 파싱 방식')
+    parser.add_argument('--partial-parse', action='store_true', help='--backend lxml에서 필요한 subtree만 남기고 파싱')
+    parser.add_argument(
+        '--stream', action='store_true', help='response를 chunk 단위로 파싱하면서 필요한 subtree만 남김 (--cache-dir과 함께 사용 불가)'
+    )
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='진행 상황을 출력하는 간격 (초)')
+    parser.add_argument(
+        '--metrics-file', default=None, help='metrics를 저장할 파일, .prom이면 Prometheus textfile 형식, 그 외에는 json'
+    )
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help='--metrics-file을 갱신하는 간격 (초)')
+    parser.add_argument('--mirror', default=None, help='실제 사이트 대신 요청할 replay server 주소')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    sites = load_plugins(options.plugins)
+    try:
+        site_classes = {name: get_site(name) for name in options.sites or sites}
+        site_concurrency = {name: int(value) for name, value in options.site_concurrency}
+    except (KeyError, ValueError) as e:
+        sys.exit(f'scrap.py: error: {e.args[0]}')
+    limits = {name: site_concurrency.get(name, options.concurrency) for name in site_classes}
+    scheduler = Scheduler(
+        {name: make_site(site_class, options, limits[name]) for name, site_class in site_classes.items()},
+        {name: os.path.join(options.db_dir, f'{name}.db') for name in site_classes} | dict(options.output),
+        fetch_workers=options.fetch_workers,
+        parse_workers=options.parse_workers,
+        concurrency=options.concurrency,
+        site_concurrency=site_concurrency,
+        metrics=Metrics(),  # 모든 site가 함께 사용하며 site label로 구분
+    )
+    sink = MetricsSink(scheduler.metrics, options.metrics_file, options.metrics_interval) if options.metrics_file else None
+    if sink is not None:
+        sink.start()
+    errors = scheduler.run(
+        async_mode=options.async_mode,
+        rate=options.rate,
+        max_rate=options.max_rate,
+        max_attempts=options.max_attempts,
+        resume=options.resume,
+        refresh=options.refresh,
+        offline=options.offline,
+        toc_table=options.toc_table,
+        search_index=options.search_index,
+        compression=options.compress,
+        progress_interval=options.progress_interval,
+    )
+    if sink is not None:
+        sink.stop()
+    if errors:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
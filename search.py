@@ -0,0 +1,188 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+from colorama import Fore, Style
+
+import compression
+from corpus import source_paths
+
+SEARCH_COLUMNS = ('title', 'abstract', 'body', 'bibliography')
+# bm25에서 column별 가중치, title에 나온 단어가 본문에 나온 단어보다 높은 순위가 되도록 함
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 0.5)
+
+# body, bibliography는 압축되어 있을 수 있으므로 compression.py의 decompress()로 해제한 view를 검색 대상으로 사용
+SEARCH_VIEW_CREATION_SQL = (
+    'CREATE VIEW IF NOT EXISTS scrap_text AS '
+    'SELECT id, title, abstract, decompress(body) AS body, decompress(bibliography) AS bibliography FROM scrap'
+)
+# scrap_text view를 content로 사용하는 external content FTS5 table, 본문을 중복 저장하지 않고 index만 저장함
+SEARCH_TABLE_CREATION_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS scrap_fts USING fts5('
+    f'{", ".join(SEARCH_COLUMNS)}, content=scrap_text, content_rowid=id, '
+    "prefix='3', tokenize='porter unicode61 remove_diacritics 2')"
+)
+# scrap table이 바뀔 때마다 index도 갱신, writer의 upsert(ON CONFLICT DO UPDATE)는 update trigger로 처리됨
+SEARCH_TRIGGER_SQLS = (
+    'CREATE TRIGGER IF NOT EXISTS scrap_fts_insert AFTER INSERT ON scrap BEGIN '
+    'INSERT INTO scrap_fts (rowid, title, abstract, body, bibliography) '
+    'VALUES (new.id, new.title, new.abstract, decompress(new.body), decompress(new.bibliography)); END',
+    'CREATE TRIGGER IF NOT EXISTS scrap_fts_delete AFTER DELETE ON scrap BEGIN '
+    "INSERT INTO scrap_fts (scrap_fts, rowid, title, abstract, body, bibliography) "
+    "VALUES ('delete', old.id, old.title, old.abstract, decompress(old.body), decompress(old.bibliography)); END",
+    'CREATE TRIGGER IF NOT EXISTS scrap_fts_update AFTER UPDATE ON scrap BEGIN '
+    "INSERT INTO scrap_fts (scrap_fts, rowid, title, abstract, body, bibliography) "
+    "VALUES ('delete', old.id, old.title, old.abstract, decompress(old.body), decompress(old.bibliography)); "
+    'INSERT INTO scrap_fts (rowid, title, abstract, body, bibliography) '
+    'VALUES (new.id, new.title, new.abstract, decompress(new.body), decompress(new.bibliography)); END',
+)
+SEARCH_REBUILD_SQL = "INSERT INTO scrap_fts (scrap_fts) VALUES ('rebuild')"
+SEARCH_QUERY_SQL = (
+    'SELECT scrap.uri, scrap.title, bm25(scrap_fts, {weights}) AS score, '
+    'snippet(scrap_fts, -1, ?, ?, ?, ?) '
+    'FROM scrap_fts JOIN scrap ON scrap.id = scrap_fts.rowid '
+    'WHERE scrap_fts MATCH ? ORDER BY score LIMIT ?'
+).format(weights=', '.join(map(str, COLUMN_WEIGHTS)))
+
+
+def create_search_index(conn: sqlite3.Connection) -> bool:
+    """scrap_fts table과 동기화 trigger를 생성, 기존 row가 있는 db에 처음 만들면 전체 index를 생성함
+
+    trigger는 db에 저장되므로 이후에는 어떤 writer로 저장하더라도 index가 함께 갱신됨
+    trigger와 view가 decompress()를 사용하므로 compression.connect() 등으로 함수가 등록된 connection이어야 함
+
+    Args:
+        conn (sqlite3.Connection): scrap table이 있는 connection, transaction 안에서 호출
+
+    Returns:
+        bool: 새로 생성했으면 True
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'scrap_fts'").fetchone() is not None
+    conn.execute(SEARCH_VIEW_CREATION_SQL)
+    conn.execute(SEARCH_TABLE_CREATION_SQL)
+    for sql in SEARCH_TRIGGER_SQLS:
+        conn.execute(sql)
+    if not exists:
+        conn.execute(SEARCH_REBUILD_SQL)
+    return not exists
+
+
+def build_search_index(path: str) -> int:
+    """기존 db의 scrap table로 검색 index를 다시 만듦
+
+    Args:
+        path (str): sqlite3 파일 경로
+
+    Returns:
+        int: index 된 문서 수
+    """
+    conn = compression.connect(path)
+    with conn:
+        if not create_search_index(conn):
+            conn.execute(SEARCH_REBUILD_SQL)
+    count, = conn.execute('SELECT COUNT(*) FROM scrap').fetchone()
+    conn.close()
+    return count
+
+
+def search(
+    path: str,
+    query: str,
+    limit: int = 10,
+    highlight: tuple = ('[', ']'),
+    snippet_tokens: int = 24,
+) -> list[dict]:
+    """검색 index에서 query에 맞는 문서를 bm25 순위대로 반환
+
+    Args:
+        path (str): sqlite3 파일 경로
+        query (str): FTS5 query, ex) 'free will', '"free will" NOT determinism', 'title:kant', 'virtu*'
+        limit (int, optional): 최대 결과 수. Defaults to 10.
+        highlight (tuple, optional): snippet에서 일치한 단어 앞뒤에 붙일 문자열. Defaults to ('[', ']').
+        snippet_tokens (int, optional): snippet의 최대 token 수. Defaults to 24.
+
+    Raises:
+        sqlite3.OperationalError: index가 없거나 query 문법이 잘못된 경우
+
+    Returns:
+        list[dict]: {'uri', 'title', 'score', 'snippet'}, score는 작을수록 관련도가 높음
+    """
+    conn = compression.connect(path, readonly=True)
+    try:
+        rows = conn.execute(SEARCH_QUERY_SQL, (*highlight, '...', snippet_tokens, query, limit)).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(('uri', 'title', 'score', 'snippet'), row)) for row in rows]
+
+
+def search_sources(
+    db_dir: str, query: str, sources: tuple = None, limit: int = 10, plugins: tuple = (), **options
+) -> list[dict]:
+    """여러 source의 db를 검색하고 score 순서로 합쳐서 반환
+
+    Args:
+        db_dir (str): site별 db({site}.db)가 있는 directory
+        query (str): FTS5 query
+        sources (tuple, optional): 검색할 source 목록, 없으면 db 파일이 있는 등록된 모든 site. Defaults to None.
+        limit (int, optional): 최대 결과 수. Defaults to 10.
+        plugins (tuple, optional): sources가 없을 때 site를 등록할 plugin module. Defaults to ().
+        **options: search()에 전달할 옵션 (highlight, snippet_tokens)
+
+    Returns:
+        list[dict]: {'source', 'uri', 'title', 'score', 'snippet'}
+    """
+    results = []
+    for source, path in source_paths(db_dir, sources, plugins).items():
+        for each in search(path, query, limit, **options):
+            results.append({'source': source, **each})
+    results.sort(key=lambda each: each['score'])
+    return results[:limit]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='site별 db의 전문 검색 (SQLite FTS5)')
+    parser.add_argument('--db-dir', default='.', help='site별 db({site}.db)가 있는 directory')
+    parser.add_argument(
+        '--source', dest='sources', action='append', default=None,
+        help='검색할 site 이름, 여러 번 지정 가능, 없으면 db 파일이 있는 등록된 모든 site',
+    )
+    parser.add_argument(
+        '--plugin', dest='plugins', action='append', default=[], help='register_site()로 site를 등록하는 module, 여러 번 지정 가능'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help='기존 db의 검색 index를 (다시) 생성')
+    query_parser = subparsers.add_parser('query', help='검색')
+    query_parser.add_argument('query', help="FTS5 query, ex) 'free will', '\"free will\" NOT determinism', 'title:kant'")
+    query_parser.add_argument('--limit', type=int, default=10, help='최대 결과 수')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sources = source_paths(args.db_dir, args.sources, args.plugins)
+    if args.command == 'build':
+        for path in sources.values():
+            start = time.perf_counter()
+            count = build_search_index(path)
+            print(f'{path}: {count} documents indexed in {time.perf_counter() - start:.1f}s')
+        return
+
+    start = time.perf_counter()
+    try:
+        results = search_sources(
+            args.db_dir, args.query, tuple(sources), args.limit, highlight=(f'{Fore.YELLOW}{Style.BRIGHT}', Style.RESET_ALL)
+        )
+    except sqlite3.OperationalError as e:  # index가 없거나 query 문법이 잘못된 경우
+        print(f'search failed: {e}', file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    for rank, each in enumerate(results, 1):
+        print(f'{rank:2d}. [{each["source"].upper()}] {Style.BRIGHT}{each["title"]}{Style.RESET_ALL} ({each["score"]:.2f})')
+        print(f'    {each["uri"]}')
+        print(f'    {" ".join(each["snippet"].split())}')
+    print(f'{len(results)} results in {elapsed * 1e3:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+from itertools import chain
+from typing import NamedTuple
+
+TOC_TITLE = '### Table of Contents'
+LIST_MARKERS = '*-+0123456789'  # *, -, +: ul / 0, 1, 2, .., 9: ol
+
+
+class MarkdownSections(NamedTuple):
+    title: str
+    abstract: str
+    toc: str
+    body: str
+    references: str
+
+
+def segment_markdown(md: str, sections: tuple = MarkdownSections._fields) -> MarkdownSections:
+    """IEP 본문 markdown을 한 번만 훑으면서 각 line을 title, abstract, 목차, 본문, 참고문헌으로 분류
+
+    IEP의 _abstract_*, _toc_*, _body_* 메소드와 get_bibliography_in_page의 반복문을 하나로 합친 state machine으로
+    결과는 기존 메소드들과 같음
+    line은 abstract -> 목차 -> 본문 순서로만 진행하며, 단계마다 하나의 반복문이 같은 iterator를 이어서 읽음
+    Table of Contents title이 있으면 title 이전은 abstract, 이후부터 목차와 본문을 찾고
+    없으면 처음 list가 나오기 전까지를 abstract로 보고 그 list부터 목차로 봄
+    title과 참고문헌은 단계와 상관없이 모든 line에서 확인하며, 필요한 section이 모두 끝나면 나머지 line은 읽지 않음
+
+    Args:
+        md (str): page markdown body
+        sections (tuple, optional): 필요한 section 이름 목록, 포함되지 않은 section은 None. Defaults to 전체.
+
+    Returns:
+        MarkdownSections: 분류된 section들 (markdown)
+    """
+    toc_title_count = md.count(TOC_TITLE)
+    if toc_title_count > 1:  # 기존 split 방식과 같이 Table of Contents title이 여러 개면 실패
+        raise ValueError(f'Table of Contents title appears {toc_title_count} times')
+    want_abstract = 'abstract' in sections
+    want_toc = 'toc' in sections
+    want_body = 'body' in sections
+    want_references = 'references' in sections
+
+    title = None
+    title_done = 'title' not in sections
+    reference_state = 0 if want_references else 2  # 0: reference 전, 1: reference 중, 2: reference 끝
+    abstract_lines, toc_lines, body_lines, reference_lines = [], [], [], []
+
+    def observe(line, stripped):
+        """단계와 상관없이 모든 line에서 title과 참고문헌을 확인"""
+        nonlocal title, title_done, reference_state
+        if not title_done and stripped.startswith('#'):  # 문서 본문 중 첫번째로 나오는 title
+            title = stripped.strip('#').strip()
+            title_done = True
+        # 참고문헌은 toc title 여부와 상관없이 Reference title 다음부터 다음 title 전까지
+        if reference_state == 0:
+            if line.startswith('#') and 'reference' in line.lower():
+                reference_state = 1
+        elif reference_state == 1:
+            if not line.startswith('#'):
+                reference_lines.append(line)
+            elif 'reference' not in line.lower():  # Reference가 아닌 title이 나오면 참고문헌 종료
+                reference_state = 2
+
+    # 다음 단계에서 처리할 line은 iterator 앞에 되돌려 놓음, 각 line은 처리하는 단계에서 한 번만 observe 함
+    lines = iter(md.split('\n'))
+    toc_start = False  # 목차 list가 시작되면 True
+
+    # abstract 단계
+    if toc_title_count == 1:
+        toc_title_line = md.count('\n', 0, md.index(TOC_TITLE))
+        for _, line in zip(range(toc_title_line), lines):
+            stripped = line.strip()
+            observe(line, stripped)
+            if not stripped.startswith('#'):  # page title 제외
+                abstract_lines.append(line)
+        line = next(lines)
+        observe(line, line.strip())
+        # toc title 앞부분은 abstract의 마지막 line, 뒷부분은 목차 영역의 첫 line으로 처리
+        before, after = line.split(TOC_TITLE)
+        if not before.strip().startswith('#'):
+            abstract_lines.append(before)
+        stripped = after.strip()
+        if len(stripped) > 0 and stripped[0] in LIST_MARKERS:
+            toc_lines.append(after)
+            toc_start = True
+    else:
+        for line in lines:
+            stripped = line.strip()
+            if len(stripped) > 0 and stripped[0] in LIST_MARKERS:  # list가 시작되면 abstract 종료, 목차 시작
+                lines = chain((line,), lines)
+                break
+            observe(line, stripped)
+            if not stripped.startswith('#'):  # page title 제외
+                abstract_lines.append(stripped)
+
+    # 목차 단계, 목차가 시작되기 전의 line은 무시
+    toc_end = False
+    if want_toc or want_body:
+        for line in lines:
+            stripped = line.strip()
+            if len(stripped) > 0 and stripped[0] in LIST_MARKERS:
+                toc_lines.append(line)
+                toc_start = True
+            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
+                lines = chain((line,), lines)
+                toc_end = True
+                break
+            if not title_done or reference_state != 2:
+                observe(line, stripped)
+
+    # 본문 단계, Reference title이 나오면 종료
+    if toc_end and want_body:
+        for line in lines:
+            stripped = line.strip()
+            if not title_done or reference_state != 2:
+                observe(line, stripped)
+            if stripped.startswith('#') and 'reference' in stripped.lower():  # Reference 시작하면 본문 종료
+                break
+            if stripped == '>':  # 인용문인데 내용이 없는 경우 무시하도록 함
+                continue
+            body_lines.append(stripped)
+
+    # 나머지 line은 title, 참고문헌만 확인
+    if not title_done:
+        for line in lines:
+            observe(line, line.strip())
+            if title_done:
+                break
+    if reference_state != 2:
+        for line in lines:
+            if reference_state == 0:
+                if line.startswith('#') and 'reference' in line.lower():
+                    reference_state = 1
+            elif not line.startswith('#'):
+                reference_lines.append(line)
+            elif 'reference' not in line.lower():
+                break
+
+    return MarkdownSections(
+        title=title,
+        abstract='\n'.join(abstract_lines) if want_abstract else None,
+        toc='\n'.join(toc_lines).strip() if want_toc else None,
+        body='\n'.join(body_lines).strip() if want_body else None,
+        references='\n'.join(reference_lines).strip() if want_references else None,
+    )
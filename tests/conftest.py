@@ -0,0 +1,19 @@
+import json
+import os
+import sys
+
+# test는 repository root의 module들을 바로 import 함
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+# replay_server.py가 제공하는 형태로 기록한 SEP/IEP page들
+PAGES = os.path.join(FIXTURES, 'pages')
+# baseline의 bs4 + markdownify pipeline으로 추출한 문서 page별 (title, abstract, contents, body, bibliography)
+GOLDEN = os.path.join(FIXTURES, 'golden.json')
+
+
+def load_golden() -> dict:
+    with open(GOLDEN, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,151 @@
+import random
+import sqlite3
+
+import writer
+from compression import ColumnCodec, connect
+from conftest import load_golden
+from writer import ScrapWriter
+
+GOLDEN = load_golden()
+
+# 실제 SEP 문서들에 반복되는 출판사, 학술지, 문서 끝의 안내 문구로 만든 sample
+PUBLISHERS = (
+    'Oxford: Oxford University Press', 'Cambridge: Cambridge University Press', 'Princeton: Princeton University Press',
+    'Cambridge, MA: Harvard University Press', 'Cambridge, MA: MIT Press', 'London: Routledge', 'Dordrecht: Springer',
+    'Chicago: University of Chicago Press', 'Ithaca, NY: Cornell University Press', 'New York: Columbia University Press',
+)
+JOURNALS = (
+    'The Journal of Philosophy', 'Philosophical Review', 'Mind', 'Noûs', 'Philosophy and Phenomenological Research',
+    'Australasian Journal of Philosophy', 'Philosophical Studies', 'Analysis', 'Ethics', 'Synthese', 'Erkenntnis',
+)
+SURNAMES = (
+    'Adams', 'Anscombe', 'Brandom', 'Burge', 'Carnap', 'Chalmers', 'Davidson', 'Dummett', 'Evans', 'Fine', 'Frege',
+    'Goodman', 'Grice', 'Hacking', 'Irwin', 'Jackson', 'Korsgaard', 'Lewis', 'McDowell', 'Nagel', 'Parfit', 'Quine',
+    'Rawls', 'Sellars', 'Thomson', 'Williams', 'Yablo', 'Zagzebski',
+)
+WORDS = (
+    'reason', 'knowledge', 'truth', 'meaning', 'causation', 'justice', 'virtue', 'mind', 'language', 'necessity',
+    'freedom', 'identity', 'perception', 'consciousness', 'realism', 'naturalism', 'value', 'belief', 'reference',
+    'representation', 'explanation', 'normativity', 'time', 'persons', 'action', 'evidence', 'probability',
+)
+ACADEMIC_TOOLS = (
+    '## Academic Tools\n\n- How to cite this entry.\n'
+    '- Preview the PDF version of this entry at the Friends of the SEP Society.\n'
+    '- Look up topics and thinkers related to this entry at the Internet Philosophy Ontology Project (InPhO).\n'
+    '- Enhanced bibliography for this entry at PhilPapers, with links to its database.\n\n'
+    '## Other Internet Resources\n\n[Please contact the author with suggestions.]\n\n## Related Entries\n'
+)
+
+
+def sample_document(rng: random.Random) -> tuple[str, str]:
+    """(body, bibliography) markdown, 문서마다 다른 본문과 참고문헌 항목을 가짐"""
+    def title():
+        first, second = (word.capitalize() for word in rng.sample(WORDS, 2))
+        return rng.choice((f'{first} and {second}', f'The Problem of {first}', f'A Theory of {first}'))
+
+    paragraphs = [
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))).capitalize() + '.' for _ in range(rng.randint(3, 8))
+    ]
+    entries = []
+    for _ in range(rng.randint(15, 40)):
+        author, year = f'{rng.choice(SURNAMES)}, {rng.choice("ABCDEFGHJKLMNPRSTW")}.', rng.randint(1950, 2022)
+        if rng.random() < 0.5:
+            entries.append(f'- {author}, {year}, *{title()}*, {rng.choice(PUBLISHERS)}.')
+        else:
+            page = rng.randint(1, 600)
+            entries.append(
+                f'- {author}, {year}, “{title()}”, *{rng.choice(JOURNALS)}*, {rng.randint(1, 120)}({rng.randint(1, 4)}): '
+                f'{page}–{page + rng.randint(5, 40)}.'
+            )
+    body = f'## 1. {title()}\n\n' + '\n\n'.join(paragraphs) + '\n\n' + ACADEMIC_TOOLS
+    return body, '## Bibliography\n\n' + '\n'.join(entries)
+
+
+def test_dictionary_beats_plain_zlib():
+    rng = random.Random(0)
+    documents = [sample_document(rng) for _ in range(40)]
+    training, held_out = documents[:30], documents[30:]  # 학습에 사용하지 않은 문서로 비교
+    conn = sqlite3.connect(':memory:')
+    conn.execute(ScrapWriter.TABLE_CREATION_SQL)
+    conn.executemany('INSERT INTO scrap (body, bibliography) VALUES (?, ?)', training)
+    codec = ColumnCodec(conn, 'zlib-dict')
+    assert codec.train_from_scrap(conn)
+    zlib_codec = ColumnCodec(conn, 'zlib')
+
+    with_dictionary = sum(len(codec.compress(text)) for document in held_out for text in document)
+    plain = sum(len(zlib_codec.compress(text)) for document in held_out for text in document)
+    assert with_dictionary < plain * 0.8
+    assert all(codec.decompress(codec.compress(text)) == text for document in held_out for text in document)
+
+
+def test_writer_trains_dictionary_after_enough_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(writer, 'MIN_DICTIONARY_SAMPLES', len(GOLDEN))
+    path = str(tmp_path / 'scrap.db')
+    rows = list(GOLDEN.items())
+
+    with ScrapWriter(path, compression='zlib-dict') as scrap_writer:
+        for uri, row in rows[:-1]:
+            scrap_writer.write(uri, tuple(row))
+    conn = sqlite3.connect(path)
+    # 문서가 모이기 전까지는 압축하지 않고 dictionary도 만들지 않음
+    assert {kind for kind, in conn.execute('SELECT typeof(body) FROM scrap')} == {'text'}
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'compression_dict'").fetchone()
+    conn.close()
+
+    uri, row = rows[-1]
+    with ScrapWriter(path, compression='zlib-dict') as scrap_writer:  # 이어서 저장한 문서로 문서 수가 채워짐
+        scrap_writer.write(uri, tuple(row))
+    conn = connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM compression_dict').fetchone() == (1,)
+    assert {kind for kind, in conn.execute('SELECT typeof(body) FROM scrap')} == {'blob'}
+    stored = {uri: [body, bibliography] for uri, body, bibliography in conn.execute(
+        'SELECT uri, decompress(body), decompress(bibliography) FROM scrap'
+    )}
+    conn.close()
+    assert stored == {uri: row[3:] for uri, row in rows}
+
+
+def test_codec_reads_dictionary_trained_by_other_connection(tmp_path):
+    path = str(tmp_path / 'scrap.db')
+    rng = random.Random(1)
+    first, second = sqlite3.connect(path), sqlite3.connect(path)
+    first.execute(ScrapWriter.TABLE_CREATION_SQL)
+    first.executemany('INSERT INTO scrap (body, bibliography) VALUES (?, ?)', [sample_document(rng) for _ in range(10)])
+    first.commit()
+    # 두 codec 모두 dictionary가 없을 때 만들어짐
+    first_codec, second_codec = ColumnCodec(first, 'zlib-dict'), ColumnCodec(second, 'zlib-dict')
+    with first:
+        first_codec.train_from_scrap(first)
+        first_codec.compress_stored(first)
+
+    # 다른 connection이 학습한 dictionary로 압축된 row도 해제함
+    with second:
+        assert second_codec.train_from_scrap(second)
+    assert second.execute('SELECT COUNT(*) FROM scrap WHERE decompress(body) IS NOT NULL').fetchone() == (10,)
+    second_codec.reload()
+    assert second_codec.dictionary_id == first_codec.dictionary_id + 1
+    first.close()
+    second.close()
+
+
+def test_writers_share_dictionary(tmp_path, monkeypatch):
+    monkeypatch.setattr(writer, 'MIN_DICTIONARY_SAMPLES', len(GOLDEN) - 1)
+    path = str(tmp_path / 'scrap.db')
+    rows = list(GOLDEN.items())
+    ScrapWriter(path, search_index=True).open().close()  # 두 writer가 table 생성을 경쟁하지 않도록 미리 만듦
+
+    # 두 writer 모두 dictionary가 없을 때 열림, 먼저 저장한 writer가 학습함
+    with ScrapWriter(path, compression='zlib-dict', search_index=True) as second:
+        with ScrapWriter(path, compression='zlib-dict', search_index=True) as first:
+            for uri, row in rows[:-1]:
+                first.write(uri, tuple(row))
+        uri, row = rows[0]
+        second.write(uri, (*row[:3], row[3] + '\n\nUpdated.', row[4]))  # 검색 index trigger가 기존 row를 해제함
+        second.write(*rows[-1][:1], tuple(rows[-1][1]))
+
+    conn = connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM compression_dict').fetchone() == (1,)
+    assert {kind for kind, in conn.execute('SELECT typeof(body) FROM scrap')} == {'blob'}
+    stored = dict(conn.execute('SELECT uri, decompress(body) FROM scrap'))
+    conn.close()
+    assert stored == {each_uri: each_row[3] for each_uri, each_row in rows} | {uri: row[3] + '\n\nUpdated.'}
@@ -0,0 +1,37 @@
+import shutil
+
+import pytest
+
+import document
+from check_parity import FIELDS, document_pages, extract_golden
+from conftest import PAGES, load_golden
+
+GOLDEN = load_golden()
+DOCUMENTS = {uri: (site_cls, path) for uri, site_cls, path in document_pages(PAGES)}
+
+
+@pytest.fixture
+def without_markdownify(monkeypatch):
+    """lxml backend가 markdownify로 돌아가지 않고 lxml_markdown.convert_element()만 사용하는지 확인"""
+
+    def fail(*args, **kwargs):
+        raise AssertionError('markdownify가 호출됨')
+
+    monkeypatch.setattr(document, 'markdownify', fail)
+
+
+@pytest.mark.usefixtures('without_markdownify')
+@pytest.mark.parametrize('partial_parse', [False, True], ids=['lxml', 'lxml-partial'])
+@pytest.mark.parametrize('uri', sorted(GOLDEN))
+def test_convert_element_matches_baseline(uri, partial_parse):
+    site_cls, path = DOCUMENTS[uri]
+    with open(path, encoding='utf-8') as f:
+        result = site_cls(backend='lxml', partial_parse=partial_parse).parse_page(f.read())
+    for field, value, expected in zip(FIELDS, result, GOLDEN[uri], strict=True):
+        assert value == expected, field
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git이 필요함')
+def test_golden_is_baseline_output():
+    # golden.json은 현재 tree가 아닌 baseline commit의 bs4 + markdownify pipeline으로 만든 결과여야 함
+    assert extract_golden(PAGES) == GOLDEN
@@ -0,0 +1,20 @@
+import pytest
+
+from check_parity import check_page, document_pages
+from conftest import PAGES, load_golden
+
+GOLDEN = load_golden()
+DOCUMENTS = {uri: (site_cls, path) for uri, site_cls, path in document_pages(PAGES)}
+
+
+def test_golden_covers_recorded_documents():
+    assert sorted(DOCUMENTS) == sorted(GOLDEN)
+
+
+@pytest.mark.parametrize('uri', sorted(GOLDEN))
+def test_backends_match_golden(uri):
+    site_cls, path = DOCUMENTS[uri]
+    with open(path, encoding='utf-8') as f:
+        html_body = f.read()
+    # bs4, lxml, lxml + partial_parse backend 모두 기준 결과와 같아야 함
+    assert check_page(site_cls, html_body, GOLDEN[uri]) == []
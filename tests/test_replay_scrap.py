@@ -0,0 +1,78 @@
+import sqlite3
+from urllib.parse import urlsplit
+
+import pytest
+
+import base
+from conftest import PAGES, load_golden
+from metrics import Metrics
+from replay_server import ReplayServer
+from wikis import SEP, IEP
+
+GOLDEN = load_golden()
+
+
+@pytest.fixture(scope='module')
+def mirror():
+    with ReplayServer(PAGES) as server:
+        yield server.url
+
+
+@pytest.mark.parametrize('async_mode', (False, True), ids=('sync', 'async'))
+@pytest.mark.parametrize('site_cls', (SEP, IEP), ids=lambda site_cls: site_cls.__name__)
+def test_scrap_from_replay_server(tmp_path, mirror, site_cls, async_mode):
+    path = str(tmp_path / 'scrap.db')
+    # index page에서 발견한 문서만 가져오며, 중복 link와 외부 link, 문서가 아닌 link는 제외됨
+    site_cls(mirror=mirror).scrap(path, '', async_mode=async_mode, rate=1000.0, progress_interval=60.0)
+
+    host = urlsplit(site_cls().get_index_uris()[0]).netloc
+    expected = {uri: row for uri, row in GOLDEN.items() if urlsplit(uri).netloc == host}
+    conn = sqlite3.connect(path)
+    try:
+        rows = {uri: list(row) for uri, *row in conn.execute(
+            'SELECT uri, title, abstract, contents, body, bibliography FROM scrap'
+        )}
+        statuses = dict(conn.execute('SELECT uri, status FROM progress'))
+    finally:
+        conn.close()
+    assert rows == expected
+    assert statuses == {uri: 'done' for uri in expected}
+
+
+@pytest.mark.parametrize('async_mode', (False, True), ids=('sync', 'async'))
+def test_fetch_metrics(tmp_path, mirror, async_mode):
+    metrics = Metrics()
+    page_uris = ['https://plato.stanford.edu/entries/e0/', 'https://plato.stanford.edu/entries/missing/']
+    SEP(mirror=mirror).scrap(
+        str(tmp_path / 'scrap.db'), '', page_uris=page_uris, async_mode=async_mode, rate=1000.0, metrics=metrics,
+        progress_interval=60.0,
+    )
+
+    snapshot = metrics.snapshot()
+    # 동기/async 모두 에러 status도 응답 수에 포함하고 host별 rate를 기록함
+    responses = {
+        each['labels']['status']: each['value'] for each in snapshot['counters']
+        if each['name'] == 'scrap_fetch_responses_total'
+    }
+    assert responses == {200: 1, 404: 1}
+    rates = {each['labels']['host'] for each in snapshot['gauges'] if each['name'] == 'scrap_fetch_rate'}
+    assert rates == {urlsplit(mirror).netloc}
+
+
+def test_scrap_closes_connection_on_error(tmp_path, mirror, monkeypatch):
+    path = str(tmp_path / 'scrap.db')
+    SEP(mirror=mirror).scrap(path, '', rate=1000.0, progress_interval=60.0)
+    opened, original_connect = [], sqlite3.connect
+
+    def connect(*args, **kwargs):
+        opened.append(original_connect(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(base.sqlite3, 'connect', connect)
+    # 이미 결과가 있는 db에 resume, refresh 없이 다시 스크래핑하면 에러
+    with pytest.raises(RuntimeError, match='이미 스크래핑 결과가 있음'):
+        SEP(mirror=mirror).scrap(path, '', rate=1000.0, progress_interval=60.0)
+    assert opened
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):  # 닫힌 connection
+            conn.execute('SELECT 1')
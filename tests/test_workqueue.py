@@ -0,0 +1,52 @@
+import threading
+from urllib.parse import urlsplit
+
+import writer
+from compression import connect
+from conftest import PAGES, load_golden
+from replay_server import ReplayServer
+from wikis import SEP
+from workqueue import WorkQueue, run_worker
+
+GOLDEN = load_golden()
+
+
+def test_workers_share_dictionary(tmp_path, monkeypatch):
+    expected = {uri: row for uri, row in GOLDEN.items() if urlsplit(uri).netloc == 'plato.stanford.edu'}
+    monkeypatch.setattr(writer, 'MIN_DICTIONARY_SAMPLES', len(expected) - 1)
+    queue_path, db_path = str(tmp_path / 'sep.queue.db'), str(tmp_path / 'sep.db')
+
+    with ReplayServer(PAGES) as server:
+        queue = WorkQueue(queue_path)
+        queue.seed(SEP(mirror=server.url).get_page_uris())
+        queue.close()
+
+        # 같은 db에 저장하는 worker마다 ScrapWriter가 있고, 먼저 문서 수를 채운 worker만 dictionary를 학습해야 함
+        errors = []
+
+        def work(index):
+            try:
+                run_worker(
+                    SEP(mirror=server.url), queue_path, db_path, f'worker-{index}', batch_size=1, rate=1000.0,
+                    compression='zlib-dict', search_index=True, progress_interval=60.0,
+                )
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert errors == []
+
+    conn = connect(db_path)
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM compression_dict').fetchone() == (1,)
+        assert {kind for kind, in conn.execute('SELECT typeof(body) FROM scrap')} == {'blob'}
+        rows = {uri: list(row) for uri, *row in conn.execute(
+            'SELECT uri, title, abstract, contents, decompress(body), decompress(bibliography) FROM scrap'
+        )}
+    finally:
+        conn.close()
+    assert rows == expected
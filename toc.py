@@ -0,0 +1,139 @@
+import argparse
+import json
+import sqlite3
+from typing import Iterator
+
+TOC_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS toc '
+    '(entry_id INTEGER, position INTEGER, depth INTEGER, parent INTEGER, text TEXT, PRIMARY KEY (entry_id, position))'
+)
+# entry_id는 scrap table의 id, uri로 id를 찾아서 저장하므로 scrap row를 먼저 저장해야 함
+TOC_DELETE_SQL = 'DELETE FROM toc WHERE entry_id = (SELECT id FROM scrap WHERE uri = ?)'
+TOC_INSERT_SQL = 'INSERT INTO toc (entry_id, position, depth, parent, text) SELECT id, ?, ?, ?, ? FROM scrap WHERE uri = ?'
+
+
+def _is_regular(lines: list[str]) -> bool:
+    # 모든 line이 (들여쓰기 +) hyphen으로 시작하는 markdown list인지 확인
+    return all(line.lstrip().startswith('-') for line in lines)
+
+
+def parse_toc(md: str) -> list[dict]:
+    """markdown list를 {'content', 'subcontent'} 형태의 tree로 변환
+
+    각 line을 한 번씩만 읽으면서 열려있는 항목들을 stack으로 관리함
+    line의 깊이는 현재 stack의 깊이까지 중 처음 hyphen이 나오는 위치이며,
+    hyphen이 없으면 바로 앞 항목의 하위 항목으로 봄
+    결과는 깊이마다 문자열을 다시 나누던 기존 재귀 방식과 같음
+
+    Args:
+        md (str): list markdown, list symbol은 모두 hyphen(-)이어야 함
+
+    Returns:
+        list[dict]: 파싱된 목차
+    """
+    if md.strip() == '':
+        return []
+    lines = md.split('\n')
+    if not _is_regular(lines[1:]):  # 빈 line 등이 섞여있으면 기존 방식의 분할 규칙을 그대로 따름
+        return _parse_irregular_toc(md)
+
+    toc_list = []
+    stack = [toc_list]  # stack[depth]는 depth 깊이의 항목이 추가될 list
+    for line in lines:
+        depth = len(stack) - 1
+        column = line.find('-', 0, depth)
+        if column != -1:
+            depth = column
+        del stack[depth + 1:]
+        subcontent = []
+        stack[depth].append({'content': line[depth:], 'subcontent': subcontent})
+        stack.append(subcontent)
+    return toc_list
+
+
+def _parse_irregular_toc(md: str) -> list[dict]:
+    """빈 line이 있는 등 규칙적이지 않은 list를 기존 재귀 방식과 같은 규칙으로 변환, 재귀 대신 stack 사용"""
+    toc_list = []
+    stack = [(md, toc_list)]
+    while stack:
+        content, target = stack.pop()
+        if content.strip() == '':
+            continue
+        # '\n-'로 시작하는 line마다 항목을 나누고, 각 항목의 나머지 line은 한 글자씩 내어쓰기 해서 하위 목차로 처리
+        for toc_lines in content.replace('\n-', '\n\n-').split('\n\n'):
+            current, *rest = toc_lines.split('\n')
+            subcontent = []
+            target.append({'content': current, 'subcontent': subcontent})
+            stack.append(('\n'.join(line[1:] for line in rest), subcontent))
+    return toc_list
+
+
+def toc_text(content: str) -> str:
+    """목차 항목의 list symbol을 제외한 text"""
+    return content[1:].strip() if content.startswith('-') else content.strip()
+
+
+def flatten_toc(toc_list: list[dict]) -> Iterator[tuple[int, int, int, str]]:
+    """tree 형태의 목차를 전위 순회 순서의 row로 변환
+
+    Args:
+        toc_list (list[dict]): parse_toc() 결과
+
+    Yields:
+        tuple[int, int, int, str]: (position, depth, parent, text), parent는 상위 항목의 position, 최상위 항목은 None
+    """
+    position = 0
+    stack = [(item, 0, None) for item in reversed(toc_list)]
+    while stack:
+        item, depth, parent = stack.pop()
+        yield position, depth, parent, toc_text(item['content'])
+        stack.extend((child, depth + 1, position) for child in reversed(item['subcontent']))
+        position += 1
+
+
+def toc_rows(uri: str, contents: str) -> Iterator[tuple]:
+    """scrap table의 contents(json 문자열)를 toc table에 저장할 row로 변환
+
+    Args:
+        uri (str): page uri
+        contents (str): json 문자열로 저장된 목차
+
+    Yields:
+        tuple: TOC_INSERT_SQL의 인자 (position, depth, parent, text, uri)
+    """
+    for position, depth, parent, text in flatten_toc(json.loads(contents)):
+        yield position, depth, parent, text, uri
+
+
+def build_toc_table(path: str) -> int:
+    """기존 db의 contents를 읽어서 toc table을 다시 만듦
+
+    Args:
+        path (str): sqlite3 파일 경로
+
+    Returns:
+        int: 저장한 목차 항목 수
+    """
+    conn = sqlite3.connect(path)
+    count = 0
+    with conn:
+        conn.execute(TOC_TABLE_CREATION_SQL)
+        conn.execute('DELETE FROM toc')
+        for uri, contents in conn.execute('SELECT uri, contents FROM scrap').fetchall():
+            rows = list(toc_rows(uri, contents))
+            conn.executemany(TOC_INSERT_SQL, rows)
+            count += len(rows)
+    conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='scrap table의 contents로 정규화된 toc table을 만듦')
+    parser.add_argument('paths', nargs='+', help='sqlite3 파일 경로, ex) sep.db iep.db')
+    args = parser.parse_args()
+    for path in args.paths:
+        print(f'{path}: {build_toc_table(path)} toc entries')
+
+
+if __name__ == '__main__':
+    main()
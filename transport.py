@@ -0,0 +1,123 @@
+import importlib.util
+import time
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+# brotli가 설치되어 있으면 requests(urllib3)와 aiohttp 모두 br 응답을 해제할 수 있음
+ACCEPT_ENCODING = 'gzip, deflate, br' if importlib.util.find_spec('brotli') is not None else 'gzip, deflate'
+KEEPALIVE_TIMEOUT = 30  # 사용하지 않는 연결을 유지하는 시간 (초), 다음 요청이 새 TCP/TLS 연결을 만들지 않도록 함
+DNS_CACHE_TTL = 300
+
+
+def _timed_pool_class(pool_cls, adapter: 'PooledHTTPAdapter'):
+    """연결 생성 시간과 연결 재사용 여부를 adapter의 metrics에 기록하는 connection pool class"""
+
+    class TimedConnection(pool_cls.ConnectionCls):
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            if adapter.metrics is not None:
+                adapter.metrics.observe('scrap_connect_seconds', time.perf_counter() - start)
+
+    class TimedConnectionPool(pool_cls):
+        ConnectionCls = TimedConnection
+
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            if adapter.metrics is not None:
+                reused = getattr(conn, 'sock', None) is not None  # 이미 연결된 socket이 있으면 keep-alive 재사용
+                adapter.metrics.inc('scrap_connections_total', kind='reused' if reused else 'new')
+            return conn
+
+    TimedConnectionPool.__name__ = pool_cls.__name__
+    return TimedConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """crawl 동시성에 맞춘 크기의 connection pool을 사용하고 연결 생성 시간을 기록하는 adapter"""
+
+    metrics = None  # pickle 시 저장되지 않는 값이므로 class 기본값을 둠
+
+    def __init__(self, pool_size: int, metrics=None):
+        """
+        Args:
+            pool_size (int): host별로 유지할 최대 연결 수
+            metrics (Metrics, optional): 연결 생성 시간과 재사용 횟수를 기록할 metrics. Defaults to None.
+        """
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.metrics = metrics
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _timed_pool_class(pool_cls, self)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+def make_session(headers: dict, pool_size: int) -> requests.Session:
+    """index 탐색과 page 요청이 같은 keep-alive 연결을 재사용하도록 하는 requests session
+
+    Args:
+        headers (dict): 모든 요청에 사용할 header
+        pool_size (int): host별로 유지할 최대 연결 수
+
+    Returns:
+        requests.Session: http, https에 PooledHTTPAdapter가 연결된 session
+    """
+    session = requests.Session()
+    session.headers.update(headers)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    adapter = PooledHTTPAdapter(pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def set_session_metrics(session: requests.Session, metrics) -> None:
+    """session의 PooledHTTPAdapter들이 연결 생성 시간과 재사용 횟수를 metrics에 기록하도록 함"""
+    for adapter in session.adapters.values():
+        if isinstance(adapter, PooledHTTPAdapter):
+            adapter.metrics = metrics
+
+
+def connection_trace(metrics) -> aiohttp.TraceConfig:
+    """aiohttp의 연결 생성 시간과 재사용 횟수를 metrics에 기록하는 TraceConfig
+
+    Args:
+        metrics (Metrics): 기록할 metrics
+
+    Returns:
+        aiohttp.TraceConfig: ClientSession의 trace_configs에 전달할 값
+    """
+    async def on_create_start(session, context, params):
+        context.connect_started_at = time.perf_counter()
+
+    async def on_create_end(session, context, params):
+        metrics.observe('scrap_connect_seconds', time.perf_counter() - context.connect_started_at)
+        metrics.inc('scrap_connections_total', kind='new')
+
+    async def on_reuse(session, context, params):
+        metrics.inc('scrap_connections_total', kind='reused')
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(on_create_start)
+    trace.on_connection_create_end.append(on_create_end)
+    trace.on_connection_reuseconn.append(on_reuse)
+    return trace
+
+
+def make_connector(pool_size: int) -> aiohttp.TCPConnector:
+    """host별 pool_size 개의 keep-alive 연결을 유지하는 aiohttp connector
+
+    Args:
+        pool_size (int): host별 최대 연결 수, 0이면 제한 없음
+
+    Returns:
+        aiohttp.TCPConnector: ClientSession에 전달할 connector
+    """
+    return aiohttp.TCPConnector(
+        limit=0, limit_per_host=pool_size, keepalive_timeout=KEEPALIVE_TIMEOUT, ttl_dns_cache=DNS_CACHE_TTL
+    )
@@ -1,21 +1,35 @@
 import string
-import sys
 
 from bs4 import BeautifulSoup
-from markdownify import markdownify
 
 from base import SiteBase
+from document import PageDocument
+from registry import register_site
+from segmenter import MarkdownSections, segment_markdown
 
 
+@register_site('sep')
 class SEP(SiteBase):
-    def get_page_uris(self) -> list[str]:
-        """모든 페이지 uri를 list type으로 반환하도록 함
+    PARSE_TARGETS = ({'name': 'h1'}, {'id': 'preamble'}, {'id': 'toc'}, {'id': 'main-text'}, {'id': 'bibliography'})
+
+    def get_index_uris(self) -> list[str]:
+        """모든 page가 나열된 목차 page uri
+
+        Returns:
+            list[str]: index page uri list
+        """
+        return ['https://plato.stanford.edu/contents.html']
+
+    def get_page_uris_in_index(self, html_body: str) -> list[str]:
+        """목차 page에서 page uri를 추출
+
+        Args:
+            html_body (str): index page html body
 
         Returns:
             list[str]: page uri list
         """
-        resp = self.session.get('https://plato.stanford.edu/contents.html')
-        soup = BeautifulSoup(resp.text, 'lxml')
+        soup = BeautifulSoup(html_body, 'lxml')
 
         all_links = [link.get('href', '') for link in soup.find_all('a')]  # a 태그의 href 속성 값만 가져옴 (실제 주소 속성)
         # entries로 시작하는 uri만 필터링, href는 상대 주소이므로 절대 주소로 변경해서 스크래핑이 가능하도록 함
@@ -23,237 +37,148 @@ class SEP(SiteBase):
 
         return entry_links
 
-    def get_title_in_page(self, html_body: str) -> str:
+    def get_title_in_page(self, page: PageDocument) -> str:
         """page에서 title을 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 title
         """
-        soup = BeautifulSoup(html_body, 'lxml')
-        return soup.find('h1').text
+        return page.text('h1')
 
-    def get_abstract_in_page(self, html_body: str) -> str:
+    def get_abstract_in_page(self, page: PageDocument) -> str:
         """page에서 abstract를 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 abstract
         """
-        soup = BeautifulSoup(html_body, 'lxml')
-        return soup.find(id='preamble').text
+        return page.text(id='preamble')
 
-    def get_contents_in_page(self, html_body: str) -> str:
+    def get_contents_in_page(self, page: PageDocument) -> str:
         """page에서 목차(table of contents)를 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 목차
         """
-        soup = BeautifulSoup(html_body, 'lxml')
-        contents_md = markdownify(soup.find(id='toc').decode_contents(), strip=['a', 'hr'], bullets='-').strip()
+        contents_md = page.markdown({'id': 'toc'}, strip=['a', 'hr'], bullets='-').strip()
         return self._convert_md_to_dict(contents_md)
 
-    def get_body_in_page(self, html_body: str) -> str:
+    def get_body_in_page(self, page: PageDocument) -> str:
         """page에서 본문(body) 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 본문
         """
-        soup = BeautifulSoup(html_body, 'lxml')
-        return markdownify(
-            soup.find(id='main-text').decode_contents().replace('\n', ''),
+        return page.markdown(
+            {'id': 'main-text'},
+            replacements=(('\n', ''),),
             strip=['a', 'hr'],
             heading_style='ATX'
         ).strip()
 
-    def get_bibliography_in_page(self, html_body: str) -> str:
+    def get_bibliography_in_page(self, page: PageDocument) -> str:
         """page에서 인용문(bibliography) 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 인용문
         """
-        soup = BeautifulSoup(html_body, 'lxml')
-        return markdownify(
-            soup.find(id='bibliography').decode_contents().replace('\n', ''),
+        return page.markdown(
+            {'id': 'bibliography'},
+            replacements=(('\n', ''),),
             strip=['a', 'hr'],
             heading_style='ATX'
         ).strip()
 
 
+@register_site('iep')
 class IEP(SiteBase):
-    def get_page_uris(self, verbose: bool=False) -> list[str]:
-        """모든 페이지 uri를 list type으로 반환하도록 함
+    PARSE_TARGETS = ({'class_': 'entry-content'},)
+    # title, abstract, bibliography는 같은 markdown을 사용하므로 한 번에 분류
+    TEXT_SECTIONS = ('title', 'abstract', 'references')
 
-        Args:
-            verbose (bool, optional): 스크랩 진행 상황을 표시. Defaults to False.
+    def get_index_uris(self) -> list[str]:
+        """알파벳으로 그룹된 목차 page uri들
 
         Returns:
-            list[str]: page uri list
+            list[str]: index page uri list
         """
-        links = []
-        if verbose:
-            print(self.__class__.__name__, 'scrap contents: ', end='')
-            sys.stdout.flush()
-        for sub_group in string.ascii_lowercase:
-            if verbose:
-                print(sub_group, end='')
-            sys.stdout.flush()
-            # 알파벳으로 그룹된 별도 페이지가 존재하므로 순회하면서 링크 수집
-            resp = self.session.get(f'https://iep.utm.edu/{sub_group}/')
-            soup = BeautifulSoup(resp.text, 'lxml')
-
-            contents_group = soup.find(class_='entry-content')
-            all_links = [link.get('href', '') for link in contents_group.find_all('a')]
-
-            for link in all_links:
-                # 절대주소 형식이면서 외부 사이트 연결은 수집 대상에서 제외함
-                is_abs_addr = link.startswith('http://') or link.startswith('https://')  # 절대 주소 형식인지 확인
-                if is_abs_addr and not link.startswith('https://iep.utm.edu/'):
-                    continue
-                if not is_abs_addr:  # 절대 주소 형식이 아닌 경우 절대 주소 형식으로 변환
-                    link = f'https://iep.utm.edu/{link}'
-                links.append(link)
-        if verbose:
-            print('')
-            sys.stdout.flush()
-        return links
+        return [f'https://iep.utm.edu/{sub_group}/' for sub_group in string.ascii_lowercase]
 
-    def get_title_in_page(self, html_body: str) -> str:
-        """page에서 title을 추출
+    def get_page_uris_in_index(self, html_body: str) -> list[str]:
+        """알파벳 목차 page에서 page uri를 추출
 
         Args:
-            html_body (str): page html body
+            html_body (str): index page html body
 
         Returns:
-            str: page의 title
+            list[str]: page uri list
         """
         soup = BeautifulSoup(html_body, 'lxml')
-        md = markdownify(
-            soup.find(class_='entry-content').decode_contents(),
-            strip=['a', 'em', 'img'],
-            heading_style='ATX'
-        )
-        for line in md.split('\n'):
-            if line.strip().startswith('#'):  # 문서 본문 중 첫번째로 나오는 title을 가져옴
-                return line.strip().strip('#').strip()
-
-    def _abstract_with_title(self, md_body: str) -> str:
-        """Table of Contents title이 있어서 abtract의 끝을 분명히 알 수 있는 경우에 대한 파싱
-
-        Args:
-            md_body (str): page markdown body
-
-        Returns:
-            str: abstract 문자열 (markdown)
-        """
-        before_toc, _ = md_body.split('### Table of Contents')
-        lines = []
-        for line in before_toc.split('\n'):
-            if line.strip().startswith('#'):  # page title
-                continue
-            lines.append(line)
-        return '\n'.join(lines)
-
-    def _abstract_without_title(self, md_body: str) -> str:
-        """Table of Contents title이 없어서 abstract의 끝을 휴리스틱하게 알 수 있는 경우에 대한 파싱
 
-        list 태그가 보이기 전까지를 묶어서 abstract라고 가정
-
-        Args:
-            md_body (str): page markdown body
+        contents_group = soup.find(class_='entry-content')
+        all_links = [link.get('href', '') for link in contents_group.find_all('a')]
 
-        Returns:
-            str: abstract 문자열 (markdown)
-        """
-        lines = []
-        for line in md_body.split('\n'):
-            line = line.strip()
-            if line.startswith('#'):  # page title
+        links = []
+        for link in all_links:
+            # 절대주소 형식이면서 외부 사이트 연결은 수집 대상에서 제외함
+            is_abs_addr = link.startswith('http://') or link.startswith('https://')  # 절대 주소 형식인지 확인
+            if is_abs_addr and not link.startswith('https://iep.utm.edu/'):
                 continue
-            if len(line) > 0 and line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
-                # *, -, +: ul / 0, 1, 2, .., 9: ol
-                break
-            lines.append(line)
-        return '\n'.join(lines)
+            if not is_abs_addr:  # 절대 주소 형식이 아닌 경우 절대 주소 형식으로 변환
+                link = f'https://iep.utm.edu/{link}'
+            links.append(link)
+        return links
 
-    def get_abstract_in_page(self, html_body: str) -> str:
-        """page에서 abstract를 추출
+    def _sections(self, page: PageDocument, sections: tuple, replacements: tuple = (), **options) -> MarkdownSections:
+        """entry-content를 주어진 옵션으로 markdown 변환한 후 section별로 분류, 같은 인자의 분류는 한 번만 수행
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
+            sections (tuple): 필요한 section 이름 목록
+            replacements (tuple, optional): 변환 전 내부 html에 적용할 (old, new) 쌍 목록. Defaults to ().
+            **options: markdownify 옵션
 
         Returns:
-            str: page의 abstract
+            MarkdownSections: 분류된 section들
         """
-        soup = BeautifulSoup(html_body, 'lxml')  # 본문만 markdown으로 변환하기 위함
-        md = markdownify(
-            soup.find(class_='entry-content').decode_contents(),
-            strip=['a', 'em', 'img'],
-            heading_style='ATX'
-        )
-        # _toc_without_title()가 더 범용적으로 동작하지만 _toc_with_title()가 특정 상황에서 더 정확한 결과를 반환할 것이라고 예측
-        if '### Table of Contents' in md:
-            return self._abstract_with_title(md)
-        else:
-            return self._abstract_without_title(md)
+        md = page.markdown({'class_': 'entry-content'}, replacements=replacements, heading_style='ATX', **options)
+        return page.memoize(('sections', md, sections), lambda: segment_markdown(md, sections))
 
-    def _toc_with_title(self, md_body: str) -> str:
-        """Table of Contents title에 이어서 목차 리스트가 시작하는 경우에 대한 파싱
+    def get_title_in_page(self, page: PageDocument) -> str:
+        """page에서 title을 추출
 
         Args:
-            md_body (str): page markdown body
+            page (PageDocument): 파싱된 page
 
         Returns:
-            str: 목차 문자열 (markdown)
+            str: page의 title
         """
-        _, after_toc = md_body.split('### Table of Contents')
-        tocs = []
-        toc_start = False  # list가 끝나면 중단하도록 하기 위한 flag
-        for line in after_toc.split('\n'):
-            stripped_line = line.strip()
-            if len(stripped_line) > 0 and stripped_line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
-                # *, -, +: ul / 0, 1, 2, .., 9: ol
-                tocs.append(line)
-                if not toc_start:
-                    toc_start = True  # list가 시작되면 flag를 True로 변경
-            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
-                break
-        return '\n'.join(tocs).strip()
+        return self._sections(page, self.TEXT_SECTIONS, strip=['a', 'em', 'img']).title  # 문서 본문 중 첫번째로 나오는 title
 
-    def _toc_without_title(self, md_body: str) -> str:
-        """Table of Contents title 없이 바로 목차 리스트가 시작하는 경우에 대한 파싱
+    def get_abstract_in_page(self, page: PageDocument) -> str:
+        """page에서 abstract를 추출
 
         Args:
-            md_body (str): page markdown body
+            page (PageDocument): 파싱된 page
 
         Returns:
-            str: 목차 문자열 (markdown)
+            str: page의 abstract
         """
-        tocs = []
-        toc_start = False  # list가 끝나면 중단하도록 하기 위한 flag
-        for line in md_body.split('\n'):
-            stripped_line = line.strip()
-            if len(stripped_line) > 0 and stripped_line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
-                # *, -, +: ul / 0, 1, 2, .., 9: ol
-                tocs.append(line)
-                if not toc_start:
-                    toc_start = True  # list가 시작되면 flag를 True로 변경
-            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
-                break
-        return '\n'.join(tocs).strip()
+        return self._sections(page, self.TEXT_SECTIONS, strip=['a', 'em', 'img']).abstract
 
     def convert_ol_to_ul(self, md_body: str) ->  str:  # DEPRECATED
         """md_body에서 ol(ordered list)를 ul(unordered list)로 변환
@@ -277,135 +202,42 @@ class IEP(SiteBase):
                 break
         return '\n'.join(new_contents)
 
-    def get_contents_in_page(self, html_body: str) -> str:
+    def get_contents_in_page(self, page: PageDocument) -> str:
         """page에서 목차(table of contents)를 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 목차
         """
-        soup = BeautifulSoup(html_body, 'lxml')  # 본문만 markdown으로 변환하기 위함
-        md = markdownify(
-            soup.find(class_='entry-content').decode_contents().replace('<ol>', '<ul>').replace('</ol>', '</ul>'),
+        sections = self._sections(
+            page,
+            ('toc',),
+            replacements=(('<ol>', '<ul>'), ('</ol>', '</ul>')),
             strip=['a', 'em'],
-            heading_style='ATX',
             bullets='-'
         )
-        # _contents_without_title()가 더 범용적으로 동작하지만 _contents_with_title()가 특정 상황에서 더 정확한 결과를 반환할 것이라고 예측
-        contents_md = ''
-        if '### Table of Contents' in md:
-            contents_md = self._toc_with_title(md)
-        else:
-            contents_md = self._toc_without_title(md)
-        return self._convert_md_to_dict(contents_md)
-
-    def _body_with_title(self, md_body: str) -> str:
-        """Table of Contents title이 존재하는 경우 body 파싱
-
-        Args:
-            md_body (str): page markdown body
+        return self._convert_md_to_dict(sections.toc)
 
-        Returns:
-            str: 목차 문자열 (markdown)
-        """
-        _, after_toc = md_body.split('### Table of Contents')
-        body_lines = []
-        toc_start = False  # list의 종료를 확인하기 위한 flag
-        body_start = False  # list가 종료되면 True로 변경되어서 본문임을 확인할 수 있도록 하는 flag
-        for line in after_toc.split('\n'):
-            line = line.strip()
-            if len(line) > 0 and line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
-                # *, -, +: ul / 0, 1, 2, .., 9: ol
-                if not toc_start:
-                    toc_start = True  # list가 시작되면 flag를 True로 변경
-            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
-                body_start = True  # -> 이후부터 본문 내용
-            if not body_start:  # 아직 본문이 아니라면 아무 작업도 수행하지 않고 계속 진행
-                continue
-            if line.startswith('#') and 'reference' in line.lower():  # Reference 시작하면 탈출
-                break
-            if len(line) == 1 and line[0] == '>':  # 인용문인데 내용이 없는 경우 무시하도록 함
-                continue
-            body_lines.append(line)
-        return '\n'.join(body_lines).strip()
-
-    def _body_without_title(self, md_body: str) -> str:
-        """Table of Contents title이 존재하지 않는 경우 body 파싱
-
-        Args:
-            md_body (str): page markdown body
-
-        Returns:
-            str: 목차 문자열 (markdown)
-        """
-        body_lines = []
-        toc_start = False  # list의 종료를 확인하기 위한 flag
-        body_start = False  # list가 종료되면 True로 변경되어서 본문임을 확인할 수 있도록 하는 flag
-        for line in md_body.split('\n'):
-            line = line.strip()
-            if len(line) > 0 and line[0] in ('*', '-', '+') + tuple(string.digits):  # list in markdown
-                # *, -, +: ul / 0, 1, 2, .., 9: ol
-                if not toc_start:
-                    toc_start = True  # list가 시작되면 flag를 True로 변경
-            elif toc_start:  # list가 시작되었는데 지금 읽은 문자열이 list가 아니라면 toc가 종료되었다고 판단
-                body_start = True  # -> 이후부터 본문 내용
-            if not body_start:  # 아직 본문이 아니라면 아무 작업도 수행하지 않고 계속 진행
-                continue
-            if line.startswith('#') and 'reference' in line.lower():  # Reference 시작하면 탈출
-                break
-            if len(line) == 1 and line[0] == '>':  # 인용문인데 내용이 없는 경우 무시하도록 함
-                continue
-            body_lines.append(line)
-        return '\n'.join(body_lines).strip()
-
-    def get_body_in_page(self, html_body: str) -> str:
+    def get_body_in_page(self, page: PageDocument) -> str:
         """page에서 본문(body) 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 본문
         """
-        soup = BeautifulSoup(html_body, 'lxml')  # 본문만 markdown으로 변환하기 위함
-        md = markdownify(
-            soup.find(class_='entry-content').decode_contents(),
-            strip=['a', 'img'],
-            heading_style='ATX'
-        )
-        # _body_without_title()가 더 범용적으로 동작하지만 _body_with_title()가 특정 상황에서 더 정확한 결과를 반환할 것이라고 예측
-        if '### Table of Contents' in md:
-            return self._body_with_title(md)
-        else:
-            return self._body_without_title(md)
+        return self._sections(page, ('body',), strip=['a', 'img']).body
 
-    def get_bibliography_in_page(self, html_body: str) -> str:
+    def get_bibliography_in_page(self, page: PageDocument) -> str:
         """page에서 인용문(bibliography) 추출
 
         Args:
-            html_body (str): page html body
+            page (PageDocument): 파싱된 page
 
         Returns:
             str: page의 인용문
         """
-        soup = BeautifulSoup(html_body, 'lxml')  # 본문만 markdown으로 변환하기 위함
-        md = markdownify(
-            soup.find(class_='entry-content').decode_contents(),
-            strip=['a', 'img', 'em'],
-            heading_style='ATX'
-        )
-        lines = []
-        is_reference = False
-        for line in md.split('\n'):
-            if line.startswith('#') and 'reference' in line.lower():
-                is_reference = True
-                continue  # 해당 line은 title이므로 다음 line부터 작업
-            if not is_reference:
-                continue
-
-            if line.startswith('#'):  # reference가 끝남
-                break
-            lines.append(line)
-        return '\n'.join(lines).strip()
+        return self._sections(page, self.TEXT_SECTIONS, strip=['a', 'img', 'em']).references
@@ -0,0 +1,452 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator
+
+from colorama import Style
+
+from compression import METHODS as COMPRESSION_METHODS
+from registry import get_site, load_plugins
+from scheduler import COLORS
+from scrap import make_site
+
+# 여러 worker process가 나누어 스크래핑할 page uri 목록
+# status는 pending(대기), leased(worker가 lease_until까지 처리 중), done, failed(파싱 실패 등), dead(요청 재시도 초과)
+# lease_until이 지난 leased는 worker가 죽은 것으로 보고 다른 worker가 다시 가져감
+QUEUE_TABLE_CREATION_SQL = (
+    'CREATE TABLE IF NOT EXISTS work_queue (id INTEGER PRIMARY KEY, uri TEXT UNIQUE, status TEXT, '
+    'worker TEXT, lease_until REAL, claims INTEGER DEFAULT 0, updated_at TEXT)'
+)
+QUEUE_INDEX_CREATION_SQL = 'CREATE INDEX IF NOT EXISTS work_queue_status ON work_queue (status, lease_until)'
+QUEUE_INSERT_SQL = "INSERT OR IGNORE INTO work_queue (uri, status, updated_at) VALUES (?, 'pending', datetime('now'))"
+# lease를 max_claims 번 받고도 끝나지 않은 page는 worker를 죽이는 page로 보고 더 이상 나누어 주지 않음
+QUEUE_EXPIRE_SQL = (
+    "UPDATE work_queue SET status = 'dead', worker = NULL, updated_at = datetime('now') "
+    "WHERE status = 'leased' AND lease_until < ? AND claims >= ?"
+)
+# 대기 중이거나 lease가 만료된 page를 고른 후 같은 transaction에서 lease를 기록함
+# UPDATE ... RETURNING은 SQLite 3.35부터 지원하므로 사용하지 않음 (python:3.10-bullseye image의 SQLite는 3.34)
+QUEUE_CLAIMABLE_SQL = (
+    "SELECT id, uri FROM work_queue WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) ORDER BY id LIMIT ?"
+)
+QUEUE_CLAIM_SQL = (
+    "UPDATE work_queue SET status = 'leased', worker = ?, lease_until = ?, claims = claims + 1, updated_at = datetime('now') "
+    'WHERE id = ?'
+)
+QUEUE_RENEW_SQL = "UPDATE work_queue SET lease_until = ? WHERE uri = ? AND worker = ? AND status = 'leased'"
+QUEUE_FINISH_SQL = (
+    "UPDATE work_queue SET status = ?, worker = NULL, lease_until = NULL, updated_at = datetime('now') "
+    "WHERE uri = ? AND worker = ? AND status = 'leased'"
+)
+QUEUE_RELEASE_SQL = (
+    "UPDATE work_queue SET status = 'pending', worker = NULL, lease_until = NULL, updated_at = datetime('now') "
+    "WHERE uri = ? AND worker = ? AND status = 'leased'"
+)
+QUEUE_REMAINING_SQL = (
+    "SELECT COUNT(*) FROM work_queue WHERE status = 'pending' OR (status = 'leased' AND worker IS NOT ?)"
+)
+# ScrapWriter의 status를 queue의 status로 변환
+FINISHED_STATUS = {'done': 'done', 'unchanged': 'done', 'failed': 'failed', 'dead': 'dead'}
+
+
+class WorkQueue:
+    """SQLite 파일에 저장되는 page uri work queue
+
+    worker는 claim()으로 page들을 lease_seconds 동안 빌리고, 결과를 저장한 후 finish()로 완료 처리함
+    lease가 만료되기 전에 끝나지 않으면 다른 worker가 다시 가져가므로 죽은 worker의 page도 처리되고,
+    finish(), renew()는 아직 lease를 가진 worker만 할 수 있으므로 한 page를 두 worker가 완료 처리하지 않음
+    lease 시간은 여러 machine에서 비교할 수 있도록 epoch 초로 기록함
+    thread마다 별도 connection을 사용하므로 여러 thread에서 호출해도 됨
+    """
+
+    def __init__(self, path: str, max_claims: int = 3, timeout: float = 30.0):
+        """
+        Args:
+            path (str): queue sqlite3 파일 경로, 모든 worker가 접근할 수 있어야 함
+            max_claims (int, optional): page당 최대 lease 횟수, lease가 모두 만료되면 dead로 기록. Defaults to 3.
+            timeout (float, optional): 다른 worker가 queue를 잠그고 있을 때 기다리는 최대 시간 (초). Defaults to 30.0.
+        """
+        self.path = path
+        self.max_claims = max_claims
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(QUEUE_TABLE_CREATION_SQL)
+            conn.execute(QUEUE_INDEX_CREATION_SQL)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # transaction은 _transaction()에서 직접 시작
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """쓰기 lock을 먼저 잡는 transaction, 여러 worker가 같은 page를 동시에 가져가지 않도록 함"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def seed(self, uris) -> int:
+        """page uri들을 pending으로 추가, 이미 있는 uri는 상태를 유지함
+
+        Returns:
+            int: 새로 추가된 uri 수
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(QUEUE_INSERT_SQL, ((uri,) for uri in uris))
+            return conn.total_changes - before
+
+    def claim(self, worker: str, count: int, lease_seconds: float) -> list[str]:
+        """대기 중이거나 lease가 만료된 page를 최대 count 개 빌림
+
+        Args:
+            worker (str): worker id
+            count (int): 최대 page 수
+            lease_seconds (float): lease 시간 (초)
+
+        Returns:
+            list[str]: 추가된 순서대로 빌린 page uri 목록, 빌릴 page가 없으면 빈 list
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(QUEUE_EXPIRE_SQL, (now, self.max_claims))
+            rows = conn.execute(QUEUE_CLAIMABLE_SQL, (now, count)).fetchall()
+            conn.executemany(QUEUE_CLAIM_SQL, ((worker, now + lease_seconds, row_id) for row_id, _ in rows))
+        return [uri for _, uri in rows]
+
+    def renew(self, worker: str, uris, lease_seconds: float) -> int:
+        """아직 가지고 있는 page들의 lease를 연장
+
+        Returns:
+            int: 연장된 page 수, 이미 만료되어 다른 worker가 가져간 page는 제외됨
+        """
+        lease_until = time.time() + lease_seconds
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(QUEUE_RENEW_SQL, ((lease_until, uri, worker) for uri in uris))
+            return conn.total_changes - before
+
+    def finish(self, worker: str, results: list[tuple[str, str]]) -> int:
+        """결과가 저장된 page들을 완료 처리
+
+        Args:
+            worker (str): worker id
+            results (list[tuple[str, str]]): [(uri, status)], status는 ScrapWriter의 done, unchanged, failed 또는 dead
+
+        Returns:
+            int: 완료 처리된 page 수
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(QUEUE_FINISH_SQL, ((FINISHED_STATUS[status], uri, worker) for uri, status in results))
+            return conn.total_changes - before
+
+    def release(self, worker: str, uris) -> int:
+        """끝내지 못한 page들의 lease를 반환해서 다른 worker가 바로 가져갈 수 있도록 함
+
+        Returns:
+            int: 반환된 page 수
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(QUEUE_RELEASE_SQL, ((uri, worker) for uri in uris))
+            return conn.total_changes - before
+
+    def requeue(self, statuses: tuple = ('failed', 'dead')) -> int:
+        """statuses 상태인 page들을 다시 대기 상태로 되돌림
+
+        Returns:
+            int: 되돌린 page 수
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE work_queue SET status = 'pending', worker = NULL, lease_until = NULL, claims = 0, "
+                f"updated_at = datetime('now') WHERE status IN ({', '.join('?' * len(statuses))})",
+                statuses,
+            ).rowcount
+
+    def remaining(self, worker: str = None) -> int:
+        """대기 중이거나 다른 worker가 처리 중인 page 수, 0이면 worker가 더 기다릴 필요가 없음"""
+        return self._conn().execute(QUEUE_REMAINING_SQL, (worker,)).fetchone()[0]
+
+    def counts(self) -> dict:
+        """{status: page 수}"""
+        return dict(self._conn().execute('SELECT status, COUNT(*) FROM work_queue GROUP BY status'))
+
+    def close(self) -> None:
+        """현재 thread의 connection을 닫음"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class LeaseFeed:
+    """WorkQueue에서 빌린 page uri를 scrap()에 공급하고, 저장이 끝난 page를 완료 처리
+
+    scrap()이 uri를 모두 미리 가져가서 queue를 독점하지 않도록 결과가 저장되지 않은 page가
+    2 * batch_size 개 이상이면 다음 page들을 빌리지 않음
+    가지고 있는 page의 lease는 heartbeat thread가 lease_seconds / 3 마다 연장하므로,
+    lease는 worker가 죽었을 때 다른 worker가 page를 가져가기까지의 시간만 결정함
+
+    ex)
+        with LeaseFeed(queue, worker) as feed:
+            site.scrap(path, page_uris=feed.uris(), refresh=True, on_stored=feed.on_stored)
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        worker: str,
+        batch_size: int = 20,
+        lease_seconds: float = 120.0,
+        poll_interval: float = 2.0,
+    ):
+        """
+        Args:
+            queue (WorkQueue): work queue
+            worker (str): worker id, worker마다 달라야 함
+            batch_size (int, optional): 한 번에 빌리는 page 수. Defaults to 20.
+            lease_seconds (float, optional): lease 시간 (초). Defaults to 120.0.
+            poll_interval (float, optional): 다른 worker가 처리 중인 page만 남았을 때 다시 확인하는 간격 (초). Defaults to 2.0.
+        """
+        self.queue = queue
+        self.worker = worker
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.outstanding = set()  # 빌렸지만 아직 결과가 저장되지 않은 page
+        self._changed = threading.Condition()
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name=f'lease-{worker}', daemon=True)
+
+    def _next_batch(self) -> list[str]:
+        """다음 page들을 빌림, 남은 page가 없으면 빈 list"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.outstanding) < 2 * self.batch_size)
+        while True:
+            uris = self.queue.claim(self.worker, self.batch_size, self.lease_seconds)
+            if uris:
+                with self._changed:
+                    self.outstanding.update(uris)
+                return uris
+            if not self.queue.remaining(self.worker):
+                return []
+            # 다른 worker가 처리 중인 page만 남음, 그 worker가 죽으면 lease가 만료된 후 가져감
+            time.sleep(self.poll_interval)
+
+    def uris(self) -> Iterator[str]:
+        """동기 방식 scrap()에 전달할 page uri iterator"""
+        while batch := self._next_batch():
+            yield from batch
+
+    async def uris_async(self) -> AsyncIterator[str]:
+        """async_mode scrap()에 전달할 page uri async iterator, queue 작업은 event loop 밖에서 실행"""
+        while batch := await asyncio.to_thread(self._next_batch):
+            for uri in batch:
+                yield uri
+
+    def on_stored(self, results: list[tuple[str, str]]) -> None:
+        """ScrapWriter가 결과를 commit 한 후 호출, scrap()의 on_stored로 전달"""
+        self.queue.finish(self.worker, results)
+        with self._changed:
+            self.outstanding.difference_update(uri for uri, _ in results)
+            self._changed.notify_all()
+
+    def _renew_leases(self) -> None:
+        while not self._stopped.wait(self.lease_seconds / 3):
+            with self._changed:
+                uris = list(self.outstanding)
+            if uris:
+                self.queue.renew(self.worker, uris, self.lease_seconds)
+
+    def __enter__(self):
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._heartbeat.join()
+        with self._changed:
+            unfinished = list(self.outstanding)
+            self.outstanding.clear()
+        if unfinished:  # 중단된 경우 lease 만료를 기다리지 않도록 반환
+            self.queue.release(self.worker, unfinished)
+        self.queue.close()
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def run_worker(site, queue_path: str, db_path: str, worker: str = None, color: str = '', **options) -> None:
+    """queue가 빌 때까지 page들을 빌려서 스크래핑
+
+    결과는 refresh 방식으로 저장하므로 여러 worker가 같은 db에 저장하거나, 기존 db를 다시 스크래핑해도 됨
+
+    Args:
+        site (SiteBase): SiteBase 구현체의 instance
+        queue_path (str): queue sqlite3 파일 경로
+        db_path (str): 결과 sqlite3 파일 경로
+        worker (str, optional): worker id, 없으면 {hostname}-{pid}. Defaults to None.
+        color (str, optional): 출력 색상. Defaults to ''.
+        **options: LeaseFeed에 전달할 batch_size, lease_seconds, max_claims와 scrap()에 전달할 인자
+    """
+    worker = worker or default_worker_id()
+    feed_options = {key: options.pop(key) for key in ('batch_size', 'lease_seconds') if key in options}
+    queue = WorkQueue(queue_path, **({'max_claims': options.pop('max_claims')} if 'max_claims' in options else {}))
+    with LeaseFeed(queue, worker, **feed_options) as feed:
+        site.scrap(
+            db_path,
+            color,
+            page_uris=feed.uris_async() if options.get('async_mode') else feed.uris(),
+            refresh=True,
+            on_stored=feed.on_stored,
+            **options,
+        )
+
+
+def _worker_main(options, index: int) -> None:
+    """coordinator가 시작한 worker process"""
+    load_plugins(options.plugins)
+    site = make_site(get_site(options.site), options, options.concurrency)
+    run_worker(
+        site,
+        options.queue,
+        options.db,
+        f'{default_worker_id()}-{index}',
+        COLORS[index % len(COLORS)],
+        **worker_options(options),
+    )
+
+
+def worker_options(options) -> dict:
+    return dict(
+        batch_size=options.batch_size,
+        lease_seconds=options.lease_seconds,
+        max_claims=options.max_claims,
+        async_mode=options.async_mode,
+        concurrency=options.concurrency,
+        rate=options.rate,
+        max_rate=options.max_rate,
+        max_attempts=options.max_attempts,
+        parse_workers=options.parse_workers,
+        toc_table=options.toc_table,
+        search_index=options.search_index,
+        compression=options.compress,
+        progress_interval=options.progress_interval,
+    )
+
+
+def print_counts(queue: WorkQueue) -> None:
+    counts = queue.counts()
+    print(', '.join(f'{status} {counts.get(status, 0)}' for status in ('pending', 'leased', 'done', 'failed', 'dead')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='SQLite work queue를 공유하는 여러 worker process로 site 하나를 스크래핑')
+    parser.add_argument('--site', required=True, help='스크래핑할 site 이름')
+    parser.add_argument(
+        '--plugin', dest='plugins', action='append', default=[], help='register_site()로 site를 등록하는 module, 여러 번 지정 가능'
+    )
+    parser.add_argument('--queue', default=None, help='queue sqlite3 파일 경로, 없으면 {site}.queue.db')
+    parser.add_argument('--mirror', default=None, help='실제 사이트 대신 요청할 replay server 주소')
+    parser.add_argument('--max-claims', type=int, default=3, help='page당 최대 lease 횟수, 모두 만료되면 dead로 기록')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('seed', help='get_page_uris()의 page들을 queue에 추가')
+    subparsers.add_parser('status', help='상태별 page 수')
+    requeue_parser = subparsers.add_parser('requeue', help='실패한 page들을 다시 대기 상태로 되돌림')
+    requeue_parser.add_argument('--status', nargs='+', default=('failed', 'dead'), help='되돌릴 상태')
+
+    worker_parser = argparse.ArgumentParser(add_help=False)
+    worker_parser.add_argument('--db', default=None, help='결과 sqlite3 파일 경로, 없으면 {site}.db')
+    worker_parser.add_argument('--batch-size', type=int, default=20, help='한 번에 빌리는 page 수')
+    worker_parser.add_argument(
+        '--lease-seconds', type=float, default=120.0, help='lease 시간 (초), worker가 죽으면 이 시간이 지난 후 다른 worker가 가져감'
+    )
+    worker_parser.add_argument('--async', dest='async_mode', action='store_true', help='asyncio로 여러 page를 동시에 가져옴')
+    worker_parser.add_argument('--concurrency', type=int, default=4, help='worker별 최대 동시 요청 수')
+    worker_parser.add_argument('--rate', type=float, default=4.0, help='worker별 host당 처음 초당 요청 수')
+    worker_parser.add_argument('--max-rate', type=float, default=None, help='worker별 host당 최대 초당 요청 수, 없으면 --rate의 4배')
+    worker_parser.add_argument('--max-attempts', type=int, default=5, help='page당 최대 요청 횟수, 모두 실패하면 dead로 기록')
+    worker_parser.add_argument('--parse-workers', type=int, default=0, help='--async 사용 시 worker별 파싱 process 수')
+    worker_parser.add_argument('--cache-dir', default=None, help='가져온 page를 저장하고 조건부 요청에 사용할 directory')
+    worker_parser.add_argument('--toc-table', action='store_true', help='목차를 항목별 row로 나눈 toc table도 함께 저장')
+    worker_parser.add_argument('--search-index', action='store_true', help='전문 검색 index도 함께 저장')
+    worker_parser.add_argument('--compress', choices=COMPRESSION_METHODS, default=None, help='body, bibliography를 압축해서 저장')
+    worker_parser.add_argument('--backend', choices=('bs4', 'lxml'), default='bs4', help='page 파싱 방식')
+    worker_parser.add_argument('--partial-parse', action='store_true', help='--backend lxml에서 필요한 subtree만 남기고 파싱')
+    worker_parser.add_argument('--stream', action='store_true', help='response를 chunk 단위로 파싱하면서 필요한 subtree만 남김')
+    worker_parser.add_argument('--progress-interval', type=float, default=5.0, help='진행 상황을 출력하는 간격 (초)')
+    subparsers.add_parser(
+        'worker', parents=[worker_parser], help='queue가 빌 때까지 page들을 빌려서 스크래핑, 다른 machine에서도 실행 가능'
+    )
+    run_parser = subparsers.add_parser(
+        'run', parents=[worker_parser], help='queue를 채우고 local worker process들을 시작해서 끝날 때까지 기다림'
+    )
+    run_parser.add_argument('--workers', type=int, default=4, help='시작할 worker process 수')
+    options = parser.parse_args()
+    options.queue = options.queue or f'{options.site}.queue.db'
+    if options.command in ('worker', 'run'):
+        options.db = options.db or f'{options.site}.db'
+    return options
+
+
+def main():
+    options = parse_args()
+    load_plugins(options.plugins)
+    try:
+        site_class = get_site(options.site)
+    except KeyError as e:
+        sys.exit(f'workqueue.py: error: {e.args[0]}')
+    queue = WorkQueue(options.queue, options.max_claims)
+
+    if options.command in ('seed', 'run'):
+        site = site_class(mirror=options.mirror)
+        print(f'{options.queue}: {queue.seed(site.get_page_uris())} page uris added')
+    elif options.command == 'requeue':
+        print(f'{options.queue}: {queue.requeue(tuple(options.status))} page uris requeued')
+    elif options.command == 'worker':
+        run_worker(
+            make_site(site_class, options, options.concurrency), options.queue, options.db, **worker_options(options)
+        )
+
+    if options.command == 'run':
+        # fork 된 process가 부모의 sqlite3 connection을 물려받지 않도록 닫고 시작
+        queue.close()
+        processes = [
+            multiprocessing.Process(target=_worker_main, args=(options, i), name=f'worker-{i}')
+            for i in range(options.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        print_counts(queue)
+        failed = [process.name for process in processes if process.exitcode]
+        if failed:
+            sys.exit(f'{Style.BRIGHT}workers failed: {", ".join(failed)}{Style.RESET_ALL}')
+    else:
+        print_counts(queue)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+import queue
+import sqlite3
+import time
+from collections import defaultdict
+from threading import Event, Thread
+from typing import Callable
+
+from changes import (
+    CHANGE_LOG_INSERT_SQL,
+    FIELDS,
+    PAGE_HASH_CHECKED_SQL,
+    PAGE_HASH_UPSERT_SQL,
+    changed_fields,
+    create_change_tables,
+    field_digests,
+)
+from compression import MIN_DICTIONARY_SAMPLES, ColumnCodec
+from metrics import Metrics
+from search import create_search_index
+from toc import TOC_DELETE_SQL, TOC_INSERT_SQL, TOC_TABLE_CREATION_SQL, toc_rows
+
+_CLOSE = object()
+
+
+class ScrapWriter:
+    """스크래핑 결과를 모아서 transaction 단위로 저장하는 writer
+
+    connection은 writer thread 하나만 소유하며, fetch/parse worker들은 write(), fail()로 결과를 넘기기만 함
+    쌓인 결과는 batch_size 개가 되거나 flush_interval 초가 지나면 executemany로 한 번에 저장됨
+    이미 저장된 page는 page_hash table의 field별 hash와 비교해서 바뀐 field만 갱신하고 change_log에 기록함
+    """
+
+    TABLE_CREATION_SQL = (
+        'CREATE TABLE IF NOT EXISTS scrap '
+        '(id integer PRIMARY KEY, uri TEXT, title TEXT, abstract TEXT, contents TEXT, body TEXT, bibliography TEXT)'
+    )
+    # page별 스크래핑 진행 상황, status는 done, failed 또는 dead (재시도를 모두 사용한 dead-letter)
+    PROGRESS_TABLE_CREATION_SQL = (
+        'CREATE TABLE IF NOT EXISTS progress '
+        '(uri TEXT PRIMARY KEY, status TEXT, error TEXT, attempts INTEGER, updated_at TEXT)'
+    )
+    # upsert를 위한 uri unique index, 생성 전에 중복 uri는 마지막 row만 남김
+    URI_INDEX_CREATION_SQL = 'CREATE UNIQUE INDEX IF NOT EXISTS scrap_uri ON scrap (uri)'
+    # query_server.py가 title로 문서를 찾을 때 사용
+    TITLE_INDEX_CREATION_SQL = 'CREATE INDEX IF NOT EXISTS scrap_title ON scrap (title)'
+    DEDUPLICATION_SQL = 'DELETE FROM scrap WHERE id NOT IN (SELECT MAX(id) FROM scrap GROUP BY uri)'
+
+    UPSERT_SQL = (
+        'INSERT INTO scrap (uri, title, abstract, contents, body, bibliography) VALUES (?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT(uri) DO UPDATE SET '
+        'title = excluded.title, abstract = excluded.abstract, contents = excluded.contents, '
+        'body = excluded.body, bibliography = excluded.bibliography'
+    )
+    PROGRESS_UPSERT_SQL = (
+        "INSERT INTO progress (uri, status, error, attempts, updated_at) VALUES (?, ?, ?, 1, datetime('now')) "
+        'ON CONFLICT(uri) DO UPDATE SET '
+        'status = excluded.status, error = excluded.error, attempts = attempts + 1, updated_at = excluded.updated_at'
+    )
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        toc_table: bool = False,
+        search_index: bool = False,
+        compression: str = None,
+        metrics: Metrics = None,
+        on_stored: Callable[[list[tuple[str, str]]], None] = None,
+        timeout: float = 60.0,
+    ):
+        """
+        Args:
+            path (str): sqlite3 파일 경로
+            batch_size (int, optional): 한 transaction에 저장할 최대 row 수. Defaults to 100.
+            flush_interval (float, optional): 쌓인 row를 저장하기까지 기다리는 최대 시간 (초). Defaults to 1.0.
+            toc_table (bool, optional): 목차를 항목별 row로 나눈 toc table도 함께 저장. Defaults to False.
+            search_index (bool, optional): 전문 검색 index(scrap_fts)를 만들고 trigger로 저장과 함께 갱신. Defaults to False.
+            compression (str, optional): body, bibliography 압축 방식 (zlib, zlib-dict, lzma), 없으면 TEXT로 저장.
+                zlib-dict는 dictionary가 없으면 MIN_DICTIONARY_SAMPLES개의 문서가 저장될 때까지 TEXT로 저장한 후,
+                저장된 문서로 학습하고 압축함. Defaults to None.
+            metrics (Metrics, optional): 저장 시간과 queue에 쌓인 항목 수를 기록할 metrics. Defaults to None.
+            on_stored (Callable, optional): transaction이 commit 될 때마다 [(uri, status)]로 writer thread에서 호출,
+                status는 done, unchanged, failed 또는 dead. Defaults to None.
+            timeout (float, optional): 다른 process의 writer가 db를 잠그고 있을 때 기다리는 최대 시간 (초).
+                work queue의 worker들이 같은 db에 저장하는 경우 lock을 기다리다 writer thread가 종료되지 않도록 길게 잡음.
+                Defaults to 60.0.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.toc_table = toc_table
+        self.search_index = search_index
+        self.compression = compression
+        self._codec = None
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.on_stored = on_stored
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._ready = Event()
+        self._error = None
+        self._thread = Thread(target=self._run, name=f'writer-{path}', daemon=True)
+
+    def open(self) -> 'ScrapWriter':
+        """writer thread를 시작하고 table 생성이 끝날 때까지 기다림"""
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def write(self, uri: str, row: tuple, html_digest: str = None) -> None:
+        """page의 스크래핑 결과를 저장
+
+        Args:
+            uri (str): page uri
+            row (tuple): parse_page() 결과
+            html_digest (str, optional): 파싱한 html의 hash, 다음 스크래핑에서 바뀌지 않은 page를 건너뛰는 데 사용.
+                Defaults to None.
+        """
+        self._put((uri, row, None, 'done', html_digest))
+
+    def unchanged(self, uri: str) -> None:
+        """html이 바뀌지 않아서 파싱하지 않은 page를 완료로 기록
+
+        Args:
+            uri (str): page uri
+        """
+        self._put((uri, None, None, 'unchanged', None))
+
+    def fail(self, uri: str, error: str, dead: bool = False) -> None:
+        """page의 스크래핑 실패를 기록
+
+        Args:
+            uri (str): page uri
+            error (str): 실패 원인
+            dead (bool, optional): 재시도를 모두 사용한 page면 dead-letter로 기록. Defaults to False.
+        """
+        self._put((uri, None, error, 'dead' if dead else 'failed', None))
+
+    def _put(self, item: tuple) -> None:
+        # 저장에 실패해서 writer thread가 종료되면 더 이상 queue를 비우지 않으므로 바로 에러를 전달함
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def close(self) -> None:
+        """남은 row를 모두 저장하고 writer thread를 종료"""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        # 검색 index trigger가 사용하는 decompress() 함수도 함께 등록됨
+        self._codec = ColumnCodec(conn, self.compression)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # WAL에서는 checkpoint 시에만 fsync 해도 안전함
+        with conn:
+            conn.execute(self.TABLE_CREATION_SQL)
+            conn.execute(self.PROGRESS_TABLE_CREATION_SQL)
+            conn.execute(self.DEDUPLICATION_SQL)
+            conn.execute(self.URI_INDEX_CREATION_SQL)
+            conn.execute(self.TITLE_INDEX_CREATION_SQL)
+            create_change_tables(conn, self._codec.decompress)
+            if self.toc_table:
+                conn.execute(TOC_TABLE_CREATION_SQL)
+            if self.search_index:
+                create_search_index(conn)
+
+    def _flush(self, conn: sqlite3.Connection, items: list) -> None:
+        if not items:
+            return
+        # 같은 uri가 여러 번 있으면 마지막 결과를 사용
+        pages = {
+            uri: (dict(zip(FIELDS, row)), html_digest) for uri, row, error, status, html_digest in items if status == 'done'
+        }
+        unchanged = [uri for uri, _, _, status, _ in items if status == 'unchanged']
+        start = time.perf_counter()
+        with conn:  # row와 진행 상황이 함께 저장되도록 하나의 transaction으로 처리
+            # 다른 process의 writer와 함께 저장할 때 hash를 읽은 후 쓰기 전에 db가 바뀌지 않도록 쓰기 lock을 먼저 잡음
+            conn.execute('BEGIN IMMEDIATE')
+            self._codec.reload()  # 다른 process의 writer가 학습한 dictionary
+            stored = self._stored_digests(conn, list(pages))
+            inserts, updates, digests, changes, contents_by_uri = [], defaultdict(list), [], [], {}
+            for uri, (values, html_digest) in pages.items():
+                row_digests = field_digests(values.values())
+                digests.append((uri, html_digest, *row_digests))
+                if uri not in stored:
+                    inserts.append((uri, *self._codec.compress_row(tuple(values.values()))))
+                    changes.append((uri, 'added', None))
+                    contents_by_uri[uri] = values['contents']
+                    continue
+                fields = changed_fields(stored[uri], row_digests)
+                if not fields:  # html만 바뀌고 추출한 값은 같은 page
+                    continue
+                updates[tuple(fields)].append(
+                    (*(self._codec.compress_column(field, values[field]) for field in fields), uri)
+                )
+                changes.append((uri, 'modified', ','.join(fields)))
+                if 'contents' in fields:
+                    contents_by_uri[uri] = values['contents']
+
+            conn.executemany(self.UPSERT_SQL, inserts)
+            for fields, params in updates.items():  # 바뀐 field만 갱신하므로 검색 index, toc도 바뀐 page만 다시 만듦
+                conn.executemany(f'UPDATE scrap SET {", ".join(f"{field} = ?" for field in fields)} WHERE uri = ?', params)
+            if self.toc_table:  # 갱신된 page는 기존 목차 항목을 지우고 다시 저장
+                conn.executemany(TOC_DELETE_SQL, [(uri,) for uri in contents_by_uri])
+                conn.executemany(
+                    TOC_INSERT_SQL,
+                    [toc_row for uri, contents in contents_by_uri.items() for toc_row in toc_rows(uri, contents)],
+                )
+            # 문서가 충분히 모이면 dictionary를 학습하고 그동안 TEXT로 저장한 row도 압축
+            if self._codec.needs_dictionary and changes and self._codec.train_from_scrap(conn, MIN_DICTIONARY_SAMPLES):
+                self._codec.compress_stored(conn)
+            conn.executemany(PAGE_HASH_UPSERT_SQL, digests)
+            conn.executemany(PAGE_HASH_CHECKED_SQL, [(uri,) for uri in unchanged])
+            conn.executemany(CHANGE_LOG_INSERT_SQL, changes)
+            conn.executemany(
+                self.PROGRESS_UPSERT_SQL,
+                [(uri, 'done' if status == 'unchanged' else status, error) for uri, row, error, status, _ in items],
+            )
+        if self.on_stored is not None:  # commit 된 후에 알리므로 호출받은 page는 저장이 끝난 상태
+            self.on_stored([(uri, status) for uri, _, _, status, _ in items])
+        self.metrics.observe('scrap_db_write_seconds', time.perf_counter() - start)
+        self.metrics.inc('scrap_db_rows_total', len(changes))
+        # unchanged는 html이 바뀌지 않아 파싱하지 않은 page와 파싱했지만 추출한 값이 같은 page
+        for change, count in (
+            ('added', len(inserts)),
+            ('modified', len(changes) - len(inserts)),
+            ('unchanged', len(unchanged) + len(pages) - len(changes)),
+        ):
+            if count:
+                self.metrics.inc('scrap_changes_total', count, change=change)
+        self.metrics.set('scrap_queue_depth', self._queue.qsize(), queue='writer')
+        items.clear()
+
+    @staticmethod
+    def _stored_digests(conn: sqlite3.Connection, uris: list[str]) -> dict:
+        """이미 저장된 page의 field별 hash, {uri: (title, abstract, contents, body, bibliography의 hash)}"""
+        if not uris:
+            return {}
+        rows = conn.execute(
+            f'SELECT uri, {", ".join(FIELDS)} FROM page_hash WHERE uri IN ({", ".join("?" * len(uris))})', uris
+        )
+        return {uri: tuple(row_digests) for uri, *row_digests in rows}
+
+    def _run(self) -> None:
+        try:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._setup(conn)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        items = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:  # flush_interval이 지남
+                    self._flush(conn, items)
+                    deadline = None
+                    continue
+                if item is _CLOSE:
+                    self._flush(conn, items)
+                    return
+                items.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(items) >= self.batch_size:
+                    self._flush(conn, items)
+                    deadline = None
+        except Exception as e:
+            self._error = e
+        finally:
+            conn.close()